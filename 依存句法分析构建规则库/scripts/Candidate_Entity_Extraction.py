@@ -1,8 +1,31 @@
+"""
+候选实体抽取：R1 模板匹配 + R2-R4 依存规则，逐篇写出 *_entities.json，并维护语料级候选索引
+
+  python Candidate_Entity_Extraction.py extract --input dependency_results --output-dir entities_result --workers 4
+  python Candidate_Entity_Extraction.py query --min-df 3 --rule R2 --show 2
+
+候选索引（SQLite，默认 entities_result/candidate_index.sqlite）记录每个候选的
+文档频次、句频次与贡献规则（R2 / R3 / R4 或 R1:模板号），以及逐句出处；
+按文章内容哈希与规则指纹增量更新：只重算新增或变化的文章，阈值筛选与审阅是一次索引查询。
+"""
+
+import argparse
+import hashlib
 import json
 import re
 import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import List, Dict, Set, Tuple
-from collections import deque
+from collections import defaultdict, namedtuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from rule_engine import compile_rules, evaluate_rules
+from token_store import TokenStore, open_corpus
 
 # ------------------ 加载规则 ------------------
 def load_templates(json_path: str) -> List[Dict]:
@@ -10,144 +33,486 @@ def load_templates(json_path: str) -> List[Dict]:
         return json.load(f)
     
 # ------------------ R1: 模板规则匹配器 ------------------
-def match_templates(sentence: str, templates: List[Dict]) -> Set[Tuple[str, str, str, str]]:
-    matched = set()
-
-    for temp in templates:
-        pattern = temp.get("pattern")
-        template_id = temp.get("template_id", "T?")
-        entity_type = temp.get("entity_type", "未知类型")
-
-        try:
-            for m in re.finditer(pattern, sentence):
-                matched.add((
-                    m.group(0),
-                    entity_type,
-                    template_id,
-                    pattern,
-                ))
-
-        except re.error as e:
-            print(f"[RegexError] 模板 {template_id} 错误: {e}")
-            continue
+TemplateMatch = namedtuple('TemplateMatch', ['text', 'start', 'end', 'template_id', 'entity_type', 'pattern'])
 
-    return matched
-# ------------------ R2 实现：依存+词性规则 ------------------
-def apply_r2(parsed: List[Dict], rule: Dict) -> Set[str]:
-    candidates = set()
-    for i, t in enumerate(parsed):
-        if t['pos'] != rule['center_pos']:
-            continue
-        entity_chain = [(i, t['form'])]
-        for j, m in enumerate(parsed):
-            if m['head'] == i + 1 and m['deprel'] in rule['dependency_chain'] and m['pos'] in rule['allowed_pos']:
-                entity_chain.append((j, m['form']))
-        if len(entity_chain) > 1:
-            entity = ''.join([w for _, w in sorted(entity_chain, key=lambda x: x[0])])
-            candidates.add(entity)
-    return candidates
-
-# ------------------ R3 实现：依存 + 相邻位置 ------------------
-def apply_r3(parsed: List[Dict], rule: Dict) -> Set[str]:
-    candidates = set()
-    for i, t in enumerate(parsed):
-        if t['pos'] != rule['center_pos']:
+
+def _literal_text(items):
+    """解析后的子模式若只由字面字符（及不带标志的分组）组成，返回该字符串，否则返回 None"""
+    chars = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.append(chr(av))
+        elif op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            text = _literal_text(av[3])
+            if text is None:
+                return None
+            chars.append(text)
+        else:
+            return None
+    return ''.join(chars)
+
+
+def _literal_alternatives(op, av):
+    """形如 (采用|提出) / 准确率|精度 的纯字面分支，返回各分支字符串，否则返回 None"""
+    if op is sre_parse.SUBPATTERN and not av[1] and not av[2] and len(av[3]) == 1:
+        return _literal_alternatives(*av[3][0])
+    if op is sre_parse.BRANCH:
+        alternatives = [_literal_text(branch) for branch in av[1]]
+        if all(alternatives):
+            return alternatives
+    return None
+
+
+def required_literals(pattern, flags=0):
+    """
+    模板任一匹配都必然包含的一组字面串（含其中之一即可），取最短串最长的一组；
+    无法确定（忽略大小写、没有必需字面串等）时返回 None，表示每句都要尝试该模板。
+    """
+    if flags & re.IGNORECASE:
+        return None
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except Exception:
+        return None
+    factors = []
+    run = []
+    for op, av in list(parsed) + [(None, None)]:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
             continue
-        entity_chain = [(i, t['form'])]
-        for j in range(i - 1, -1, -1):  
-            m = parsed[j]
-            if m['pos'] in rule['allowed_pos'] and m['deprel'] in rule['dependency_chain'] and m['head'] == i + 1:
-                if j == i - 1:  # strict left-adjacent
-                    entity_chain.append((j, m['form']))
-        if len(entity_chain) > 1:
-            entity = ''.join([w for _, w in sorted(entity_chain, key=lambda x: x[0])])
-            candidates.add(entity)
-    return candidates
-
-# ------------------ R4 实现：词性 + 相邻位置 ------------------
-def apply_r4(parsed: List[Dict], rule: Dict) -> Set[str]:
-    candidates = set()
-    for i, token in enumerate(parsed):
-        if token['pos'] != rule['center_pos']:
+        if op is sre_parse.SUBPATTERN and not av[1] and not av[2] and _literal_text(av[3]):
+            run.append(_literal_text(av[3]))
             continue
+        if run:
+            factors.append([''.join(run)])
+            run = []
+        alternatives = _literal_alternatives(op, av) if op is not None else None
+        if alternatives:
+            factors.append(alternatives)
+    if not factors:
+        return None
+    return max(factors, key=lambda f: min(len(x) for x in f))
 
-        entity_chain = [(i, token['form'])]
-        current_idx = i
-        for j in range(1, rule['max_length']):
-            left_idx = current_idx - 1
-            if left_idx < 0:
-                break
-            left_token = parsed[left_idx]
-            if left_token['pos'] in rule['left_adjacent_pos']:
-                entity_chain.append((left_idx, left_token['form']))
-                current_idx = left_idx
+
+class TemplateMatcher:
+    """
+    R1 模板的预编译合并匹配器：
+    - 加载时逐条编译模板，非法正则只在此报告一次并跳过（见 errors）；
+    - 从每条模板中提取必需字面串（如 '基于(.*?)的(.*?)方法' 取 '方法'），全部字面串合成一个触发正则，
+      每句只扫描一遍即得到可能命中的模板，只对这些模板运行其预编译正则；
+    - 每条模板的匹配与单独 re.finditer 完全一致（同一模板内不重叠，不同模板之间可以重叠），
+      按 (起点, 模板顺序) 产出 TemplateMatch，带 template_id / entity_type。
+    """
+
+    def __init__(self, templates: List[Dict]):
+        self.templates = []
+        self.errors = []
+        self._always = []
+        literal_templates = {}
+        for temp in templates:
+            pattern = temp.get("pattern")
+            template_id = temp.get("template_id", "T?")
+            entity_type = temp.get("entity_type", "未知类型")
+            try:
+                compiled = re.compile(pattern)
+            except (re.error, TypeError) as e:
+                print(f"[RegexError] 模板 {template_id} 错误: {e}")
+                self.errors.append((template_id, pattern, str(e)))
+                continue
+            idx = len(self.templates)
+            self.templates.append((compiled, template_id, entity_type, pattern))
+            literals = required_literals(pattern, compiled.flags)
+            if literals is None:
+                self._always.append(idx)
             else:
-                break  # 不满足词性则终止扩展
+                for lit in literals:
+                    literal_templates.setdefault(lit, []).append(idx)
 
-        if len(entity_chain) > 1:
-            # 根据索引升序拼接实体短语
-            sorted_chain = sorted(entity_chain, key=lambda x: x[0])
-            phrase = ''.join([word for _, word in sorted_chain])
-            candidates.add(phrase)
+        # 触发正则：每个位置取最长的字面串（前瞻，不消耗字符，重叠出现也不会漏）；
+        # 命中某字面串即同时命中其包含的全部字面串
+        self._trigger = None
+        self._triggered = {}
+        if literal_templates:
+            literals = sorted(literal_templates, key=len, reverse=True)
+            self._trigger = re.compile('(?=(' + '|'.join(map(re.escape, literals)) + '))')
+            for lit in literals:
+                self._triggered[lit] = sorted({
+                    idx for other, idxs in literal_templates.items() if other in lit for idx in idxs
+                })
 
-    return candidates
+    @classmethod
+    def from_file(cls, json_path: str) -> 'TemplateMatcher':
+        return cls(load_templates(json_path))
 
-# ------------------ 单篇处理 ------------------
-def extract_entities(article: Dict, r1_templates: List[Dict], r2_r4_rules: List[Dict]) -> List[str]:
-    entity_set = set()
-    for sent_info in article.get("analyzed_sentences", []):
-        sentence = sent_info["sentence"]
-        parsed = sent_info["parsed"]
+    def candidate_templates(self, sentence: str) -> List[int]:
+        """一次扫描得到该句可能命中的模板下标（升序）"""
+        hit = set(self._always)
+        if self._trigger is not None:
+            for m in self._trigger.finditer(sentence):
+                hit.update(self._triggered[m.group(1)])
+        return sorted(hit)
 
+    def finditer(self, sentence: str) -> List[TemplateMatch]:
+        matches = []
+        for idx in self.candidate_templates(sentence):
+            compiled, template_id, entity_type, pattern = self.templates[idx]
+            for m in compiled.finditer(sentence):
+                matches.append((m.start(), idx, TemplateMatch(
+                    m.group(0), m.start(), m.end(), template_id, entity_type, pattern)))
+        matches.sort(key=lambda x: (x[0], x[1]))
+        return [match for _, _, match in matches]
+
+
+def match_templates(sentence: str, templates) -> Set[Tuple[str, str, str, str]]:
+    """templates 可以是 TemplateMatcher，也可以是模板列表（此时临时编译，批量处理请先构建 TemplateMatcher）"""
+    matcher = templates if isinstance(templates, TemplateMatcher) else TemplateMatcher(templates)
+    return {
+        (m.text, m.entity_type, m.template_id, m.pattern)
+        for m in matcher.finditer(sentence)
+    }
+
+
+# ------------------ R2-R4：依存规则引擎 ------------------
+# dependency_rules.json 由 rule_engine.py 编译为声明式谓词，在 TokenStore 列上批量求值（见该模块说明）
+
+# ------------------ 单篇处理 ------------------
+def article_occurrences(store, doc_idx, r1_matcher, rule_candidates) -> Set[Tuple[int, str, str]]:
+    """
+    单篇的候选出处 {(句下标, 候选, 规则)}：句下标为篇内下标，规则为 R2 / R3 / R4 或 R1:模板号。
+    rule_candidates 为该篇的规则引擎候选（Candidate 列表）。
+    """
+    lo, hi = store.sentence_range(doc_idx)
+    occurrences = {(c.sentence - lo, c.text, c.rule_id) for c in rule_candidates}
+    for s in range(lo, hi):
         # R1: 模板匹配
-        r1_entities_set = match_templates(sentence, r1_templates)
-        r1_entities_only = {entity for entity, _, _, _ in r1_entities_set}
+        for m in r1_matcher.finditer(store.sentence_texts[s]):
+            occurrences.add((s - lo, m.text, f"R1:{m.template_id}"))
+    return occurrences
+
+
+def entities_from_occurrences(occurrences) -> List[str]:
+    """去重后的候选，按首次出现的句子排序"""
+    return list(dict.fromkeys(text for _, text, _ in sorted(occurrences)))
+
+
+def extract_entities(article: Dict, r1_templates, r2_r4_rules) -> List[str]:
+    """单篇抽取；r1_templates 为 TemplateMatcher 或模板列表（列表时在此编译一次）"""
+    if not isinstance(r1_templates, TemplateMatcher):
+        r1_templates = TemplateMatcher(r1_templates)
+    store = TokenStore.from_articles([article])
+    rule_candidates = [c for cands in evaluate_rules(store, r2_r4_rules).values() for c in cands]
+    return entities_from_occurrences(article_occurrences(store, 0, r1_templates, rule_candidates))
+
+
+# ------------------ 语料级候选索引 ------------------
+CANDIDATE_INDEX_FILENAME = 'candidate_index.sqlite'
+
+CandidateRow = namedtuple('CandidateRow', ['candidate', 'doc_freq', 'sent_freq', 'rules'])
+
 
-        # R2-R4
-        r2_r4_entities = set()
-        for rule in r2_r4_rules:
-            if rule["rule_id"] == "R2":
-                r2_r4_entities |= apply_r2(parsed, rule)
-            elif rule["rule_id"] == "R3":
-                r2_r4_entities |= apply_r3(parsed, rule)
-            elif rule["rule_id"] == "R4":
-                r2_r4_entities |= apply_r4(parsed, rule)
+class CandidateIndex:
+    """
+    语料级候选索引（SQLite）：
+      articles     文章 -> 内容哈希、句数
+      occurrences  (文章, 句, 候选, 规则) 出处
+      sentences    (文章, 句) -> 句文本，审阅用
+      candidates   候选 -> 文档频次、句频次、贡献规则（逗号分隔、有序），随文章增删增量维护
+    规则或模板变化（指纹不同）时整库清空重建。
+    """
 
-        entity_set |= r1_entities_only | r2_r4_entities
+    def __init__(self, path):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS articles (name TEXT PRIMARY KEY, digest TEXT, n_sentences INTEGER);
+            CREATE TABLE IF NOT EXISTS occurrences (
+                name TEXT, sentence INTEGER, candidate TEXT, rule TEXT,
+                PRIMARY KEY (name, sentence, candidate, rule));
+            CREATE INDEX IF NOT EXISTS occurrences_candidate ON occurrences (candidate);
+            CREATE TABLE IF NOT EXISTS sentences (name TEXT, sentence INTEGER, text TEXT, PRIMARY KEY (name, sentence));
+            CREATE TABLE IF NOT EXISTS candidates (
+                candidate TEXT PRIMARY KEY, doc_freq INTEGER, sent_freq INTEGER, rules TEXT);
+            CREATE INDEX IF NOT EXISTS candidates_doc_freq ON candidates (doc_freq);
+        """)
+
+    def set_config(self, fingerprint):
+        """规则指纹变化时清空全部内容；返回是否清空"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+        if row is not None and row[0] == fingerprint:
+            return False
+        with self.conn:
+            for table in ('articles', 'occurrences', 'sentences', 'candidates'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('config', ?)", (fingerprint,))
+        return row is not None
+
+    def digest(self, name):
+        row = self.conn.execute("SELECT digest FROM articles WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _article_candidates(self, name):
+        return {r[0] for r in self.conn.execute("SELECT DISTINCT candidate FROM occurrences WHERE name = ?", (name,))}
+
+    def _refresh(self, candidates):
+        """重算给定候选的汇总行；已无出处的候选删除"""
+        candidates = list(candidates)
+        for i in range(0, len(candidates), 500):
+            chunk = candidates[i:i + 500]
+            marks = ','.join('?' * len(chunk))
+            freqs = {
+                cand: (df, sf) for cand, df, sf in self.conn.execute(
+                    f"SELECT candidate, COUNT(DISTINCT name), COUNT(*) FROM "
+                    f"(SELECT DISTINCT candidate, name, sentence FROM occurrences WHERE candidate IN ({marks})) "
+                    f"GROUP BY candidate", chunk)
+            }
+            rules = defaultdict(list)
+            for cand, rule in self.conn.execute(
+                    f"SELECT DISTINCT candidate, rule FROM occurrences WHERE candidate IN ({marks}) "
+                    f"ORDER BY candidate, rule", chunk):
+                rules[cand].append(rule)
+            self.conn.executemany("DELETE FROM candidates WHERE candidate = ?",
+                                  [(c,) for c in chunk if c not in freqs])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO candidates (candidate, doc_freq, sent_freq, rules) VALUES (?, ?, ?, ?)",
+                [(c, df, sf, ','.join(rules[c])) for c, (df, sf) in freqs.items()],
+            )
+
+    def replace_articles(self, articles):
+        """
+        写入（或替换）若干篇文章的全部出处，一次事务，并增量更新涉及候选的汇总。
+        articles: [(文章名, 内容哈希, 句文本列表, 出处集合)]
+        """
+        with self.conn:
+            touched = set()
+            for name, digest, sentences, occurrences in articles:
+                touched |= self._article_candidates(name)
+                self.conn.execute("DELETE FROM occurrences WHERE name = ?", (name,))
+                self.conn.execute("DELETE FROM sentences WHERE name = ?", (name,))
+                self.conn.execute("INSERT OR REPLACE INTO articles (name, digest, n_sentences) VALUES (?, ?, ?)",
+                                  (name, digest, len(sentences)))
+                self.conn.executemany("INSERT INTO sentences (name, sentence, text) VALUES (?, ?, ?)",
+                                      [(name, i, text) for i, text in enumerate(sentences)])
+                self.conn.executemany("INSERT INTO occurrences (name, sentence, candidate, rule) VALUES (?, ?, ?, ?)",
+                                      [(name, s, cand, rule) for s, cand, rule in occurrences])
+                touched |= {cand for _, cand, _ in occurrences}
+            self._refresh(touched)
+
+    def article_names(self):
+        return {r[0] for r in self.conn.execute("SELECT name FROM articles")}
+
+    def remove_article(self, name):
+        with self.conn:
+            touched = self._article_candidates(name)
+            for table in ('occurrences', 'sentences', 'articles'):
+                self.conn.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+            self._refresh(touched)
+
+    def n_articles(self):
+        return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def query(self, min_df=1, min_sf=1, rule=None, limit=None):
+        """
+        按阈值筛选候选，文档频次、句频次降序。
+        rule 为 R2 等规则号，或 R1（任一模板）/ R1:T3（指定模板）。
+        """
+        sql = "SELECT candidate, doc_freq, sent_freq, rules FROM candidates WHERE doc_freq >= ? AND sent_freq >= ?"
+        params = [min_df, min_sf]
+        if rule:
+            sql += " AND (',' || rules || ',' LIKE ? OR ',' || rules || ',' LIKE ?)"
+            params += [f"%,{rule},%", f"%,{rule}:%"]
+        sql += " ORDER BY doc_freq DESC, sent_freq DESC, candidate"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [CandidateRow(*row) for row in self.conn.execute(sql, params)]
+
+    def examples(self, candidate, limit=3):
+        """候选的出处：[(文章, 句下标, 句文本, 规则列表)]"""
+        rows = self.conn.execute(
+            "SELECT o.name, o.sentence, s.text, GROUP_CONCAT(o.rule) FROM occurrences o "
+            "JOIN sentences s ON s.name = o.name AND s.sentence = o.sentence "
+            "WHERE o.candidate = ? GROUP BY o.name, o.sentence ORDER BY o.name, o.sentence LIMIT ?",
+            (candidate, limit),
+        )
+        return [(name, sent, text, sorted(rules.split(','))) for name, sent, text, rules in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def rules_fingerprint(r1_templates, r2_r4_rules):
+    """模板与依存规则的内容指纹（变化后候选索引整体重建）"""
+    blob = json.dumps([r1_templates, r2_r4_rules], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
 
-    return list(entity_set)
 
 # ------------------ 批量处理 ------------------
-def process_directory(input_dir: str, output_dir: str, r1_path: str, r2_r4_rules: List[Dict]):
+_worker_r1 = None
+_worker_rules = None
+
+
+def _init_extract_worker(r1_templates, r2_r4_rules):
+    """进程池 initializer：每个进程只编译一次模板与规则"""
+    global _worker_r1, _worker_rules
+    _worker_r1 = TemplateMatcher(r1_templates)
+    _worker_rules = compile_rules(r2_r4_rules)
+
+
+def _extract_store(store, doc_indices, r1_matcher, rules):
+    """对 store 中的若干篇求值：规则引擎整批一次，R1 逐句；返回 [(文章下标, 出处集合)]"""
+    by_doc = defaultdict(list)
+    for cands in evaluate_rules(store, rules).values():
+        for c in cands:
+            by_doc[c.doc].append(c)
+    return [(d, article_occurrences(store, d, r1_matcher, by_doc[d])) for d in doc_indices]
+
+
+def _extract_shard(job):
+    """进程池任务：按文件路径（或打包语料的文章下标）载入一小批文章并抽取"""
+    keys, paths, corpus_path, doc_indices = job
+    if corpus_path is not None:
+        corpus = open_corpus(corpus_path)
+        store = TokenStore.from_articles([corpus.article(d) for d in doc_indices])
+    else:
+        store = TokenStore.from_files(paths, suffix='.json')
+    results = _extract_store(store, range(store.n_docs), _worker_r1, _worker_rules)
+    return [(keys[d], occ) for d, occ in results]
+
+
+def process_directory(input_dir: str, output_dir: str, r1_path: str, r2_r4_rules: List[Dict],
+                      workers: int = 1, index_path: str = None, force: bool = False, shard_size: int = 16):
+    """
+    批量抽取：逐篇写出 *_entities.json，并把出处写入语料级候选索引。
+    索引中内容哈希未变且输出文件仍在的文章直接跳过（--force 全部重算）；
+    输入中已不存在（删除或改名）的文章从索引移除，并删除其 *_entities.json；
+    workers > 1 时按 shard_size 篇一批分给进程池，每批完成即写出并更新索引。
+    """
     os.makedirs(output_dir, exist_ok=True)
     r1_templates = load_templates(r1_path)
 
-    for fname in os.listdir(input_dir):
-        if not fname.endswith('.json'):
-            continue
-        input_path = os.path.join(input_dir, fname)
-        with open(input_path, 'r', encoding='utf-8') as f:
-            article = json.load(f)
+    # 全部依存结果载入列式 TokenStore（只用于取标题与内容哈希；抽取时各进程各自载入自己的一批）
+    # input_dir 也可以是打包语料（*.depcorpus），此时内存映射读取、无需解析 JSON
+    corpus_path = None
+    if os.path.isfile(input_dir):
+        corpus_path = input_dir
+        store = open_corpus(input_dir)
+        fnames = [f"{name}_dependency.json" for name in store.names]
+    else:
+        paths = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.json')]
+        store = TokenStore.from_files(paths, suffix='.json')
+        fnames = [name + '.json' for name in store.names]
+
+    index = CandidateIndex(index_path or os.path.join(output_dir, CANDIDATE_INDEX_FILENAME))
+    if index.set_config(rules_fingerprint(r1_templates, r2_r4_rules)):
+        print("⚠️ 模板或依存规则已变化，候选索引重建")
+
+    def output_path(fname):
+        return os.path.join(output_dir, fname.replace('.json', '_entities.json'))
+
+    doc_of = {fname: d for d, fname in enumerate(fnames)}
+    digests = {}
+    todo = []
+    for d in range(store.n_docs):
+        digests[fnames[d]] = store.article_digest(d)
+        if force or index.digest(fnames[d]) != digests[fnames[d]] or not os.path.isfile(output_path(fnames[d])):
+            todo.append(d)
+
+    stale = sorted(index.article_names() - set(fnames))
+    for fname in stale:
+        index.remove_article(fname)
+        if os.path.isfile(output_path(fname)):
+            os.remove(output_path(fname))
+    if stale:
+        print(f"🗑️ 输入中已不存在的 {len(stale)} 篇已从索引与输出中移除")
+
+    def finish(results):
+        """写出一批文章的结果文件，并在一次事务中更新索引"""
+        batch = []
+        for fname, occurrences in results:
+            output_data = {
+                "article_id": fname,
+                "extracted_entities": entities_from_occurrences(occurrences)
+            }
+            with open(output_path(fname), 'w', encoding='utf-8') as out_f:
+                json.dump(output_data, out_f, ensure_ascii=False, indent=2)
+            lo, hi = store.sentence_range(doc_of[fname])
+            batch.append((fname, digests[fname], [store.sentence_texts[s] for s in range(lo, hi)], occurrences))
+        index.replace_articles(batch)
+
+    if workers != 1 and len(todo) > shard_size:
+        n_workers = workers if workers > 0 else (os.cpu_count() or 1)
+        jobs = []
+        for i in range(0, len(todo), shard_size):
+            chunk = todo[i:i + shard_size]
+            keys = [fnames[d] for d in chunk]
+            if corpus_path is not None:
+                jobs.append((keys, None, corpus_path, chunk))
+            else:
+                jobs.append((keys, [paths[d] for d in chunk], None, None))
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_extract_worker,
+                                 initargs=(r1_templates, r2_r4_rules)) as pool:
+            futures = [pool.submit(_extract_shard, job) for job in jobs]
+            for fut in as_completed(futures):
+                finish(fut.result())
+    elif todo:
+        # 串行：直接在已载入的 store 上整批求值
+        matcher = TemplateMatcher(r1_templates)
+        results = _extract_store(store, todo, matcher, compile_rules(r2_r4_rules))
+        finish([(fnames[d], occurrences) for d, occurrences in results])
 
-        entities = extract_entities(article, r1_templates, r2_r4_rules)
+    print(f"✅ 处理完成，共保存到：{output_dir}（本次抽取 {len(todo)} 篇，未变化跳过 {store.n_docs - len(todo)} 篇；"
+          f"索引 {index.n_articles()} 篇: {index.path}）")
+    index.close()
 
-        output_data = {
-            "article_id": fname,
-            "extracted_entities": entities
-        }
-        output_path = os.path.join(output_dir, fname.replace('.json', '_entities.json'))
-        with open(output_path, 'w', encoding='utf-8') as out_f:
-            json.dump(output_data, out_f, ensure_ascii=False, indent=2)
 
-    print(f"✅ 处理完成，共保存到：{output_dir}")
+def query_index(index_path, min_df=1, min_sf=1, rule=None, limit=50, show=0):
+    """打印满足阈值的候选（及每个候选的若干出处）"""
+    index = CandidateIndex(index_path)
+    rows = index.query(min_df, min_sf, rule, limit)
+    for row in rows:
+        print(f"{row.candidate}\t文档频次={row.doc_freq}\t句频次={row.sent_freq}\t规则={row.rules}")
+        for name, sent, text, rules in index.examples(row.candidate, show) if show else ():
+            print(f"    [{name} #{sent}] ({','.join(rules)}) {text}")
+    print(f"共 {len(rows)} 个候选")
+    index.close()
+    return rows
 
 
-with open(r"inputs\dependency_rules.json", 'r', encoding='utf-8') as f:
-    other_rules = json.load(f)
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='候选实体抽取与语料级候选索引')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p_extract = sub.add_parser('extract', help='批量抽取并增量更新候选索引')
+    p_extract.add_argument('--input', default=r"dependency_results", help='*_dependency.json 目录或 .depcorpus 打包语料')
+    p_extract.add_argument('--output-dir', default=r"entities_result", help='每篇抽取后的结果文件目录')
+    p_extract.add_argument('--templates', default=os.path.join('inputs', 'template_rules.json'), help='R1 模板文件')
+    p_extract.add_argument('--rules', default=os.path.join('inputs', 'dependency_rules.json'), help='R2-R4 依存规则文件')
+    p_extract.add_argument('--index', default=None, help=f'候选索引路径（默认 输出目录/{CANDIDATE_INDEX_FILENAME}）')
+    p_extract.add_argument('--workers', type=int, default=1, help='进程数（0 为 CPU 核数）')
+    p_extract.add_argument('--force', action='store_true', help='忽略索引中的内容哈希，全部重算')
+    p_query = sub.add_parser('query', help='按文档频次 / 句频次 / 规则筛选候选')
+    p_query.add_argument('--index', default=os.path.join(r"entities_result", CANDIDATE_INDEX_FILENAME))
+    p_query.add_argument('--min-df', type=int, default=1, help='最小文档频次')
+    p_query.add_argument('--min-sf', type=int, default=1, help='最小句频次')
+    p_query.add_argument('--rule', default=None, help='只看某规则贡献的候选，如 R2 / R1 / R1:T3')
+    p_query.add_argument('--limit', type=int, default=50)
+    p_query.add_argument('--show', type=int, default=0, help='每个候选列出的出处句数')
+    args = ap.parse_args()
 
-process_directory(
-    input_dir = r"dependency_results",         # 包含多个article.json的目录
-    output_dir=r"entities_result",       # 每篇抽取后的结果文件
-    r1_path=r"inputs\template_rules.json",  # 模板文件
-    r2_r4_rules = other_rules
-)
\ No newline at end of file
+    if args.cmd == 'extract':
+        with open(args.rules, 'r', encoding='utf-8') as f:
+            other_rules = json.load(f)
+        process_directory(
+            input_dir=args.input,
+            output_dir=args.output_dir,
+            r1_path=args.templates,
+            r2_r4_rules=other_rules,
+            workers=args.workers,
+            index_path=args.index,
+            force=args.force,
+        )
+    else:
+        query_index(args.index, args.min_df, args.min_sf, args.rule, args.limit, args.show)
@@ -1,87 +1,469 @@
+import argparse
+import hashlib
 import json
-import hanlp
+import multiprocessing
 import re
 import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# 加载 HanLP 预训练依存分析模型
-dep_parser = hanlp.load('CTB9_DEP_ELECTRA_SMALL')
-tokenizer = hanlp.load('CTB9_TOK_ELECTRA_SMALL')   #分词模型，记得关掉梯子
-pos_tagger = hanlp.load('CTB9_POS_ELECTRA_SMALL')
+from parse_service import ParserClient
+
+# HanLP 预训练模型标识（同时作为解析缓存键的一部分，换模型后旧缓存自动失效）
+DEP_MODEL = 'CTB9_DEP_ELECTRA_SMALL'
+TOK_MODEL = 'CTB9_TOK_ELECTRA_SMALL'
+POS_MODEL = 'CTB9_POS_ELECTRA_SMALL'
+
+# 常驻解析服务地址（见 parse_service.py）；设置后本进程不导入 hanlp、不加载模型
+PARSER_SERVICE_URL = os.environ.get('HANLP_PARSER_URL')
+
+_models = None
+
+
+def load_models():
+    """首次需要时才加载 HanLP 预训练模型，返回 (tokenizer, pos_tagger, dep_parser)"""
+    global _models
+    if _models is None:
+        import hanlp
+        # 加载 HanLP 预训练依存分析模型
+        dep_parser = hanlp.load(DEP_MODEL)
+        tokenizer = hanlp.load(TOK_MODEL)   #分词模型，记得关掉梯子
+        pos_tagger = hanlp.load(POS_MODEL)
+        _models = (tokenizer, pos_tagger, dep_parser)
+    return _models
+
+
+# 批量推理：跨文章收集子句，每个模型一次处理 BATCH_SIZE 个子句（而非逐句 batch=1）
+BATCH_SIZE = 32
+
+# 解析单位：'clause' 按逗号 / 分号切成子句后分别解析（原方式）；
+# 'sentence' 整句解析一次，子句划分由标点与依存树导出，作为 "clauses" 视图一并保存
+PARSE_UNITS = ('clause', 'sentence')
+CLAUSE_DELIMITERS = ('；', '，')
+
+
+SENTENCE_DELIMITERS = ('。', '！', '？')
+_DELIMITER_RE = re.compile('[' + ''.join(SENTENCE_DELIMITERS + CLAUSE_DELIMITERS) + ']')
+
+
+def _strip_span(text, lo, hi):
+    """等价于 text[lo:hi].strip()，返回去除首尾空白后的 (lo, hi)"""
+    while lo < hi and text[lo].isspace():
+        lo += 1
+    while hi > lo and text[hi - 1].isspace():
+        hi -= 1
+    return lo, hi
+
+
+def split_spans(text, unit='clause'):
+    """
+    单遍扫描分句，返回 [(文本, start, end), ...]，start / end 为去除首尾空白后在 text 中的字符偏移（end 为开区间）。
+    unit='clause'：先按句号、问号和感叹号分句，句中有 '；' 则按 '；' 切子句，否则按 '，' 切；
+    unit='sentence'：只按句号、问号和感叹号分句。切分结果与原先逐层 re.split + strip 完全一致。
+    """
+    spans = []
+    cuts = {d: [] for d in CLAUSE_DELIMITERS}
+    sent_start = 0
+    ends = [m.start() for m in _DELIMITER_RE.finditer(text)] + [len(text)]
+    for pos in ends:
+        ch = text[pos] if pos < len(text) else SENTENCE_DELIMITERS[0]
+        if ch in cuts:
+            cuts[ch].append(pos)
+            continue
+        bounds = [] if unit == 'sentence' else (cuts[CLAUSE_DELIMITERS[0]] or cuts[CLAUSE_DELIMITERS[1]])
+        lo = sent_start
+        for cut in bounds + [pos]:
+            a, b = _strip_span(text, lo, cut)
+            if a < b:
+                spans.append((text[a:b], a, b))
+            lo = cut + 1
+        sent_start = pos + 1
+        for v in cuts.values():
+            v.clear()
+    return spans
+
+
+def split_full_sentences(text):
+    """只按句号、问号和感叹号分句"""
+    return [s for s, _, _ in split_spans(text, 'sentence')]
 
 
 def split_sentences(text):
     """使用中文标点进行分句，先使用句号、问号和感叹号分割，再使用逗号或分号分割子句"""
-    sentences = re.split(r'[。！？]', text)
-    sentences = [s.strip() for s in sentences if s.strip()]
-    
-    sub_sentences = []
-    for sentence in sentences:
-        if '；' in sentence:
-            sub_sentence = re.split(r'；', sentence)
+    return [s for s, _, _ in split_spans(text, 'clause')]
+
+
+def token_offsets(text, forms, base=0):
+    """
+    按顺序在 text 中定位各 token，返回 [(start, end), ...]（偏移加上 base）。
+    token 之间只允许跳过空白；有 token 无法定位时返回 None（该句不记录 token 偏移）。
+    """
+    offsets = []
+    cursor = 0
+    for form in forms:
+        at = text.find(form, cursor) if form else -1
+        if at < 0 or text[cursor:at].strip():
+            return None
+        cursor = at + len(form)
+        offsets.append((base + at, base + cursor))
+    return offsets
+
+
+def with_offsets(entry, start, end):
+    """
+    给解析结果附上字符偏移：句子的 start / end 以及每个 token 的 start / end（均为在摘要中的偏移）。
+    返回新条目，不修改 entry（同一子句在各处共享同一解析结果）。
+    """
+    parsed = entry["parsed"]
+    offsets = token_offsets(entry["sentence"], [tok["form"] for tok in parsed], start)
+    if offsets is not None:
+        parsed = [dict(tok, start=a, end=b) for tok, (a, b) in zip(parsed, offsets)]
+    return {"sentence": entry["sentence"], "start": start, "end": end,
+            "tokens": entry["tokens"], "parsed": parsed}
+
+def filter_parsed(parsed, pos_tags):
+    """只保留parsed中的id、form、head和deprel字段，并附上词性"""
+    filtered_parsed = []
+    for item, pos in zip(parsed, pos_tags):
+        filtered_item = {
+            "id": item.get("id"),
+            "form": item.get("form"),
+            "head": item.get("head"),          # 依存关系的头节点
+            "deprel": item.get("deprel"),      # 依存关系类型
+            "pos": pos                        # 词性标注
+        }
+        filtered_parsed.append(filtered_item)
+    return filtered_parsed
+
+
+class ParseCache:
+    """
+    内容寻址的子句解析缓存（SQLite）：键为 sha256(模型标识 + 子句文本)，
+    值为该子句的 tokens 与过滤后的 parsed（含词性）。hits / misses 按子句出现次数计。
+    """
+
+    def __init__(self, path, model_ids=(TOK_MODEL, POS_MODEL, DEP_MODEL)):
+        self.path = path
+        self.model_key = '|'.join(model_ids)
+        self.hits = 0
+        self.misses = 0
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        # 多个分片进程共用同一缓存库时，写锁等待而不是立即报错
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS parses (key TEXT PRIMARY KEY, models TEXT, clause TEXT, result TEXT)"
+        )
+
+    def key(self, clause):
+        return hashlib.sha256(f"{self.model_key}\0{clause}".encode('utf-8')).hexdigest()
+
+    def get_many(self, clauses):
+        """返回 {子句: {"tokens", "parsed"}}，只含已缓存的子句"""
+        keys = {self.key(c): c for c in set(clauses)}
+        found = {}
+        key_list = list(keys)
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, result FROM parses WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, result in rows:
+                found[keys[key]] = json.loads(result)
+        return found
+
+    def put_many(self, items):
+        """items: {子句: {"tokens", "parsed"}}"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO parses (key, models, clause, result) VALUES (?, ?, ?, ?)",
+            [(self.key(c), self.model_key, c, json.dumps(r, ensure_ascii=False)) for c, r in items.items()],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def run_local_models(clauses, batch_size):
+    """在本进程内对子句列表批量跑 分词 -> 词性 / 依存，返回对齐的 [{"tokens", "parsed"}, ...]"""
+    tokenizer, pos_tagger, dep_parser = load_models()
+    # 分词处理
+    tokens_list = tokenizer(clauses, batch_size=batch_size)
+    # 词性标注
+    pos_list = pos_tagger(tokens_list, batch_size=batch_size)
+    # 依存句法分析
+    parsed_list = dep_parser(tokens_list, batch_size=batch_size)
+    return [
+        {"tokens": tokens, "parsed": filter_parsed(parsed, pos_tags)}
+        for tokens, pos_tags, parsed in zip(tokens_list, pos_list, parsed_list)
+    ]
+
+
+_service_models = {}
+
+
+def parser_model_ids():
+    """当前解析所用的模型标识：配置了解析服务时以服务 /health 报告的为准（每个地址只查询一次）"""
+    if not PARSER_SERVICE_URL:
+        return (TOK_MODEL, POS_MODEL, DEP_MODEL)
+    if PARSER_SERVICE_URL not in _service_models:
+        models = ParserClient(PARSER_SERVICE_URL, timeout=30).health().get("models")
+        if not models:
+            raise RuntimeError(f"解析服务 {PARSER_SERVICE_URL} 未报告模型标识")
+        _service_models[PARSER_SERVICE_URL] = tuple(models)
+    return _service_models[PARSER_SERVICE_URL]
+
+
+def _run_models(clauses, batch_size):
+    """配置了解析服务时交给常驻服务，否则本地推理"""
+    if PARSER_SERVICE_URL:
+        client = ParserClient(PARSER_SERVICE_URL, expected_models=parser_model_ids())
+        return client.parse(clauses, batch_size)
+    return run_local_models(clauses, batch_size)
+
+
+def parse_clauses(clauses, batch_size=BATCH_SIZE, cache=None):
+    """
+    批量分词 / 词性标注 / 依存分析：一次把整组子句送入各模型，HanLP 内部按 batch_size 切分。
+    给定 cache 时只对未命中的子句（去重后）运行模型，结果写回缓存。
+    返回与 clauses 对齐的 [{"sentence", "tokens", "parsed"}, ...]
+    """
+    if not clauses:
+        return []
+    if cache is None:
+        results = dict(zip(clauses, _run_models(clauses, batch_size)))
+    else:
+        results = cache.get_many(clauses)
+        missing = list(dict.fromkeys(c for c in clauses if c not in results))
+        cache.misses += len(missing)
+        cache.hits += len(clauses) - len(missing)
+        if missing:
+            fresh = dict(zip(missing, _run_models(missing, batch_size)))
+            cache.put_many(fresh)
+            results.update(fresh)
+    return [
+        {"sentence": sent, "tokens": results[sent]["tokens"], "parsed": results[sent]["parsed"]}
+        for sent in clauses
+    ]
+
+
+def derive_clauses(sentence, parsed):
+    """
+    由整句解析结果导出子句视图，切分规则与 split_sentences 一致：
+    句中有 '；' 则按 '；' 切，否则按 '，' 切（标点须为独立 token）。
+    每个子句给出 token 区间 start_id / end_id（token id，闭区间；区别于句子与 token 上的字符偏移 start / end）
+    与子句中心词 head（head 落在子句外或为 root 的 token，优先 root）。
+    """
+    delimiter = CLAUSE_DELIMITERS[0] if CLAUSE_DELIMITERS[0] in sentence else CLAUSE_DELIMITERS[1]
+    groups = []
+    current = []
+    for tok in parsed:
+        if tok["form"] == delimiter:
+            if current:
+                groups.append(current)
+            current = []
         else:
-            sub_sentence = re.split(r'，', sentence)
-        sub_sentences.extend([s.strip() for s in sub_sentence if s.strip()])
-    return sub_sentences
+            current.append(tok)
+    if current:
+        groups.append(current)
+
+    clauses = []
+    for group in groups:
+        ids = {tok["id"] for tok in group}
+        outward = [tok for tok in group if tok["head"] == 0 or tok["head"] not in ids]
+        head = next((tok for tok in outward if tok["head"] == 0), outward[0] if outward else group[0])
+        clauses.append({
+            "text": "".join(tok["form"] for tok in group).strip(),
+            "start_id": group[0]["id"],
+            "end_id": group[-1]["id"],
+            "head": head["id"],
+        })
+    return clauses
+
+
+def clean_title(title):
+    return re.sub(r'[\\/:*?"<>|]', '', title)
+
+
+def article_output_path(output_dir, title):
+    return f"{output_dir}\\{clean_title(title)}_dependency.json"
+
+
+def save_article(output_dir, title, summary, analyzed_sentences):
+    title_clean = clean_title(title)
+    output_json_path = article_output_path(output_dir, title)
+    
+    # 确保输出目录存在
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # 保存结果到 JSON 文件（先写临时文件再替换：中断时不会留下半篇结果，--resume 可据此跳过）
+    tmp_path = output_json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "title": title_clean,
+            "summary": summary,
+            "analyzed_sentences": analyzed_sentences
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_json_path)
+
+    print(f"✅ 成功分析 {title_clean} 的依存句法，结果保存至 {output_json_path}")
+
 
-def analyze_dependencies(records,  output_dir):
+def _flush_articles(pending, output_dir, batch_size, cache=None, unit='clause'):
+    """对一组文章的全部子句（或整句）做一次批量推理，再按文章切回并逐篇写出"""
+    spans = [span for _, _, sentences in pending for span in sentences]
+    parsed = parse_clauses([text for text, _, _ in spans], batch_size, cache)
+    analyzed = [with_offsets(entry, start, end) for entry, (_, start, end) in zip(parsed, spans)]
+    if unit == 'sentence':
+        for entry in analyzed:
+            entry["clauses"] = derive_clauses(entry["sentence"], entry["parsed"])
+    offset = 0
+    for title, summary, sentences in pending:
+        save_article(output_dir, title, summary, analyzed[offset:offset + len(sentences)])
+        offset += len(sentences)
+
+
+def analyze_dependencies(records,  output_dir, batch_size=BATCH_SIZE, cache_path=None, unit='clause'):
+    """
+    逐篇分句后跨文章累积子句，凑满 batch_size 个子句即批量推理一次；
+    每篇仍写出各自的 {title}_dependency.json，内容与逐句推理相同。
+    cache_path 指定 SQLite 解析缓存时，已解析过的子句直接复用，结束时打印命中统计。
+    unit='sentence' 时以整句为解析单位，analyzed_sentences 每项为一整句并附 "clauses" 子句视图。
+    每个句子与 token 都带 start / end 字符偏移（相对 summary），下游可直接按偏移把字符区间映射到 token。
+    """
+    cache = ParseCache(cache_path, parser_model_ids()) if cache_path else None
     results = []
+    pending = []
+    pending_clauses = 0
     for record in records:
         title = record.get('title', '').strip()
         summary = record.get('summary', '').strip()
-        # 分句
-        sentences = split_sentences(summary)
-        analyzed_sentences = []
-
-        for sent in sentences:
-            # 分词处理
-            tokens = tokenizer(sent)
-            # 词性标注
-            pos_tags = pos_tagger(tokens)
-            # 依存句法分析
-            parsed = dep_parser(tokens)
-            #只保留parsed中的id、form、head和deprel字段
-            filtered_parsed = []
-            for item, pos in zip(parsed, pos_tags):
-                filtered_item = {
-                    "id": item.get("id"),
-                    "form": item.get("form"),
-                    "head": item.get("head"),          # 依存关系的头节点
-                    "deprel": item.get("deprel"),      # 依存关系类型
-                    "pos": pos                        # 词性标注
-                }
-                filtered_parsed.append(filtered_item)
-
-            analyzed_sentences.append({
-                "sentence": sent,
-                "tokens": tokens,
-                "parsed": filtered_parsed
-            })
-        
-        title_clean = re.sub(r'[\\/:*?"<>|]', '', title)
-        output_json_path = f"{output_dir}\\{title_clean}_dependency.json"
-        
-        # 确保输出目录存在
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 保存结果到 JSON 文件
-        with open(output_json_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                "title": title_clean,
-                "summary": summary,
-                "analyzed_sentences": analyzed_sentences
-            }, f, ensure_ascii=False, indent=2)
-
-        print(f"✅ 成功分析 {title_clean} 的依存句法，结果保存至 {output_json_path}")
+        # 分句（带字符偏移）
+        sentences = split_spans(summary, unit)
+        pending.append((title, summary, sentences))
+        pending_clauses += len(sentences)
+        if pending_clauses >= batch_size:
+            _flush_articles(pending, output_dir, batch_size, cache, unit)
+            pending = []
+            pending_clauses = 0
+    if pending:
+        _flush_articles(pending, output_dir, batch_size, cache, unit)
 
+    if cache is not None:
+        total = cache.hits + cache.misses
+        rate = cache.hits / total if total else 0.0
+        print(f"📦 解析缓存 {cache.path}: 命中 {cache.hits} / 未命中 {cache.misses}（命中率 {rate:.1%}）")
+        cache.close()
     return results
 
+def latest_per_output(records, output_dir):
+    """同名文章（清洗后标题相同）只保留最后一条：与串行逐篇覆盖写出的最终结果一致"""
+    by_path = {}
+    for record in records:
+        by_path[article_output_path(output_dir, record.get('title', '').strip())] = record
+    return list(by_path.values())
+
+
+def is_article_done(output_dir, record, unit='clause'):
+    """该篇结果已存在、摘要未变、带字符偏移且解析单位与子句视图格式相同（用于中断后续跑）"""
+    path = article_output_path(output_dir, record.get('title', '').strip())
+    if not os.path.isfile(path):
+        return False
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if data.get("summary") != record.get('summary', '').strip():
+        return False
+    sentences = data.get("analyzed_sentences") or []
+    if not sentences:
+        return True
+    first = sentences[0]
+    if "start" not in first or ("clauses" in first) != (unit == 'sentence'):
+        return False
+    # 旧版子句视图以 start / end 表示 token 区间，需重新导出
+    return all("start_id" in clause for clause in first.get("clauses", []))
+
+
+def _init_parse_worker(threads, server_url):
+    """分片进程初始化：限制算子线程数，避免 N 个进程 × 全部核心的超额订阅"""
+    global PARSER_SERVICE_URL
+    PARSER_SERVICE_URL = server_url
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+def _parse_shard(job):
+    """分片任务：本进程独立加载模型，逐批解析并即时写出每篇结果；返回篇数"""
+    shard, output_dir, batch_size, cache_path, unit = job
+    analyze_dependencies(shard, output_dir, batch_size, cache_path, unit)
+    return len(shard)
+
+
+def analyze_dependencies_sharded(records, output_dir, workers, batch_size=BATCH_SIZE, cache_path=None,
+                                 threads_per_worker=None, unit='clause'):
+    """
+    多进程分片解析：records 按轮转切成 workers 份，每个进程持有自己的模型实例，
+    算子线程数限制为 threads_per_worker（默认 CPU 核数 / workers）。
+    各进程解析完一批即写出对应文章，可与 is_article_done 配合中断续跑。
+    """
+    if workers <= 1 or len(records) <= 1:
+        return analyze_dependencies(records, output_dir, batch_size, cache_path, unit)
+    # 同名文章分到不同进程时写出顺序不确定，先去重
+    records = latest_per_output(records, output_dir)
+    workers = min(workers, len(records))
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    shards = [records[i::workers] for i in range(workers)]
+    jobs = [(shard, output_dir, batch_size, cache_path, unit) for shard in shards]
+    # spawn：每个进程干净地导入 torch / hanlp，线程数设置在模型加载前生效
+    ctx = multiprocessing.get_context('spawn')
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_parse_worker,
+                             initargs=(threads, PARSER_SERVICE_URL)) as pool:
+        futures = [pool.submit(_parse_shard, job) for job in jobs]
+        for fut in as_completed(futures):
+            done += fut.result()
+            print(f"🧩 分片完成，累计 {done}/{len(records)} 篇")
+    return []
+
 if __name__ == "__main__":
-    input_json_path = 'd:\\科研竞赛\\LLM实体冲突识别优化\\航空\\依存句法分析构建规则库\\outputs\\summaries.json'
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--input', default='d:\\科研竞赛\\LLM实体冲突识别优化\\航空\\依存句法分析构建规则库\\outputs\\summaries.json')
+    ap.add_argument('--output-dir', default='d:\\科研竞赛\\LLM实体冲突识别优化\\航空\\依存句法分析构建规则库\\dependency_results')
+    ap.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='每批送入模型的子句数（1 即逐句推理）')
+    ap.add_argument('--cache', default=os.path.join('outputs', 'parse_cache.sqlite'),
+                    help='子句解析缓存（SQLite）路径')
+    ap.add_argument('--no-cache', action='store_true', help='不使用解析缓存，全部重新解析')
+    ap.add_argument('--server', default=PARSER_SERVICE_URL,
+                    help='常驻解析服务地址，如 http://127.0.0.1:8765（默认读环境变量 HANLP_PARSER_URL）')
+    ap.add_argument('--workers', type=int, default=1, help='分片进程数（每个进程各自加载模型）')
+    ap.add_argument('--threads', type=int, default=None, help='每个分片进程的算子线程数（默认 CPU 核数 / workers）')
+    ap.add_argument('--resume', action='store_true', help='跳过结果已存在且摘要未变的文章（中断后续跑）')
+    ap.add_argument('--unit', choices=PARSE_UNITS, default='clause',
+                    help="解析单位：clause 逐子句（原方式）/ sentence 整句解析并导出子句视图")
+    args = ap.parse_args()
+    PARSER_SERVICE_URL = args.server
+    input_json_path = args.input
     
     with open(input_json_path, 'r', encoding='utf-8') as f:
         records = json.load(f)
     
     
-    output_dir = 'd:\\科研竞赛\\LLM实体冲突识别优化\\航空\\依存句法分析构建规则库\\dependency_results'
-    analyze_dependencies(records, output_dir)
+    output_dir = args.output_dir
+    if args.resume:
+        records = latest_per_output(records, output_dir)
+        todo = [r for r in records if not is_article_done(output_dir, r, args.unit)]
+        print(f"⏭️ 续跑：{len(records) - len(todo)} 篇已完成，剩余 {len(todo)} 篇")
+        records = todo
+    analyze_dependencies_sharded(records, output_dir, args.workers, batch_size=max(1, args.batch_size),
+                                 cache_path=None if args.no_cache else args.cache,
+                                 threads_per_worker=args.threads, unit=args.unit)
 
@@ -0,0 +1,148 @@
+"""
+常驻 HanLP 解析服务（localhost HTTP）
+
+analyze_dependencies.py 每次运行都要导入 hanlp 并加载 分词 / 词性 / 依存 三个 ELECTRA 模型，
+启动开销远大于实际解析。本服务启动时加载一次模型并常驻，按批接受解析请求：
+
+  python parse_service.py serve --port 8765
+  python analyze_dependencies.py --server http://127.0.0.1:8765 ...
+  （或设置环境变量 HANLP_PARSER_URL=http://127.0.0.1:8765）
+
+接口（JSON）：
+  GET  /health -> {"status": "ok", "models": [...]}
+  POST /parse  {"clauses": [...], "batch_size": 32}
+            -> {"models": [...], "results": [{"tokens": [...], "parsed": [...]}, ...]}
+  results 与 analyze_dependencies.run_local_models 的返回完全一致。
+  请求格式错误返回 400，解析过程出错返回 500，均为 {"error": "..."}。
+
+服务为单线程，请求依次执行，模型不会被并发调用；只监听本机地址。
+ParserClient 为对应的客户端，只依赖标准库，客户端进程无需安装 / 导入 hanlp。
+"""
+
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+
+class ParserClient:
+    """
+    解析服务客户端：parse() 与本地 run_local_models 的输入输出一致。
+    给定 expected_models 时校验服务实际使用的模型，不一致即报错，避免结果混入按其它模型标识记账的缓存。
+    """
+
+    def __init__(self, url, timeout=600, expected_models=None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.expected_models = list(expected_models) if expected_models is not None else None
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        req = urllib.request.Request(self.url + path, data=data,
+                                     headers={'Content-Type': 'application/json; charset=utf-8'})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"解析服务返回错误 {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+        except urllib.error.URLError as e:
+            raise RuntimeError(f"无法连接解析服务 {self.url}: {e.reason}") from e
+
+    def health(self):
+        return self._request('/health')
+
+    def parse(self, clauses, batch_size=None):
+        payload = {"clauses": list(clauses)}
+        if batch_size:
+            payload["batch_size"] = batch_size
+        resp = self._request('/parse', payload)
+        if self.expected_models is not None and resp.get("models") != self.expected_models:
+            raise RuntimeError(f"解析服务模型 {resp.get('models')} 与预期 {self.expected_models} 不一致")
+        return resp["results"]
+
+
+def make_handler(run_models, model_ids, default_batch_size):
+    class ParseHandler(BaseHTTPRequestHandler):
+        def _reply(self, code, obj):
+            body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, {"status": "ok", "models": model_ids})
+            else:
+                self._reply(404, {"error": f"未知路径 {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/parse':
+                self._reply(404, {"error": f"未知路径 {self.path}"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length).decode('utf-8'))
+                clauses = payload["clauses"]
+                if not isinstance(clauses, list) or not all(isinstance(c, str) for c in clauses):
+                    raise ValueError("clauses 须为字符串列表")
+                batch_size = payload.get("batch_size") or default_batch_size
+                if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size <= 0:
+                    raise ValueError("batch_size 须为正整数")
+            except (KeyError, TypeError, ValueError) as e:
+                self._reply(400, {"error": f"请求格式错误: {e}"})
+                return
+            try:
+                results = run_models(clauses, batch_size) if clauses else []
+            except Exception as e:
+                self._reply(500, {"error": f"解析失败: {type(e).__name__}: {e}"})
+                return
+            self._reply(200, {"models": model_ids, "results": results})
+
+        def log_message(self, format, *args):
+            # 只在 stderr 打印简短访问日志
+            sys.stderr.write(f"[parse_service] {self.address_string()} {format % args}\n")
+
+    return ParseHandler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, batch_size=None):
+    """加载模型（一次）并开始监听"""
+    from analyze_dependencies import BATCH_SIZE, DEP_MODEL, POS_MODEL, TOK_MODEL, load_models, run_local_models
+    load_models()
+    model_ids = [TOK_MODEL, POS_MODEL, DEP_MODEL]
+    handler = make_handler(run_local_models, model_ids, batch_size or BATCH_SIZE)
+    server = HTTPServer((host, port), handler)
+    print(f"✅ 解析服务已就绪: http://{host}:{port} 模型 {model_ids}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='常驻 HanLP 解析服务')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p_serve = sub.add_parser('serve', help='加载模型并监听本机端口')
+    p_serve.add_argument('--host', default=DEFAULT_HOST)
+    p_serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p_serve.add_argument('--batch-size', type=int, default=None, help='请求未指定时的 batch_size')
+    p_health = sub.add_parser('health', help='检查服务是否在线')
+    p_health.add_argument('--url', default=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}')
+    args = ap.parse_args()
+    if args.cmd == 'serve':
+        serve(args.host, args.port, args.batch_size)
+    else:
+        print(json.dumps(ParserClient(args.url, timeout=5).health(), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+依存规则引擎：把 dependency_rules.json 编译成声明式谓词流水线，在 TokenStore 的列上对全语料批量求值
+
+规则字段（原 R2 / R3 / R4 只是字段的不同组合，新增规则无需再写循环代码）：
+  center_pos          中心词词性
+  dependency_chain    成员依存于中心词（成员的 head 为中心词）且依存关系属于该列表；缺省则不要求依存边
+  allowed_pos / left_adjacent_pos   成员词性
+  position_constraint 成员位置：
+                        缺省             中心词在句中任意位置的子节点（须给出 dependency_chain）
+                        left_adjacent    中心词左侧紧邻的 1 个 token
+                        strict_adjacent  中心词左侧连续的若干 token，遇到不满足条件的 token 即停止
+  max_length          strict_adjacent 时短语最多包含的 token 数（含中心词）
+候选短语为中心词与成员按句序拼接，至少含一个成员。rule_id 在规则文件内须唯一（缺省为 "R?"）。
+
+求值全部在语料级数组上完成：中心词掩码、成员掩码、每个 token 的 head 全局位置（不假设 id == 位置 + 1）
+各算一次，规则之间共享；每条候选带出处（文章、句、中心词 id、成员 token id）。
+
+用法：
+    python rule_engine.py dependency_results ../inputs/dependency_rules.json [--output candidates.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from token_store import open_corpus
+
+POSITION_CONSTRAINTS = (None, 'left_adjacent', 'strict_adjacent')
+
+Candidate = namedtuple('Candidate', ['text', 'rule_id', 'doc', 'sentence', 'center_id', 'token_ids'])
+
+
+class CompiledRule:
+    """单条规则的编译结果：字段校验后转为集合，求值时再映射为语料字符串表中的编码"""
+
+    def __init__(self, rule):
+        self.rule_id = rule.get("rule_id", "R?")
+        self.center_pos = rule["center_pos"]
+        chain = rule.get("dependency_chain")
+        self.dependency_chain = frozenset(chain) if chain else None
+        member_pos = rule.get("allowed_pos", rule.get("left_adjacent_pos"))
+        if not member_pos:
+            raise ValueError(f"规则 {self.rule_id} 缺少 allowed_pos / left_adjacent_pos")
+        self.member_pos = frozenset(member_pos)
+        self.position = rule.get("position_constraint")
+        if self.position not in POSITION_CONSTRAINTS:
+            raise ValueError(f"规则 {self.rule_id} 的 position_constraint 未知: {self.position}")
+        if self.position is None and self.dependency_chain is None:
+            raise ValueError(f"规则 {self.rule_id} 既无 dependency_chain 也无位置约束，成员无法确定")
+        self.max_length = rule.get("max_length")
+        if self.position == 'strict_adjacent' and not self.max_length:
+            raise ValueError(f"规则 {self.rule_id} 为 strict_adjacent，须给出 max_length")
+
+    @property
+    def max_left(self):
+        """向左最多并入的 token 数；None 表示不按位置而按依存子节点取成员"""
+        if self.position == 'left_adjacent':
+            return 1
+        if self.position == 'strict_adjacent':
+            return self.max_length - 1
+        return None
+
+    def __repr__(self):
+        return f"CompiledRule({self.rule_id}, center={self.center_pos}, position={self.position})"
+
+
+def compile_rules(rules):
+    """规则列表（dependency_rules.json 的内容）-> [CompiledRule]；字段不合法或 rule_id 重复时抛出 ValueError"""
+    compiled = [r if isinstance(r, CompiledRule) else CompiledRule(r) for r in rules]
+    seen = set()
+    for rule in compiled:
+        if rule.rule_id in seen:
+            raise ValueError(f"规则 {rule.rule_id} 重复：rule_id 须唯一（结果按 rule_id 汇总）")
+        seen.add(rule.rule_id)
+    return compiled
+
+
+def load_rules(json_path):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return compile_rules(json.load(f))
+
+
+class CorpusColumns:
+    """规则求值所需的语料级数组，每个 TokenStore 只构建一次、各规则共享"""
+
+    def __init__(self, store):
+        store.freeze()
+        self.store = store
+        n_tokens = store.n_tokens
+        sent_offsets = np.asarray(store.sent_offsets, dtype=np.int64)
+        sizes = np.diff(sent_offsets)
+        self.sent_of = np.repeat(np.arange(store.n_sentences, dtype=np.int64), sizes)
+        self.sent_lo = sent_offsets[:-1][self.sent_of]
+        self.doc_of_sent = np.searchsorted(np.asarray(store.doc_offsets), np.arange(store.n_sentences), side='right') - 1
+        self.pos_codes = np.asarray(store.pos_codes)
+        self.deprel_codes = np.asarray(store.deprel_codes)
+
+        # head 的全局位置：id 恰为 1..n 的句子直接换算，其余句子逐句按 id 查找
+        ids = np.asarray(store.ids, dtype=np.int64)
+        heads = np.asarray(store.heads, dtype=np.int64)
+        local = np.arange(n_tokens, dtype=np.int64) - self.sent_lo
+        in_range = (heads > 0) & (heads <= sizes[self.sent_of])
+        self.head_global = np.where(in_range, self.sent_lo + heads - 1, -1)
+        for s in np.unique(self.sent_of[ids != local + 1]).tolist():
+            lo, hi = int(sent_offsets[s]), int(sent_offsets[s + 1])
+            hp = store.sentence(s).head_positions()
+            self.head_global[lo:hi] = np.where(hp >= 0, lo + hp, -1)
+
+        self._pos_index = {s: i for i, s in enumerate(store.poses)}
+        self._deprel_index = {s: i for i, s in enumerate(store.deprels)}
+        self._forms = None
+
+    def pos_mask(self, tags):
+        codes = [self._pos_index[t] for t in tags if t in self._pos_index]
+        return np.isin(self.pos_codes, codes)
+
+    def deprel_mask(self, rels):
+        codes = [self._deprel_index[r] for r in rels if r in self._deprel_index]
+        return np.isin(self.deprel_codes, codes)
+
+    def form(self, k):
+        if self._forms is None:
+            table = self.store.forms
+            self._forms = [table[c] for c in np.asarray(self.store.form_codes).tolist()]
+        return self._forms[k]
+
+
+def _adjacent_members(rule, cols, centers, member_mask):
+    """按位置并入：返回每个中心词向左扩展到的起点（未扩展时等于中心词本身）"""
+    start = centers.copy()
+    active = np.ones(len(centers), dtype=bool)
+    for step in range(1, rule.max_left + 1):
+        k = centers - step
+        ok = active & (k >= cols.sent_lo[centers])
+        idx = np.nonzero(ok)[0]
+        kk = k[idx]
+        good = member_mask[kk]
+        if rule.dependency_chain is not None:
+            good &= cols.head_global[kk] == centers[idx]
+        ok[idx] = good
+        start[ok] = k[ok]
+        active = ok
+        if not active.any():
+            break
+    return start
+
+
+def evaluate_rule(rule, cols):
+    """单条规则在全语料上求值，返回 [Candidate]（按 token 顺序）"""
+    center_mask = cols.pos_mask([rule.center_pos])
+    member_mask = cols.pos_mask(rule.member_pos)
+    if rule.dependency_chain is not None:
+        member_mask &= cols.deprel_mask(rule.dependency_chain)
+    ids = cols.store.ids
+    candidates = []
+
+    def emit(center, positions):
+        s = int(cols.sent_of[center])
+        candidates.append(Candidate(
+            "".join(cols.form(p) for p in positions), rule.rule_id, int(cols.doc_of_sent[s]), s,
+            int(ids[center]), tuple(int(ids[p]) for p in positions),
+        ))
+
+    if rule.max_left is None:
+        # 依存子节点：成员 k 的 head 为中心词
+        k = np.nonzero(member_mask & (cols.head_global >= 0))[0]
+        c = cols.head_global[k]
+        keep = center_mask[c]
+        k, c = k[keep], c[keep]
+        order = np.lexsort((k, c))
+        k, c = k[order].tolist(), c[order].tolist()
+        i = 0
+        while i < len(c):
+            j = i
+            while j < len(c) and c[j] == c[i]:
+                j += 1
+            emit(c[i], sorted([c[i]] + k[i:j]))
+            i = j
+    else:
+        centers = np.nonzero(center_mask)[0]
+        start = _adjacent_members(rule, cols, centers, member_mask)
+        for c, a in zip(centers.tolist(), start.tolist()):
+            if a < c:
+                emit(c, range(a, c + 1))
+    return candidates
+
+
+def evaluate_rules(store, rules, cols=None):
+    """全部规则在整个语料上批量求值：{rule_id: [Candidate, ...]}"""
+    cols = cols or CorpusColumns(store)
+    return {rule.rule_id: evaluate_rule(rule, cols) for rule in compile_rules(rules)}
+
+
+def candidates_by_doc(results, n_docs):
+    """按文章汇总各规则的候选短语集合：[set, ...]（下标为文章下标）"""
+    per_doc = [set() for _ in range(n_docs)]
+    for candidates in results.values():
+        for cand in candidates:
+            per_doc[cand.doc].add(cand.text)
+    return per_doc
+
+
+def candidates_to_json(store, results):
+    """{rule_id: [{"text", "title", "sentence", "center_id", "token_ids"}, ...]}，sentence 为句文本"""
+    return {
+        rule_id: [
+            {
+                "text": c.text,
+                "title": store.titles[c.doc],
+                "sentence": store.sentence_texts[c.sentence],
+                "center_id": c.center_id,
+                "token_ids": list(c.token_ids),
+            }
+            for c in candidates
+        ]
+        for rule_id, candidates in results.items()
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='在全语料上批量求值依存规则（dependency_rules.json）')
+    ap.add_argument('corpus', help='*_dependency.json 目录或 .depcorpus 打包语料')
+    ap.add_argument('rules', help='dependency_rules.json')
+    ap.add_argument('--output', default=None, help='写出带出处的逐条候选（JSON）')
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    store = open_corpus(args.corpus)
+    t1 = time.perf_counter()
+    rules = load_rules(args.rules)
+    results = evaluate_rules(store, rules)
+    t2 = time.perf_counter()
+    print(f"语料 {store.n_docs} 篇 / {store.n_sentences} 句 / {store.n_tokens} 词，"
+          f"载入 {t1 - t0:.2f}s，规则求值 {t2 - t1:.2f}s")
+    for rule_id, candidates in results.items():
+        print(f"  {rule_id}: {len(candidates)} 条候选，{len({c.text for c in candidates})} 个不同短语")
+    if args.output:
+        parent = os.path.dirname(args.output)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(candidates_to_json(store, results), f, ensure_ascii=False, indent=2)
+        print(f"✅ 候选与出处已写出: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,608 @@
+"""
+列式依存语料存储（TokenStore）
+
+dependency_path.py / batch_visualize_paths.py / Candidate_Entity_Extraction.py / rule_engine.py / parsed_join.py
+共用的 *_dependency.json 内存表示，替代逐 token 的 Python 字典：
+- 全语料 token 平铺为 NumPy 列：ids / heads / form 编码 / deprel 编码 / pos 编码
+- sent_offsets[s] : sent_offsets[s+1] 为第 s 句的 token 区间；doc_offsets 同理给出每篇文章的句区间
+- form / deprel / pos 字符串各自驻留在一张字符串表（StringTable）中，列里只存整数编码
+- SentenceView 是列的零拷贝切片；同时实现了 parsed（token 字典列表）的只读接口，
+  原有按 tok["form"] / tok.get("head") 访问的函数无需修改即可使用
+- 依存边（child, head）等图结构直接由数组运算得到
+
+用法：
+    store = TokenStore.from_dependency_dir('dependency_results')
+    for article in store.iter_articles():          # 与 json.load 得到的结构相同
+        ...
+    sent = store.sentence(0)
+    sent.heads, sent.head_positions(), sent.edges()
+
+打包二进制语料（*.depcorpus）：
+    python token_store.py pack dependency_results dependency_results.depcorpus
+    python token_store.py unpack dependency_results.depcorpus out_dir   # 还原为逐篇 JSON（与原文件逐字节一致）
+    corpus = open_corpus('dependency_results.depcorpus')                # 内存映射，按需解码
+    corpus.document_sentences(corpus.doc_index(title))
+文件布局：8 字节魔数 | 8 字节头长度 | JSON 头（标题、列偏移索引）| 按 8 字节对齐的列数据。
+字符串（词形 / 句子 / 摘要等）以 UTF-8 blob + 偏移数组存放，只有被访问的条目才会解码。
+
+整句解析模式（analyze_dependencies.py --unit sentence）的句子带有 "clauses" 子句视图
+（每项 text / start_id / end_id / head，均为 token id 而非字符偏移），
+按句保存在 sentence_clauses 中，article() / to_json_obj() 原样输出。
+
+字符偏移：analyze_dependencies.py 为每个句子和 token 记录 start / end（在 summary 中的字符偏移），
+分别存为 sent_char_starts / sent_char_ends 与 char_starts / char_ends 列（无偏移的旧结果记为 -1）。
+SentenceView.token_span() 据此用二分查找把字符区间映射为 token 区间。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+from array import array
+
+import numpy as np
+
+PACKED_MAGIC = b'DEPCORP1'
+PACKED_SUFFIX = '.depcorpus'
+
+TOKEN_FIELDS = ("id", "form", "head", "deprel", "pos")
+
+
+class StringTable:
+    """字符串驻留表：字符串 <-> 连续整数编码"""
+
+    def __init__(self, strings=()):
+        self.strings = []
+        self.codes = {}
+        for s in strings:
+            self.intern(s)
+
+    def intern(self, s):
+        code = self.codes.get(s)
+        if code is None:
+            code = len(self.strings)
+            self.codes[s] = code
+            self.strings.append(s)
+        return code
+
+    def __getitem__(self, code):
+        return self.strings[code]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class SentenceView:
+    """
+    单句的零拷贝视图。ids / heads / form_codes / deprel_codes / pos_codes 为底层列的切片；
+    作为序列使用时逐个产出与原 parsed 相同的 token 字典（首次访问时物化并缓存）。
+    """
+
+    def __init__(self, store, sent_idx):
+        self.store = store
+        self.sent_idx = sent_idx
+        lo, hi = int(store.sent_offsets[sent_idx]), int(store.sent_offsets[sent_idx + 1])
+        self.lo, self.hi = lo, hi
+        self.ids = store.ids[lo:hi]
+        self.heads = store.heads[lo:hi]
+        self.form_codes = store.form_codes[lo:hi]
+        self.deprel_codes = store.deprel_codes[lo:hi]
+        self.pos_codes = store.pos_codes[lo:hi]
+        self.char_starts = store.char_starts[lo:hi]
+        self.char_ends = store.char_ends[lo:hi]
+        self._tokens = None
+
+    @property
+    def text(self):
+        return self.store.sentence_texts[self.sent_idx]
+
+    @property
+    def char_span(self):
+        """句子在摘要中的 (start, end)，无偏移时为 None"""
+        start = int(self.store.sent_char_starts[self.sent_idx])
+        return None if start < 0 else (start, int(self.store.sent_char_ends[self.sent_idx]))
+
+    @property
+    def has_offsets(self):
+        return self.hi > self.lo and int(self.char_starts[0]) >= 0
+
+    @property
+    def forms(self):
+        table = self.store.forms
+        return [table[c] for c in self.form_codes.tolist()]
+
+    def tokens(self):
+        """物化为原 parsed 结构（list[dict]），结果在视图上缓存"""
+        if self._tokens is None:
+            store = self.store
+            forms, deprels, poses = store.forms, store.deprels, store.poses
+            self._tokens = [
+                {"id": i, "form": forms[f], "head": h, "deprel": deprels[d], "pos": poses[p]}
+                for i, h, f, d, p in zip(
+                    self.ids.tolist(), self.heads.tolist(), self.form_codes.tolist(),
+                    self.deprel_codes.tolist(), self.pos_codes.tolist(),
+                )
+            ]
+            if self.has_offsets:
+                for tok, a, b in zip(self._tokens, self.char_starts.tolist(), self.char_ends.tolist()):
+                    tok["start"] = a
+                    tok["end"] = b
+        return self._tokens
+
+    def __len__(self):
+        return self.hi - self.lo
+
+    def __iter__(self):
+        return iter(self.tokens())
+
+    def __getitem__(self, i):
+        return self.tokens()[i]
+
+    def __bool__(self):
+        return self.hi > self.lo
+
+    def head_positions(self):
+        """每个 token 的 head 在本句中的下标；root（head==0）或 head 不在本句时为 -1"""
+        n = len(self)
+        ids, heads = self.ids, self.heads
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        if ids[0] == 1 and ids[-1] == n and np.all(np.diff(ids) == 1):
+            # 常见情形：id 恰为 1..n
+            pos = heads.astype(np.int64) - 1
+            pos[(heads <= 0) | (heads > n)] = -1
+            return pos
+        order = np.argsort(ids, kind="stable")
+        sorted_ids = ids[order]
+        at = np.minimum(np.searchsorted(sorted_ids, heads), n - 1)
+        found = (sorted_ids[at] == heads) & (heads != 0)
+        return np.where(found, order[at], -1).astype(np.int64)
+
+    def edges(self, internal_only=False):
+        """
+        依存边 (child_ids, head_ids)，按 token 顺序，不含 root。
+        internal_only=True 时只保留 head 存在于本句的边。
+        """
+        if internal_only:
+            mask = self.head_positions() >= 0
+        else:
+            mask = self.heads != 0
+        return self.ids[mask], self.heads[mask]
+
+    def root_ids(self):
+        return self.ids[self.heads == 0]
+
+    def token_span(self, char_start, char_end):
+        """
+        摘要中的字符区间 [char_start, char_end) 覆盖的 token 区间 (start_id, end_id)（部分重叠也算），
+        在 token 偏移列上二分查找；无偏移或区间内没有 token 时返回 None。
+        """
+        if not self.has_offsets:
+            return None
+        first = int(np.searchsorted(self.char_ends, char_start, side='right'))
+        last = int(np.searchsorted(self.char_starts, char_end, side='left')) - 1
+        if first > last:
+            return None
+        return int(self.ids[first]), int(self.ids[last])
+
+    def children_csr(self):
+        """
+        head -> children 的 CSR 索引（按句内位置）：
+        返回 (indptr, children)，位置 p 的子节点为 children[indptr[p]:indptr[p+1]]，保持句内顺序。
+        """
+        n = len(self)
+        hp = self.head_positions()
+        child_pos = np.nonzero(hp >= 0)[0]
+        parent_pos = hp[child_pos]
+        order = np.argsort(parent_pos, kind="stable")
+        children = child_pos[order]
+        counts = np.bincount(parent_pos, minlength=n) if n else np.zeros(0, dtype=np.int64)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return indptr, children
+
+
+class TokenStore:
+    """全语料列式存储，见模块说明"""
+
+    def __init__(self):
+        self.titles = []
+        self.names = []
+        self.summaries = []
+        self.sentence_texts = []
+        self.forms = StringTable()
+        self.deprels = StringTable()
+        self.poses = StringTable()
+        # sent_idx -> tokens 列表；仅当 tokens 与 parsed 的 form 序列不一致时才单独保存
+        self.token_overrides = {}
+        # sent_idx -> 子句视图（整句解析模式才有）
+        self.sentence_clauses = {}
+        self._title_index = {}
+        self._doc_offsets = array('q', [0])
+        self._sent_offsets = array('q', [0])
+        self._ids = array('i')
+        self._heads = array('i')
+        self._form_codes = array('i')
+        self._deprel_codes = array('h')
+        self._pos_codes = array('h')
+        self._char_starts = array('i')
+        self._char_ends = array('i')
+        self._sent_char_starts = array('i')
+        self._sent_char_ends = array('i')
+        self._frozen = False
+
+    # ---------- 构建 ----------
+    def add_article(self, dep_data, name=None):
+        """追加一篇 *_dependency.json 的内容（dict），返回文章下标"""
+        if self._frozen:
+            raise RuntimeError("TokenStore 已冻结，不能再追加文章")
+        doc_idx = len(self.titles)
+        title = dep_data.get("title", "")
+        self.titles.append(title)
+        self.names.append(name if name is not None else title)
+        self.summaries.append(dep_data.get("summary", ""))
+        self._title_index.setdefault(title, doc_idx)
+        if name is not None:
+            self._title_index.setdefault(name, doc_idx)
+        for sent in dep_data.get("analyzed_sentences", []):
+            sent_idx = len(self.sentence_texts)
+            self.sentence_texts.append(sent.get("sentence", ""))
+            self._sent_char_starts.append(sent.get("start", -1))
+            self._sent_char_ends.append(sent.get("end", -1))
+            parsed = sent.get("parsed", [])
+            has_offsets = all("start" in tok for tok in parsed)
+            for tok in parsed:
+                self._ids.append(tok["id"])
+                self._heads.append(tok["head"])
+                self._form_codes.append(self.forms.intern(tok.get("form")))
+                self._deprel_codes.append(self.deprels.intern(tok.get("deprel")))
+                self._pos_codes.append(self.poses.intern(tok.get("pos")))
+                self._char_starts.append(tok["start"] if has_offsets else -1)
+                self._char_ends.append(tok["end"] if has_offsets else -1)
+            tokens = sent.get("tokens")
+            if tokens != [tok.get("form") for tok in parsed]:
+                self.token_overrides[sent_idx] = tokens
+            if "clauses" in sent:
+                self.sentence_clauses[sent_idx] = sent["clauses"]
+            self._sent_offsets.append(len(self._ids))
+        self._doc_offsets.append(len(self.sentence_texts))
+        return doc_idx
+
+    def freeze(self):
+        """把构建缓冲区转为 NumPy 列（共享内存，无额外拷贝）"""
+        if not self._frozen:
+            self.doc_offsets = np.frombuffer(self._doc_offsets, dtype=np.int64)
+            self.sent_offsets = np.frombuffer(self._sent_offsets, dtype=np.int64)
+            self.ids = np.frombuffer(self._ids, dtype=np.int32)
+            self.heads = np.frombuffer(self._heads, dtype=np.int32)
+            self.form_codes = np.frombuffer(self._form_codes, dtype=np.int32)
+            self.deprel_codes = np.frombuffer(self._deprel_codes, dtype=np.int16)
+            self.pos_codes = np.frombuffer(self._pos_codes, dtype=np.int16)
+            self.char_starts = np.frombuffer(self._char_starts, dtype=np.int32)
+            self.char_ends = np.frombuffer(self._char_ends, dtype=np.int32)
+            self.sent_char_starts = np.frombuffer(self._sent_char_starts, dtype=np.int32)
+            self.sent_char_ends = np.frombuffer(self._sent_char_ends, dtype=np.int32)
+            self._frozen = True
+        return self
+
+    @classmethod
+    def from_articles(cls, articles, names=None):
+        store = cls()
+        for i, dep_data in enumerate(articles):
+            store.add_article(dep_data, names[i] if names else None)
+        return store.freeze()
+
+    @classmethod
+    def from_files(cls, paths, suffix='_dependency.json'):
+        """逐个读取 JSON 文件；每篇解析完即释放其字典，峰值内存只与单篇相关"""
+        store = cls()
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                dep_data = json.load(f)
+            base = os.path.basename(path)
+            name = base[:-len(suffix)] if suffix and base.endswith(suffix) else base
+            store.add_article(dep_data, name)
+        return store.freeze()
+
+    @classmethod
+    def from_dependency_dir(cls, dep_dir, suffix='_dependency.json'):
+        paths = [os.path.join(dep_dir, f) for f in os.listdir(dep_dir) if f.endswith(suffix)]
+        return cls.from_files(paths, suffix)
+
+    # ---------- 访问 ----------
+    @property
+    def n_docs(self):
+        return len(self.titles)
+
+    @property
+    def n_sentences(self):
+        return len(self.sentence_texts)
+
+    @property
+    def n_tokens(self):
+        return len(self.ids)
+
+    def doc_index(self, title):
+        """按标题（或构建时给出的 name）查文章下标，不存在返回 None"""
+        return self._title_index.get(title)
+
+    def sentence_range(self, doc_idx):
+        return int(self.doc_offsets[doc_idx]), int(self.doc_offsets[doc_idx + 1])
+
+    def sentence(self, sent_idx):
+        return SentenceView(self, sent_idx)
+
+    def document_sentences(self, doc_idx):
+        """某篇文章的句视图列表，可直接替代 [s["parsed"] for s in analyzed_sentences]"""
+        lo, hi = self.sentence_range(doc_idx)
+        return [SentenceView(self, s) for s in range(lo, hi)]
+
+    def article(self, doc_idx):
+        """与原 JSON 结构一致的文章字典；parsed 字段为 SentenceView"""
+        lo, hi = self.sentence_range(doc_idx)
+        analyzed = []
+        for s in range(lo, hi):
+            view = SentenceView(self, s)
+            tokens = self.token_overrides.get(s)
+            entry = {"sentence": self.sentence_texts[s]}
+            span = view.char_span
+            if span is not None:
+                entry["start"], entry["end"] = span
+            entry["tokens"] = tokens if tokens is not None else view.forms
+            entry["parsed"] = view
+            clauses = self.sentence_clauses.get(s)
+            if clauses is not None:
+                entry["clauses"] = clauses
+            analyzed.append(entry)
+        return {
+            "title": self.titles[doc_idx],
+            "summary": self.summaries[doc_idx],
+            "analyzed_sentences": analyzed,
+        }
+
+    def iter_articles(self):
+        for d in range(self.n_docs):
+            yield self.article(d)
+
+    def to_json_obj(self, doc_idx):
+        """还原为与 *_dependency.json 完全相同的普通 dict/list 结构"""
+        art = self.article(doc_idx)
+        for sent in art["analyzed_sentences"]:
+            sent["parsed"] = [dict(t) for t in sent["parsed"]]
+        return art
+
+    def article_digest(self, doc_idx):
+        """单篇文章内容的 sha256，与其它文章及字符串表编码无关（用于增量批处理）"""
+        h = hashlib.sha256()
+        h.update(json.dumps([self.titles[doc_idx], self.summaries[doc_idx]], ensure_ascii=False).encode('utf-8'))
+        for view in self.document_sentences(doc_idx):
+            h.update(json.dumps(view.text, ensure_ascii=False).encode('utf-8'))
+            h.update(json.dumps(self.token_overrides.get(view.sent_idx), ensure_ascii=False).encode('utf-8'))
+            if view.sent_idx in self.sentence_clauses:
+                h.update(json.dumps(self.sentence_clauses[view.sent_idx], ensure_ascii=False).encode('utf-8'))
+            h.update(view.ids.tobytes())
+            h.update(view.heads.tobytes())
+            h.update(json.dumps(view.char_span).encode('utf-8'))
+            h.update(view.char_starts.tobytes())
+            h.update(view.char_ends.tobytes())
+            h.update(json.dumps(
+                [view.forms,
+                 [self.deprels[c] for c in view.deprel_codes.tolist()],
+                 [self.poses[c] for c in view.pos_codes.tolist()]],
+                ensure_ascii=False).encode('utf-8'))
+        return h.hexdigest()
+
+    # ---------- 二进制打包 ----------
+    def save_packed(self, path):
+        """写出 *.depcorpus（见模块说明中的文件布局）"""
+        self.freeze()
+        columns = {
+            "doc_offsets": self.doc_offsets,
+            "sent_offsets": self.sent_offsets,
+            "ids": self.ids,
+            "heads": self.heads,
+            "form_codes": self.form_codes,
+            "deprel_codes": self.deprel_codes,
+            "pos_codes": self.pos_codes,
+            "char_starts": self.char_starts,
+            "char_ends": self.char_ends,
+            "sent_char_starts": self.sent_char_starts,
+            "sent_char_ends": self.sent_char_ends,
+        }
+        string_tables = {}
+        for name, strings in (
+            ("forms", self.forms.strings),
+            ("deprels", self.deprels.strings),
+            ("poses", self.poses.strings),
+            ("sentence_texts", self.sentence_texts),
+            ("summaries", self.summaries),
+        ):
+            blob, offsets, none_codes = _encode_strings(strings)
+            columns[f"{name}.blob"] = blob
+            columns[f"{name}.offsets"] = offsets
+            string_tables[name] = none_codes
+
+        header = {
+            "version": 1,
+            "titles": self.titles,
+            "names": self.names,
+            "token_overrides": {str(k): v for k, v in self.token_overrides.items()},
+            "sentence_clauses": {str(k): v for k, v in self.sentence_clauses.items()},
+            "string_tables": string_tables,
+            "columns": {},
+        }
+        # 先定长度再回填偏移：偏移以数据区起点为 0
+        offset = 0
+        for name, arr in columns.items():
+            header["columns"][name] = {"dtype": arr.dtype.str, "offset": offset, "length": int(arr.size)}
+            offset += _aligned(arr.nbytes)
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        header_bytes += b' ' * (_aligned(len(header_bytes)) - len(header_bytes))
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(PACKED_MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for arr in columns.values():
+                data = np.ascontiguousarray(arr).tobytes()
+                f.write(data)
+                f.write(b'\0' * (_aligned(len(data)) - len(data)))
+        os.replace(tmp_path, path)
+        return path
+
+
+def _aligned(n, align=8):
+    return (n + align - 1) // align * align
+
+
+def _encode_strings(strings):
+    """字符串序列 -> (UTF-8 blob, 偏移数组, 取值为 None 的下标列表)"""
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    parts = []
+    none_codes = []
+    total = 0
+    for i, s in enumerate(strings):
+        if s is None:
+            none_codes.append(i)
+            b = b''
+        else:
+            b = s.encode('utf-8')
+        parts.append(b)
+        total += len(b)
+        offsets[i + 1] = total
+    return np.frombuffer(b''.join(parts), dtype=np.uint8), offsets, none_codes
+
+
+class PackedStrings:
+    """内存映射中的字符串表：按下标惰性解码并缓存"""
+
+    def __init__(self, blob, offsets, none_codes=()):
+        self.blob = blob
+        self.offsets = offsets
+        self.none_codes = set(none_codes)
+        self._cache = {}
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        s = self._cache.get(i)
+        if s is None and i not in self._cache:
+            if i in self.none_codes:
+                s = None
+            else:
+                lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+                s = self.blob[lo:hi].tobytes().decode('utf-8')
+            self._cache[i] = s
+        return s
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class PackedCorpus(TokenStore):
+    """
+    以内存映射方式打开的 *.depcorpus。列为 np.memmap 上的零拷贝视图，
+    打开时只解析 JSON 头（标题与偏移索引）；文章 / 句子按标题或下标随取随解码。
+    接口与 TokenStore 相同。
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        with open(path, 'rb') as f:
+            magic = f.read(len(PACKED_MAGIC))
+            if magic != PACKED_MAGIC:
+                raise ValueError(f"不是 depcorpus 文件: {path}")
+            (header_len,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        data_start = len(PACKED_MAGIC) + 8 + header_len
+        self._mm = np.memmap(path, dtype=np.uint8, mode='r')
+
+        def column(name, missing_length=None):
+            if name not in header["columns"] and missing_length is not None:
+                # 早于字符偏移的打包文件：视为无偏移
+                return np.full(missing_length, -1, dtype=np.int32)
+            meta = header["columns"][name]
+            dtype = np.dtype(meta["dtype"])
+            lo = data_start + meta["offset"]
+            return self._mm[lo:lo + meta["length"] * dtype.itemsize].view(dtype)
+
+        self.doc_offsets = column("doc_offsets")
+        self.sent_offsets = column("sent_offsets")
+        self.ids = column("ids")
+        self.heads = column("heads")
+        self.form_codes = column("form_codes")
+        self.deprel_codes = column("deprel_codes")
+        self.pos_codes = column("pos_codes")
+        self.char_starts = column("char_starts", len(self.ids))
+        self.char_ends = column("char_ends", len(self.ids))
+        self.sent_char_starts = column("sent_char_starts", len(self.sent_offsets) - 1)
+        self.sent_char_ends = column("sent_char_ends", len(self.sent_offsets) - 1)
+        tables = {
+            name: PackedStrings(column(f"{name}.blob"), column(f"{name}.offsets"), none_codes)
+            for name, none_codes in header["string_tables"].items()
+        }
+        self.forms = tables["forms"]
+        self.deprels = tables["deprels"]
+        self.poses = tables["poses"]
+        self.sentence_texts = tables["sentence_texts"]
+        self.summaries = tables["summaries"]
+        self.titles = header["titles"]
+        self.names = header["names"]
+        self.token_overrides = {int(k): v for k, v in header["token_overrides"].items()}
+        self.sentence_clauses = {int(k): v for k, v in header.get("sentence_clauses", {}).items()}
+        for i, (title, name) in enumerate(zip(self.titles, self.names)):
+            self._title_index.setdefault(title, i)
+            self._title_index.setdefault(name, i)
+        self._frozen = True
+
+    def add_article(self, dep_data, name=None):
+        raise RuntimeError("PackedCorpus 为只读")
+
+
+def open_corpus(path):
+    """打开依存语料：*.depcorpus 用内存映射，目录则逐篇读取 *_dependency.json"""
+    if os.path.isdir(path):
+        return TokenStore.from_dependency_dir(path)
+    return PackedCorpus(path)
+
+
+def write_article_json(store, doc_idx, out_dir, suffix='_dependency.json'):
+    """按 analyze_dependencies.py 的格式写回单篇 JSON"""
+    out_path = os.path.join(out_dir, f"{store.names[doc_idx]}{suffix}")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(store.to_json_obj(doc_idx), f, ensure_ascii=False, indent=2)
+    return out_path
+
+
+def main():
+    ap = argparse.ArgumentParser(description='依存语料二进制打包 / 解包')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    p_pack = sub.add_parser('pack', help='*_dependency.json 目录 -> .depcorpus')
+    p_pack.add_argument('dep_dir')
+    p_pack.add_argument('out_path')
+    p_unpack = sub.add_parser('unpack', help='.depcorpus -> 逐篇 *_dependency.json')
+    p_unpack.add_argument('corpus_path')
+    p_unpack.add_argument('out_dir')
+    args = ap.parse_args()
+
+    if args.cmd == 'pack':
+        store = TokenStore.from_dependency_dir(args.dep_dir)
+        store.save_packed(args.out_path)
+        print(f"✅ 已打包 {store.n_docs} 篇 / {store.n_sentences} 句 / {store.n_tokens} 词 -> {args.out_path}")
+    else:
+        corpus = PackedCorpus(args.corpus_path)
+        os.makedirs(args.out_dir, exist_ok=True)
+        for d in range(corpus.n_docs):
+            write_article_json(corpus, d, args.out_dir)
+        print(f"✅ 已解包 {corpus.n_docs} 篇 -> {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
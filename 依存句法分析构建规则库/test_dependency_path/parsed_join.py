@@ -1,4 +1,8 @@
-import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from token_store import TokenStore
 #--------------------id 与 head 重映射（子句分词结果拼接）-----------------
 def parsed_full(analyzed_sentences):
     """
@@ -50,9 +54,9 @@ def parsed_full(analyzed_sentences):
 
     return parsed_all, char_text
 
-with open(r"dependency_results\大型飞机发动机故障智能诊断方法研究与仿真_dependency.json", encoding = "utf-8") as file:
-    text = json.load(file)
-    analyzed_sentences = text["analyzed_sentences"]
+# 列式加载；analyzed_sentences 中的 parsed 为 SentenceView，按原 token 字典接口使用
+store = TokenStore.from_files([r"dependency_results\大型飞机发动机故障智能诊断方法研究与仿真_dependency.json"])
+analyzed_sentences = store.article(0)["analyzed_sentences"]
 
 parsed_all, char_text = parsed_full(analyzed_sentences)
 print(f"分词拼接结果：{parsed_all}；合并文本：{char_text}")
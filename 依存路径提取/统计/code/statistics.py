@@ -33,6 +33,35 @@ def format_display_path(path_list):
     display_parts = [f"{item[0]}({item[1] or 'N/A'})" for item in path_list]
     return " — ".join(display_parts)
 
+NDJSON_CORPUS_FILENAME = 'corpus_paths.ndjson'
+
+def iter_path_records(path_result_dir):
+    """逐条产出 (标题, 实体对路径记录)。
+    优先读取 dependency_path.py --ndjson 生成的全语料 corpus_paths.ndjson（逐行解析），
+    否则依次读取各篇 *依存路径.ndjson / *依存路径.json；单个文件读取失败只记录日志并跳过。
+    """
+    corpus_fp = os.path.join(path_result_dir, NDJSON_CORPUS_FILENAME)
+    if os.path.isfile(corpus_fp):
+        filenames = [NDJSON_CORPUS_FILENAME]
+    else:
+        filenames = [f for f in os.listdir(path_result_dir) if f.endswith(('依存路径.json', '依存路径.ndjson'))]
+    for filename in filenames:
+        file_title = filename.replace('依存路径.ndjson', '').replace('依存路径.json', '')
+        filepath = os.path.join(path_result_dir, filename)
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                if filename.endswith('.ndjson'):
+                    for line in f:
+                        if line.strip():
+                            pair = json.loads(line)
+                            yield pair.get('title') or file_title, pair
+                else:
+                    data = json.load(f)
+                    for pair in data.get('pairs', []):
+                        yield file_title, pair
+        except Exception as e:
+            logging.error(f"读取路径文件 {filename} 失败: {e}")
+
 def normalize_entity_type(type_str):
     """标准化实体类型标签，处理中英文混用问题"""
     if not isinstance(type_str, str): return "Unknown"
@@ -85,45 +114,41 @@ def main():
     logging.info(f"成功加载了 {len(ground_truth_lookup)} 个实体对的真值信息。")
 
     # --- 2. 聚合数据: 将语义真值和句法路径关联 ---
-    analysis_data = defaultdict(list)
-    path_result_files = [f for f in os.listdir(path_result_dir) if f.endswith('依存路径.json')]
-    for filename in path_result_files:
-        title = filename.replace('依存路径.json', '')
-        filepath = os.path.join(path_result_dir, filename)
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for pair in data.get('pairs', []):
-                    key = (title, pair['subject'], pair['object'])
-                    subj_type, obj_type, relation = ground_truth_lookup.get(key, ('Unknown', 'Unknown', 'N/A'))
-                    
-                    semantic_pattern = f"{subj_type} → {relation} → {obj_type}"
-                    
-                    full_path = pair.get('path')
-                    if not full_path: continue
-
-                    analysis_data[semantic_pattern].append({
-                        "syntactic_key": get_syntactic_path_key(full_path),
-                        "display_path": format_display_path(full_path),
-                        "example": f"[{pair['subject']}] → [{pair['object']}]"
-                    })
-        except Exception as e:
-            logging.error(f"读取路径文件 {filename} 失败: {e}")
-    logging.info(f"成功关联了 {sum(len(v) for v in analysis_data.values())} 条数据。")
+    # 逐条流式累加：每种语义模式只保留句法key计数及其最近一次的展示路径/样例，内存与语料规模无关
+    analysis_data = defaultdict(lambda: {"total": 0, "key_counts": Counter(), "display": {}, "example": {}})
+    for title, pair in iter_path_records(path_result_dir):
+        if 'subject' not in pair or 'object' not in pair:
+            logging.error(f"路径记录缺少 subject/object，已跳过: {title}")
+            continue
+        key = (title, pair['subject'], pair['object'])
+        subj_type, obj_type, relation = ground_truth_lookup.get(key, ('Unknown', 'Unknown', 'N/A'))
+
+        semantic_pattern = f"{subj_type} → {relation} → {obj_type}"
+
+        full_path = pair.get('path')
+        if not full_path: continue
+
+        syntactic_key = get_syntactic_path_key(full_path)
+        agg = analysis_data[semantic_pattern]
+        agg["total"] += 1
+        agg["key_counts"][syntactic_key] += 1
+        agg["display"][syntactic_key] = format_display_path(full_path)
+        agg["example"][syntactic_key] = f"[{pair['subject']}] → [{pair['object']}]"
+    logging.info(f"成功关联了 {sum(v['total'] for v in analysis_data.values())} 条数据。")
 
     # --- 3. 整理与展示 ---
     final_results = []
-    sorted_patterns = sorted(analysis_data.items(), key=lambda item: len(item[1]), reverse=True)
+    sorted_patterns = sorted(analysis_data.items(), key=lambda item: item[1]["total"], reverse=True)
 
-    for semantic_pattern, instances in sorted_patterns:
-        total_frequency = len(instances)
+    for semantic_pattern, agg in sorted_patterns:
+        total_frequency = agg["total"]
         # 统计每种句法路径key的频次
-        syntactic_key_counts = Counter(inst['syntactic_key'] for inst in instances)
+        syntactic_key_counts = agg["key_counts"]
         
         syntactic_details = []
         # 为了展示，我们需要将key映射回一个具体的display_path
-        key_to_display_map = {inst['syntactic_key']: inst['display_path'] for inst in instances}
-        key_to_example_map = {inst['syntactic_key']: inst['example'] for inst in instances}
+        key_to_display_map = agg["display"]
+        key_to_example_map = agg["example"]
 
         for syntactic_key, count in syntactic_key_counts.most_common():
             display_path = key_to_display_map.get(syntactic_key, "N/A")
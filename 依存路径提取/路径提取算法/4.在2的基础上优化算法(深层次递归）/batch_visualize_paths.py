@@ -1,26 +1,53 @@
 import os
 import json
+import argparse
 from datetime import datetime
 
-"""批量依存路径可视化（加入依存树 SVG）"""
+from dependency_path import file_digest, config_fingerprint, load_manifest, save_manifest, TokenStore, open_corpus
+
+"""批量依存路径可视化（加入依存树 SVG）
+
+增量：输出目录下 visualize_manifest.json 记录每篇依存 / 实体对 / 路径结果文件的哈希，
+未变化的文章直接复用上次的统计，不再重新渲染；--force 全量重渲染。
+--corpus 指定打包语料（*.depcorpus）时，依存结果从内存映射中按标题读取。
+"""
+
+VISUALIZE_VERSION = '1'  # 页面模板变化时递增，触发全量重渲染
+VISUALIZE_MANIFEST = 'visualize_manifest.json'
+
+def result_path(result_dir, title):
+    """路径结果文件：优先 json，其次 dependency_path.py --ndjson 的逐行输出"""
+    for ext in ('json', 'ndjson'):
+        path = os.path.join(result_dir, f"{title}依存路径.{ext}")
+        if os.path.isfile(path):
+            return path
+    return None
 
 def load_dependency_result_object(result_dir, title):
-    path = os.path.join(result_dir, f"{title}依存路径.json")
-    if not os.path.isfile(path):
+    path = result_path(result_dir, title)
+    if path is None:
         return None
     with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.ndjson'):
+            return {'title': title, 'pairs': [json.loads(line) for line in f if line.strip()]}
         return json.load(f)
 
-def load_raw_parsed(dep_dir, pair_dir, title):
+def load_raw_parsed(dep_dir, pair_dir, title, corpus=None):
     dep_path = os.path.join(dep_dir, f"{title}_dependency.json")
     pair_path = os.path.join(pair_dir, f"{title}实体对.json")
-    if not os.path.isfile(dep_path) or not os.path.isfile(pair_path):
-        return None
-    with open(dep_path, 'r', encoding='utf-8') as f:
-        dep_data = json.load(f)
+    if corpus is not None:
+        doc_idx = corpus.doc_index(title)
+        if doc_idx is None or not os.path.isfile(pair_path):
+            return None
+        store = corpus
+    else:
+        if not os.path.isfile(dep_path) or not os.path.isfile(pair_path):
+            return None
+        store = TokenStore.from_files([dep_path])
+        doc_idx = 0
     with open(pair_path, 'r', encoding='utf-8') as f:
         pairs = json.load(f)
-    sentences = [s.get('parsed', []) for s in dep_data.get('analyzed_sentences', [])]
+    sentences = store.document_sentences(doc_idx)
     return {"sentences_parsed": sentences, "entity_pairs": pairs}
 
 def adapt_pairs_from_result_obj(result_obj):
@@ -216,6 +243,19 @@ def build_index_html(stats_list, output_dir):
         f.write(html)
     print(f"[OK] 索引生成: {index_path}")
 
+def input_hashes(dep_dir, pair_dir, result_dir, title, corpus=None):
+    hashes = {}
+    for key, path in (
+        ('dep_hash', os.path.join(dep_dir, f"{title}_dependency.json")),
+        ('pairs_hash', os.path.join(pair_dir, f"{title}实体对.json")),
+        ('result_hash', result_path(result_dir, title)),
+    ):
+        hashes[key] = file_digest(path) if path and os.path.isfile(path) else None
+    if corpus is not None:
+        doc_idx = corpus.doc_index(title)
+        hashes['dep_hash'] = corpus.article_digest(doc_idx) if doc_idx is not None else None
+    return hashes
+
 def main():
     base_dir = os.path.abspath(os.path.dirname(__file__))
     dep_dir = os.path.join(base_dir, 'dependency_results')
@@ -223,22 +263,44 @@ def main():
     result_dir = os.path.join(base_dir, '依存路径提取结果')
     output_dir = result_dir
     os.makedirs(output_dir, exist_ok=True)
-    import sys
-    filter_sub = sys.argv[1] if len(sys.argv) > 1 else None
-    dep_files = [f for f in os.listdir(dep_dir) if f.endswith('_dependency.json')]
+    ap = argparse.ArgumentParser()
+    ap.add_argument('filter', nargs='?', default=None, help='只处理标题包含该子串的文章')
+    ap.add_argument('--force', action='store_true', help='忽略 manifest，全量重渲染')
+    ap.add_argument('--corpus', default=None, help='打包语料（*.depcorpus）路径')
+    args = ap.parse_args()
+    force = args.force
+    filter_sub = args.filter
+    corpus = open_corpus(args.corpus) if args.corpus else None
+    if corpus is not None:
+        dep_files = [f"{name}_dependency.json" for name in corpus.names]
+    else:
+        dep_files = [f for f in os.listdir(dep_dir) if f.endswith('_dependency.json')]
     if filter_sub:
         dep_files = [f for f in dep_files if filter_sub in f]
     if not dep_files:
         print('[WARN] 未找到匹配的依存结果文件'); return
+    manifest = load_manifest(output_dir, VISUALIZE_MANIFEST)
+    config_hash = config_fingerprint({'visualize_version': VISUALIZE_VERSION})
+    if manifest['config'] != config_hash:
+        manifest = {'config': config_hash, 'articles': {}}
+    entries = manifest['articles']
     stats_all = []
     log_lines = []
+    seen = set()
     for f in dep_files:
         title = f[:-len('_dependency.json')]
+        seen.add(title)
+        hashes = input_hashes(dep_dir, pair_dir, result_dir, title, corpus)
+        old = entries.get(title)
+        if (not force and old and old.get('hashes') == hashes
+                and os.path.isfile(os.path.join(output_dir, old['stat']['html_file']))):
+            stats_all.append(old['stat'])
+            continue
         result_obj = load_dependency_result_object(result_dir, title)
         if result_obj is None:
-            raw = load_raw_parsed(dep_dir, pair_dir, title)
+            raw = load_raw_parsed(dep_dir, pair_dir, title, corpus)
             if raw is None:
-                msg = f"[MISS] 缺少依存或实体对文件: {title}"; print(msg); log_lines.append(msg); continue
+                msg = f"[MISS] 缺少依存或实体对文件: {title}"; print(msg); log_lines.append(msg); entries.pop(title, None); continue
             sentences_parsed = raw['sentences_parsed']
             pairs_raw = raw['entity_pairs']
             pair_items = [{
@@ -250,13 +312,22 @@ def main():
             } for p in pairs_raw]
         else:
             pair_items = adapt_pairs_from_result_obj(result_obj)
-            raw = load_raw_parsed(dep_dir, pair_dir, title)
+            raw = load_raw_parsed(dep_dir, pair_dir, title, corpus)
             if raw is None:
-                msg = f"[MISS_PARSE] 可视化缺少原始解析: {title}"; print(msg); log_lines.append(msg); continue
+                msg = f"[MISS_PARSE] 可视化缺少原始解析: {title}"; print(msg); log_lines.append(msg); entries.pop(title, None); continue
             sentences_parsed = raw['sentences_parsed']
         stat = render_article_html(title, sentences_parsed, pair_items, output_dir)
+        entries[title] = {'hashes': hashes, 'stat': stat}
         stats_all.append(stat)
         print(f"[DONE] {title} | 路径成功 {stat['path_success']}/{stat['total_pairs']}")
+    if not filter_sub:
+        # 清理输入已不存在的旧页面
+        for title in [t for t in entries if t not in seen]:
+            stale = os.path.join(output_dir, entries.pop(title)['stat']['html_file'])
+            if os.path.isfile(stale):
+                os.remove(stale)
+                log_lines.append(f"[STALE_REMOVED] {title}")
+    save_manifest(output_dir, manifest, VISUALIZE_MANIFEST)
     if stats_all:
         build_index_html(stats_all, output_dir)
     if log_lines:
@@ -1,26 +1,62 @@
+from bisect import bisect_right
 from collections import deque, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
 import json
 import os
 from datetime import datetime
+import re
+import shutil
+import sys
+import time
 import unicodedata
 
+# 共享的列式依存语料表示：依存句法分析构建规则库/scripts/token_store.py
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, os.path.join(REPO_ROOT, '依存句法分析构建规则库', 'scripts'))
+from token_store import SentenceView, TokenStore, open_corpus  # noqa: E402
+
 """
 批量依存路径提取脚本（支持可选跨句最短路径）
 
 新增 / 变化要点：
 1. 配置：
-   ENABLE_CROSS_SENTENCE = True 开启跨句；CROSS_SENTENCE_STRATEGY = 'super_root'
+   ENABLE_CROSS_SENTENCE = True 开启跨句；CROSS_SENTENCE_STRATEGY = 'super_root' / 'adjacent' / 'window'
 2. 句内：保持原逻辑（同一句才做句内 BFS）。
 3. 跨句（super_root）：
    - 为每一句的 root（head==0 的 token）挂到虚拟节点 SUPER_ROOT
    - 构建统一图时给每个 token 分配唯一 key: "{sent_idx}:{token_id}"
    - BFS 时若实体在不同句且允许跨句，则在跨句图中找最短路径
    - 输出中添加 path_type: 'intra_sentence' / 'cross_sentence'
+   跨句（adjacent / window，有界窗口）：
+   - 只为两实体所在句之间的句区间 [lo, hi] 按需构建跨句图，按区间缓存
+   - adjacent：区间内各 root 按句序首尾相连成链，路径长度随句距增长，更偏向邻近句
+   - window：区间内各 root 挂到虚拟节点（同 super_root，但只含区间内的句）
+   - 两者都受 CROSS_SENTENCE_WINDOW 限制：句距超过窗口的实体对不搜索，note 为“超出跨句窗口”
 4. 输出记录：
    - 对跨句成功的路径同样给出 path（去掉 SUPER_ROOT），并提供 path_positions 以便后续可视化
 5. stats 新增：
    cross_sentence_pairs（实体位于不同句的对数）
    cross_sentence_path_found（其中成功找到跨句路径的数量）
+6. 路径搜索（PathEngine）：
+   - 每句依存图按文章只构建一次，所有实体对共享
+   - BFS 使用 parent 指针而非复制整条路径；同一起点的 BFS 结果缓存复用
+   - 依存树为森林时使用 TreeIndex（Euler 序 + 稀疏表）做 LCA 查询，路径与 BFS 完全一致
+7. 实体对齐（AlignmentIndex）：
+   - 文章级索引只构建一次，Aho-Corasick 一次扫描解析全部实体，选择顺序与逐句滑窗一致
+8. 增量批处理：
+   - 输出目录下 manifest.json 记录每篇输入文件（依存 / 实体对）的内容哈希与配置指纹
+   - 仅重算输入或配置有变化的文章，输入已消失的文章其旧输出会被清理；--force 全量重算
+9. 并行：--workers N 以进程池跨文章并行；各进程返回自身日志与 stats，
+   主进程按文件顺序合并，log.txt 与串行结果一致；全语料汇总写入 corpus_stats.json
+10. 数据表示：依存结果载入共享的 TokenStore（列式 NumPy 存储，见 依存句法分析构建规则库/scripts/token_store.py），
+   句内 / 跨句图的依存边直接由数组运算得到；--corpus 可改读内存映射的打包语料（*.depcorpus）
+11. 流式输出：--ndjson 时每篇写紧凑的 {title}依存路径.ndjson（一行一个实体对，记录带 title），
+   批处理结束按文件顺序拼接为全语料的 corpus_paths.ndjson，下游可逐行读取、常量内存统计
+12. 性能剖析（可选）：--profile 时记录分阶段耗时（读 JSON / 对齐 / 锚点 / 建图 / 搜索 / span 扩展 / 写出，
+   嵌套阶段只计自身时间）与计数（图规模、BFS 访问节点数、LCA 查询等），逐篇与汇总结果只写入
+   profile.json（带算法版本与配置，便于不同版本间对比），文章输出不变；剖析时不复用 manifest，全部文章重算
 
 保持兼容：
 - 原先 path 仍为 list[ (form, deprel) ]
@@ -28,16 +64,207 @@ import unicodedata
 
 后续可扩展点（未实现）：
 - 改进实体匹配（最长匹配 / 覆盖率阈值）
-- 多种跨句策略（链式、窗口等）
 - 模式库与路径签名
 """
 
 # ================== 配置 ==================
 ENABLE_CROSS_SENTENCE = True
-CROSS_SENTENCE_STRATEGY = 'super_root'  # 目前仅实现 super_root
+CROSS_SENTENCE_STRATEGY = 'super_root'  # 'super_root'（全文） / 'adjacent'（相邻句链式） / 'window'（句窗口）
+CROSS_SENTENCE_STRATEGIES = ('super_root', 'adjacent', 'window')
+CROSS_SENTENCE_WINDOW = 3  # adjacent / window 策略允许的最大句距（None 为不限）；super_root 不受限
+ALGORITHM_VERSION = '4'  # 路径算法版本（对应 路径提取算法/4.*），变更后增量批处理会全量重算
+MANIFEST_FILENAME = 'manifest.json'
+PROFILE_FILENAME = 'profile.json'
+NDJSON_CORPUS_FILENAME = 'corpus_paths.ndjson'
 # ========================================
 
 
+# ================== 增量批处理 manifest ==================
+def file_digest(path):
+    """文件内容的 sha256（十六进制）"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def config_fingerprint(config):
+    """配置字典的稳定哈希，用于判断配置是否变化"""
+    raw = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def load_manifest(output_dir, filename=MANIFEST_FILENAME):
+    path = os.path.join(output_dir, filename)
+    if not os.path.isfile(path):
+        return {"config": None, "articles": {}}
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"config": None, "articles": {}}
+    manifest.setdefault("config", None)
+    manifest.setdefault("articles", {})
+    return manifest
+
+
+def save_manifest(output_dir, manifest, filename=MANIFEST_FILENAME):
+    path = os.path.join(output_dir, filename)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def cross_sentence_config():
+    """写入输出与 manifest 的跨句配置；窗口仅对有界策略有意义"""
+    config = {
+        "enable_cross_sentence": ENABLE_CROSS_SENTENCE,
+        "cross_sentence_strategy": CROSS_SENTENCE_STRATEGY if ENABLE_CROSS_SENTENCE else None,
+    }
+    if ENABLE_CROSS_SENTENCE and CROSS_SENTENCE_STRATEGY != 'super_root':
+        config["cross_sentence_window"] = CROSS_SENTENCE_WINDOW
+    return config
+
+
+def set_cross_sentence_config(strategy=None, window=None):
+    """命令行覆盖跨句配置；window 为负数表示不限句距"""
+    global CROSS_SENTENCE_STRATEGY, CROSS_SENTENCE_WINDOW
+    if strategy is not None:
+        if strategy not in CROSS_SENTENCE_STRATEGIES:
+            raise ValueError(f"未知跨句策略: {strategy}")
+        CROSS_SENTENCE_STRATEGY = strategy
+    if window is not None:
+        CROSS_SENTENCE_WINDOW = window if window >= 0 else None
+
+
+def path_config():
+    return {
+        "algorithm_version": ALGORITHM_VERSION,
+        **cross_sentence_config(),
+    }
+# ========================================================
+
+
+def article_output_name(title, output_format='json'):
+    return f"{title}依存路径.{output_format}"
+
+
+def write_article_ndjson(out_path, title, article_results):
+    """一行一个实体对的紧凑记录；每行自带 title，拼接成全语料文件后仍可独立解析"""
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for rec in article_results:
+            f.write(json.dumps({"title": title, **rec}, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def concat_ndjson(output_dir, output_names, filename=NDJSON_CORPUS_FILENAME):
+    """按给定顺序把各篇 ndjson 流式拼接为全语料文件（逐块复制，不整体载入）"""
+    path = os.path.join(output_dir, filename)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        for name in output_names:
+            part = os.path.join(output_dir, name)
+            if os.path.isfile(part):
+                with open(part, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+    os.replace(tmp_path, path)
+    return path
+
+
+# ================== 分阶段计时 / 计数 ==================
+class StageProfiler:
+    """
+    可选的分阶段计时与计数。stage() 可嵌套，外层阶段在内层执行期间暂停计时，
+    因此各阶段耗时互不重叠、相加即总耗时。enabled=False 时全部为空操作。
+    """
+
+    class _Stage:
+        __slots__ = ("profiler", "name")
+
+        def __init__(self, profiler, name):
+            self.profiler = profiler
+            self.name = name
+
+        def __enter__(self):
+            self.profiler._push(self.name)
+
+        def __exit__(self, *exc):
+            self.profiler._pop()
+
+    class _NullStage:
+        def __enter__(self):
+            pass
+
+        def __exit__(self, *exc):
+            pass
+
+    _NULL_STAGE = _NullStage()
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.times = defaultdict(float)
+        self.counters = defaultdict(int)
+        self._stack = []
+
+    def stage(self, name):
+        return self._Stage(self, name) if self.enabled else self._NULL_STAGE
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def _push(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.times[parent[0]] += now - parent[1]
+        self._stack.append([name, now])
+
+    def _pop(self):
+        now = time.perf_counter()
+        name, start = self._stack.pop()
+        self.times[name] += now - start
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def to_dict(self):
+        return {
+            "times_ms": {k: round(v * 1000, 3) for k, v in self.times.items()},
+            "counters": dict(self.counters),
+        }
+
+
+NULL_PROFILER = StageProfiler(enabled=False)
+
+
+def merge_profiles(profiles):
+    """逐篇 profile 按阶段 / 计数器求和"""
+    times = defaultdict(float)
+    counters = defaultdict(int)
+    for prof in profiles:
+        for k, v in prof.get("times_ms", {}).items():
+            times[k] += v
+        for k, v in prof.get("counters", {}).items():
+            counters[k] += v
+    return {
+        "articles": len(profiles),
+        "times_ms": {k: round(v, 3) for k, v in times.items()},
+        "counters": dict(counters),
+    }
+
+
+IGNORED_FORMS = {"的", "地", "得", "之", "和", "与", "及", "等", "、"}
+
+
+def norm_text(s: str) -> str:
+    return re.sub(r"\s+", "", (s or "").lower())
+
+
+def is_punct(s: str) -> bool:
+    return bool(s) and all(unicodedata.category(ch).startswith('P') for ch in s)
+
+
 def find_entity_token_span(entity_text, tokens):
     """
     在 tokens 中查找与 entity_text 匹配的连续 token span，返回 (start_id, end_id)。
@@ -46,63 +273,213 @@ def find_entity_token_span(entity_text, tokens):
     选择策略：
     - 首选“精确匹配”（忽略词后拼接 == 实体规范化），在多个候选中优先窗口更短、起点更靠前。
     - 若无精确匹配，则采用原策略的“被实体包含/实体被覆盖”。
+
+    实现见 AlignmentIndex（单句即只含一句的索引）。
     """
-    import re
-    def norm_text(s: str) -> str:
-        return re.sub(r"\s+", "", (s or "").lower())
+    found = AlignmentIndex([tokens]).locate(entity_text)
+    return found[1] if found else None
 
-    norm = norm_text(entity_text)
-    if not norm:
-        return None
 
-    raw_forms = [str(t.get("form", "")) for t in tokens]
-    forms = [norm_text(x) for x in raw_forms]
+class AhoCorasick:
+    """多模式串匹配自动机：一次扫描文本即可得到全部模式的所有（含重叠）出现位置"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pi, pat in enumerate(self.patterns):
+            node = 0
+            for ch in pat:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(pi)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter_matches(self, text):
+        """产出 (start, end, pattern_index)，end 为开区间"""
+        goto, fail, out, patterns = self.goto, self.fail, self.out, self.patterns
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pi in out[node]:
+                yield pos + 1 - len(patterns[pi]), pos + 1, pi
+
+
+class AlignmentIndex:
+    """
+    文章级实体对齐索引（替代逐句 O(n²) 滑窗拼接）：
+    - 每个 token 的规范化形式与“可忽略”标记只计算一次；
+    - 各句非忽略 token 拼成一段文本（句间以换行分隔，规范化后的实体不可能含空白），
+      并记录每个 token 的字符偏移 [start, end)，字符位置 -> token 用二分查找得到；
+    - 实体的“精确 / 覆盖”候选来自 Aho-Corasick 在该文本上的一次扫描，
+      “被实体包含”候选来自规范化词形倒排表；
+    - “被包含”候选不再逐 token 拼接字符串：从每个 token 起点二分出仍为实体子串的最长长度，
+      再在 token 结束偏移上二分得到最远的 token；
+    - 选择顺序与原逐句扫描完全一致：按句序取第一个有候选的句子，句内 精确 > 被包含 > 覆盖。
+    """
+
+    def __init__(self, sentences_parsed):
+        self.sentences = []
+        self.form_first_sent = {}
+        self.max_form_len = 0
+        # 全文 token 起始偏移（升序）及其 (句, 句内下标)
+        self.tok_starts = []
+        self.tok_loc = []
+        self._cache = {}
+        self._occurrences = {}
+        pieces = []
+        offset = 0
+        for si, tokens in enumerate(sentences_parsed):
+            ids = [t.get("id") for t in tokens]
+            pos, forms, starts, ends = [], [], [], []
+            for i, t in enumerate(tokens):
+                raw = str(t.get("form", ""))
+                form = norm_text(raw)
+                if not form or form in IGNORED_FORMS or is_punct(raw):
+                    continue
+                k = len(forms)
+                pos.append(i)
+                forms.append(form)
+                starts.append(offset)
+                pieces.append(form)
+                self.tok_starts.append(offset)
+                self.tok_loc.append((si, k))
+                offset += len(form)
+                ends.append(offset)
+                if form not in self.form_first_sent:
+                    self.form_first_sent[form] = si
+                if len(form) > self.max_form_len:
+                    self.max_form_len = len(form)
+            self.sentences.append({"ids": ids, "pos": pos, "forms": forms, "starts": starts, "ends": ends})
+            pieces.append("\n")
+            offset += 1
+        self.text = "".join(pieces)
+
+    def prepare(self, entity_texts):
+        """对一批实体做一次多模式扫描，记录每个规范化实体在各句的出现位置"""
+        norms = []
+        for e in entity_texts:
+            n = norm_text(e)
+            if n and n not in self._occurrences and n not in norms:
+                norms.append(n)
+        if not norms:
+            return
+        for n in norms:
+            self._occurrences[n] = {}
+        ac = AhoCorasick(norms)
+        for a, b, pi in ac.iter_matches(self.text):
+            # 出现位置不含换行，首尾字符必落在同一句的 token 内
+            si, i = self.tok_loc[bisect_right(self.tok_starts, a) - 1]
+            j = self.tok_loc[bisect_right(self.tok_starts, b - 1) - 1][1]
+            self._occurrences[norms[pi]].setdefault(si, []).append((i, j))
 
-    def is_punct(s: str) -> bool:
-        return bool(s) and all(unicodedata.category(ch).startswith('P') for ch in s)
-    IGNORED_FORMS = {"的", "地", "得", "之", "和", "与", "及", "等", "、"}
-    ignored = [(forms[i] in IGNORED_FORMS) or is_punct(raw_forms[i]) for i in range(len(tokens))]
+    def locate(self, entity_text):
+        """返回 (sentence_index, (start_id, end_id)) 或 None"""
+        if entity_text in self._cache:
+            return self._cache[entity_text]
+        norm = norm_text(entity_text)
+        result = None
+        if norm:
+            if norm not in self._occurrences:
+                self.prepare([norm])
+            occ = self._occurrences[norm]
+            best = min(occ) if occ else len(self.sentences)
+            # 句中存在某个 token 是实体的子串 -> 该句有“被包含”候选
+            contained_sent = len(self.sentences)
+            L = len(norm)
+            for i in range(L):
+                for j in range(i + 1, min(L, i + self.max_form_len) + 1):
+                    si = self.form_first_sent.get(norm[i:j])
+                    if si is not None and si < contained_sent:
+                        contained_sent = si
+            best = min(best, contained_sent)
+            if best < len(self.sentences):
+                span = self._span_in_sentence(best, norm, occ.get(best, []), best == contained_sent)
+                result = (best, span)
+        self._cache[entity_text] = result
+        return result
 
-    ids = [t.get("id") for t in tokens]
+    def _span_in_sentence(self, si, norm, occurrences, has_contained):
+        sent = self.sentences[si]
+        ids, pos, forms, starts, ends = sent["ids"], sent["pos"], sent["forms"], sent["starts"], sent["ends"]
 
-    exact = []      # (window_len, start, end)
-    contained = []  # (joined_len, start, end)
-    covering = []   # (joined_len, start, end)
+        def window_start(i):
+            # 包含前导可忽略 token 的最小起点
+            return pos[i - 1] + 1 if i > 0 else 0
 
-    n = len(tokens)
-    for s in range(n):
-        joined = ""
-        for e in range(s, n):
-            if not ignored[e]:
-                joined += forms[e]
-            if not joined:
+        # 精确：出现位置恰好落在 token 边界上，取窗口最短、起点最前
+        exact = None
+        for i, j in occurrences:
+            joined_len = ends[j] - starts[i]
+            if joined_len != len(norm):
                 continue
-            if joined == norm:
-                exact.append((e - s + 1, s, e))
-            elif joined in norm:
-                contained.append((len(joined), s, e))
-            elif norm in joined:
-                covering.append((len(joined), s, e))
-
-    if exact:
-        # 精确匹配：优先窗口更短，再按起点更小
-        exact.sort(key=lambda x: (x[0], x[1]))
-        _, s, e = exact[0]
-        return (ids[s], ids[e])
-    if contained:
-        contained.sort(key=lambda x: (-x[0], x[1]))
-        _, s, e = contained[0]
-        return (ids[s], ids[e])
-    if covering:
-        covering.sort(key=lambda x: (x[0], x[1]))
-        _, s, e = covering[0]
-        return (ids[s], ids[e])
-    return None
+            cand = (pos[j] - pos[i] + 1, pos[i], pos[j])
+            if exact is None or cand < exact:
+                exact = cand
+        if exact:
+            return (ids[exact[1]], ids[exact[2]])
+
+        # 被实体包含：每个起点向右扩展到仍为实体子串的最长位置，取拼接最长、起点最前
+        if has_contained and forms:
+            best = None
+            text = self.text
+            for i in range(len(forms)):
+                p = starts[i]
+                # 实体子串的前缀仍是实体子串（单调），二分出自 p 起最长的实体子串长度
+                lo, hi = 0, min(len(norm), ends[-1] - p)
+                while lo < hi:
+                    mid = (lo + hi + 1) // 2
+                    if text[p:p + mid] in norm:
+                        lo = mid
+                    else:
+                        hi = mid - 1
+                last = bisect_right(ends, p + lo) - 1
+                if last < i:
+                    continue
+                joined_len = ends[last] - p
+                if best is None or joined_len > best[0]:
+                    best = (joined_len, i, last)
+            if best:
+                return (ids[window_start(best[1])], ids[pos[best[2]]])
+
+        # 覆盖实体：取拼接最短、起点最前
+        cover = None
+        for i, j in occurrences:
+            cand = (ends[j] - starts[i], i, j)
+            if cover is None or cand < cover:
+                cover = cand
+        if cover:
+            return (ids[window_start(cover[1])], ids[pos[cover[2]]])
+        return None
 
 
 def build_dependency_graph(parsed_tokens):
-    """句内：将单句 parsed tokens 构建为无向图"""
+    """句内：将单句 parsed tokens 构建为无向图（SentenceView 时依存边由列数组直接取出）"""
     graph = defaultdict(list)
+    if isinstance(parsed_tokens, SentenceView):
+        child_ids, head_ids = parsed_tokens.edges()
+        for c, h in zip(child_ids.tolist(), head_ids.tolist()):
+            graph[c].append(h)
+            graph[h].append(c)
+        return graph, dict(zip(parsed_tokens.ids.tolist(), parsed_tokens.tokens()))
     id_to_token = {}
     for token in parsed_tokens:
         token_id = token["id"]
@@ -115,35 +492,67 @@ def build_dependency_graph(parsed_tokens):
     return graph, id_to_token
 
 
+def bfs_parents(graph, start, target=None):
+    """
+    parent 指针 BFS：返回 {node: parent}（start 的 parent 为 None）。
+    给定 target 时找到即停止；否则遍历 start 所在的整个连通分量，供多个终点复用。
+    队列中只保存节点本身，不再复制整条路径。
+    """
+    parents = {start: None}
+    if start == target:
+        return parents
+    queue = deque([start])
+    while queue:
+        cur = queue.popleft()
+        for nb in graph.get(cur, ()):
+            if nb in parents:
+                continue
+            parents[nb] = cur
+            if nb == target:
+                return parents
+            queue.append(nb)
+    return parents
+
+
+def path_from_parents(parents, end):
+    """沿 parent 指针回溯出 start -> end 的节点序列；end 不可达时返回 None"""
+    if end not in parents:
+        return None
+    path = []
+    cur = end
+    while cur is not None:
+        path.append(cur)
+        cur = parents[cur]
+    path.reverse()
+    return path
+
+
 def find_shortest_dependency_path(graph, id_to_token, start_id, end_id):
     """返回 start_id 到 end_id 的最短路径上的 token 列表（句内）"""
-    queue = deque([[start_id]])
-    visited = set()
-    while queue:
-        path = queue.popleft()
-        cur = path[-1]
-        if cur == end_id:
-            return [id_to_token[nid] for nid in path]
-        if cur in visited:
-            continue
-        visited.add(cur)
-        for nb in graph[cur]:
-            if nb not in visited:
-                queue.append(path + [nb])
-    return None
+    path = path_from_parents(bfs_parents(graph, start_id, end_id), end_id)
+    if path is None:
+        return None
+    return [id_to_token[nid] for nid in path]
 
 
-# ================== 跨句图构建（super_root 策略） ==================
-def build_cross_sentence_graph(sentences_parsed):
+# ================== 跨句图构建 ==================
+def build_cross_sentence_graph(sentences_parsed, strategy='super_root', lo=0, hi=None):
     """
+    以句区间 [lo, hi]（默认全文）构建跨句图。
     返回：graph, id_to_token, super_root_key
     graph: key -> list[key]  (key 为 "sent_idx:token_id" 或 "SUPER_ROOT")
     id_to_token: key -> token扩展字典 { ..., sentence_index, global_id }
+    strategy:
+      'super_root' / 'window'：区间内每个 root 挂到虚拟节点 SUPER_ROOT
+      'adjacent'：区间内的 root 按句序（句内按 token 序）依次相连，无虚拟节点（super_root_key 为 None）
     """
+    if hi is None:
+        hi = len(sentences_parsed) - 1
     graph = defaultdict(list)
     id_to_token = {}
     root_keys = []
-    for sent_idx, tokens in enumerate(sentences_parsed):
+    for sent_idx in range(lo, hi + 1):
+        tokens = sentences_parsed[sent_idx]
         # 先建立本句节点
         local_index = {tok["id"]: f"{sent_idx}:{tok['id']}" for tok in tokens}
         for tok in tokens:
@@ -154,6 +563,13 @@ def build_cross_sentence_graph(sentences_parsed):
                 "global_id": key
             }
         # 句内边
+        if isinstance(tokens, SentenceView):
+            child_ids, head_ids = tokens.edges(internal_only=True)
+            for c, h in zip(child_ids.tolist(), head_ids.tolist()):
+                graph[local_index[c]].append(local_index[h])
+                graph[local_index[h]].append(local_index[c])
+            root_keys.extend(local_index[r] for r in tokens.root_ids().tolist())
+            continue
         for tok in tokens:
             if tok["head"] != 0:
                 child_key = local_index[tok["id"]]
@@ -165,6 +581,12 @@ def build_cross_sentence_graph(sentences_parsed):
                 # root token
                 root_keys.append(local_index[tok["id"]])
 
+    if strategy == 'adjacent':
+        for a, b in zip(root_keys, root_keys[1:]):
+            graph[a].append(b)
+            graph[b].append(a)
+        return graph, id_to_token, None
+
     super_root_key = "SUPER_ROOT"
     for rk in root_keys:
         graph[super_root_key].append(rk)
@@ -175,30 +597,244 @@ def build_cross_sentence_graph(sentences_parsed):
 
 def bfs_shortest_path(graph, start_key, end_key):
     """通用 BFS（跨句用），返回 key 序列"""
-    queue = deque([[start_key]])
-    visited = set()
-    while queue:
-        path = queue.popleft()
-        cur = path[-1]
-        if cur == end_key:
+    return path_from_parents(bfs_parents(graph, start_key, end_key), end_key)
+
+
+class TreeIndex:
+    """
+    依存树（森林）上的 LCA 索引：parent / depth 数组 + Euler 序 + 稀疏表（RMQ）。
+    单句依存分析与 super_root 跨句图都是树，任意两点间路径唯一，
+    因此 LCA 给出的路径与 BFS 最短路径完全一致；查询 O(1) 求 LCA，O(路径长度) 还原路径。
+    若输入图不是森林（存在环 / 重边，如解析异常），is_forest 为 False，调用方应回退 BFS。
+    """
+
+    def __init__(self, graph):
+        nodes = list(graph.keys())
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.nodes = nodes
+        n = len(nodes)
+        self.parent = [-1] * n
+        self.depth = [0] * n
+        self.comp = [-1] * n
+        children = [[] for _ in range(n)]
+        roots = []
+        for i in range(n):
+            if self.comp[i] != -1:
+                continue
+            self.comp[i] = len(roots)
+            roots.append(i)
+            queue = deque([i])
+            while queue:
+                cur = queue.popleft()
+                for nb in graph[nodes[cur]]:
+                    j = self.index[nb]
+                    if self.comp[j] != -1:
+                        continue
+                    self.comp[j] = self.comp[i]
+                    self.parent[j] = cur
+                    self.depth[j] = self.depth[cur] + 1
+                    children[cur].append(j)
+                    queue.append(j)
+
+        edge_count = sum(len(graph[node]) for node in nodes) // 2
+        self.is_forest = edge_count == n - len(roots)
+        if not self.is_forest:
+            return
+
+        # Euler 序：每个节点在进入及每个子树返回后各记一次
+        euler = []
+        self.first = [0] * n
+        for r in roots:
+            stack = [(r, 0)]
+            self.first[r] = len(euler)
+            euler.append(r)
+            while stack:
+                node, ci = stack[-1]
+                if ci < len(children[node]):
+                    stack[-1] = (node, ci + 1)
+                    child = children[node][ci]
+                    self.first[child] = len(euler)
+                    euler.append(child)
+                    stack.append((child, 0))
+                else:
+                    stack.pop()
+                    if stack:
+                        euler.append(stack[-1][0])
+        self.euler = euler
+
+        # 稀疏表：sparse[k][i] = euler[i : i + 2^k] 中 depth 最小的节点
+        depth = self.depth
+        sparse = [euler[:]]
+        k = 1
+        while (1 << k) <= len(euler):
+            prev = sparse[-1]
+            half = 1 << (k - 1)
+            row = []
+            for i in range(len(euler) - (1 << k) + 1):
+                a, b = prev[i], prev[i + half]
+                row.append(a if depth[a] <= depth[b] else b)
+            sparse.append(row)
+            k += 1
+        self.sparse = sparse
+
+    def lca(self, u, v):
+        """返回节点下标 u, v 的最近公共祖先下标；不在同一连通分量时返回 -1"""
+        if self.comp[u] != self.comp[v]:
+            return -1
+        lo, hi = self.first[u], self.first[v]
+        if lo > hi:
+            lo, hi = hi, lo
+        k = (hi - lo + 1).bit_length() - 1
+        a, b = self.sparse[k][lo], self.sparse[k][hi - (1 << k) + 1]
+        return a if self.depth[a] <= self.depth[b] else b
+
+    def path(self, start, end):
+        """start -> end 的节点序列（与 BFS 结果一致）；不可达返回 None"""
+        if start == end:
+            return [start]
+        u, v = self.index.get(start), self.index.get(end)
+        if u is None or v is None:
+            return None
+        a = self.lca(u, v)
+        if a < 0:
+            return None
+        up = []
+        while u != a:
+            up.append(u)
+            u = self.parent[u]
+        down = []
+        while v != a:
+            down.append(v)
+            v = self.parent[v]
+        up.append(a)
+        up.extend(reversed(down))
+        return [self.nodes[i] for i in up]
+
+
+class PathEngine:
+    """
+    单篇文章的路径查询引擎：
+    - 每句的依存图在首次用到时构建一次，之后所有实体对复用；
+    - 以 (图, 起点) 为键缓存整棵 BFS parent 表，共享同一主语锚点的实体对只搜索一次；
+    - 跨句图按需构建：super_root 为全文一张图；adjacent / window 只为实体所在句区间建图，按区间缓存，
+      句距超过 window 时不建图，搜索代价只与窗口大小有关；
+    - 图为森林时（正常解析结果总是如此）改用 TreeIndex 的 LCA 查询，BFS 仅作兜底。
+    """
+
+    def __init__(self, sentences_parsed, cross_graph=None, cross_id_map=None,
+                 cross_strategy='super_root', cross_window=None, profiler=None):
+        self.sentences_parsed = sentences_parsed
+        self.profiler = profiler or NULL_PROFILER
+        self.cross_strategy = cross_strategy
+        self.cross_window = cross_window
+        self._cross_graphs = {}
+        if cross_graph is not None:
+            self._cross_graphs[None] = (cross_graph, cross_id_map, "SUPER_ROOT")
+        self._sentence_graphs = {}
+        self._parents_cache = {}
+        self._tree_indexes = {}
+
+    def sentence_graph(self, sent_idx):
+        g = self._sentence_graphs.get(sent_idx)
+        if g is None:
+            prof = self.profiler
+            with prof.stage("graph_build"):
+                g = build_dependency_graph(self.sentences_parsed[sent_idx])
+            self._sentence_graphs[sent_idx] = g
+            if prof.enabled:
+                prof.count("sentence_graphs_built")
+                prof.count("sentence_graph_nodes", len(g[1]))
+                prof.count("sentence_graph_edges", sum(len(v) for v in g[0].values()) // 2)
+        return g
+
+    def _tree_index(self, cache_key, graph):
+        idx = self._tree_indexes.get(cache_key)
+        if idx is None:
+            with self.profiler.stage("graph_build"):
+                idx = TreeIndex(graph)
+            self._tree_indexes[cache_key] = idx
+            self.profiler.count("tree_index_nodes", len(idx.nodes))
+        return idx
+
+    def _parents(self, cache_key, graph, start):
+        parents = self._parents_cache.get(cache_key)
+        if parents is None:
+            parents = bfs_parents(graph, start)
+            self._parents_cache[cache_key] = parents
+            self.profiler.count("bfs_runs")
+            self.profiler.count("bfs_nodes_visited", len(parents))
+        return parents
+
+    def _count_lca(self, path):
+        self.profiler.count("lca_queries")
+        if path:
+            self.profiler.count("lca_path_nodes", len(path))
+
+    def intra_path(self, sent_idx, start_id, end_id):
+        """句内最短路径，返回 token 列表或 None"""
+        graph, id_to_token = self.sentence_graph(sent_idx)
+        idx = self._tree_index(("intra", sent_idx), graph)
+        if idx.is_forest:
+            path = idx.path(start_id, end_id)
+            self._count_lca(path)
+        else:
+            parents = self._parents(("intra", sent_idx, start_id), graph, start_id)
+            path = path_from_parents(parents, end_id)
+        if path is None:
+            return None
+        return [id_to_token[nid] for nid in path]
+
+    def _cross_range_key(self, sent_a, sent_b):
+        if self.cross_strategy == 'super_root':
+            return None
+        return (min(sent_a, sent_b), max(sent_a, sent_b))
+
+    def cross_graph(self, sent_a, sent_b):
+        """
+        覆盖句 sent_a、sent_b 的跨句图 (graph, id_to_token, super_root_key)；
+        有界策略下句距超过窗口时返回 None。
+        """
+        range_key = self._cross_range_key(sent_a, sent_b)
+        if range_key is not None and self.cross_window is not None and range_key[1] - range_key[0] > self.cross_window:
+            return None
+        cross = self._cross_graphs.get(range_key)
+        if cross is None:
+            prof = self.profiler
+            with prof.stage("graph_build"):
+                if range_key is None:
+                    cross = build_cross_sentence_graph(self.sentences_parsed)
+                else:
+                    cross = build_cross_sentence_graph(self.sentences_parsed, self.cross_strategy, *range_key)
+            self._cross_graphs[range_key] = cross
+            if prof.enabled:
+                prof.count("cross_graphs_built")
+                prof.count("cross_graph_nodes", len(cross[0]))
+                prof.count("cross_graph_edges", sum(len(v) for v in cross[0].values()) // 2)
+        return cross
+
+    def cross_path(self, start_key, end_key):
+        """跨句最短路径，返回 key 序列或 None"""
+        sent_a, sent_b = (int(key.split(':', 1)[0]) for key in (start_key, end_key))
+        cross = self.cross_graph(sent_a, sent_b)
+        if cross is None:
+            return None
+        graph = cross[0]
+        range_key = self._cross_range_key(sent_a, sent_b)
+        idx = self._tree_index(("cross", range_key), graph)
+        if idx.is_forest:
+            path = idx.path(start_key, end_key)
+            self._count_lca(path)
             return path
-        if cur in visited:
-            continue
-        visited.add(cur)
-        for nb in graph[cur]:
-            if nb not in visited:
-                queue.append(path + [nb])
-    return None
+        parents = self._parents(("cross", range_key, start_key), graph, start_key)
+        return path_from_parents(parents, end_key)
+
+
 # ===============================================================
 
 
 def find_entity_in_sentences(entity_text, sentences_parsed):
     """返回 (sentence_index, span_ids) 或 None"""
-    for idx, sent in enumerate(sentences_parsed):
-        span = find_entity_token_span(entity_text, sent)
-        if span:
-            return idx, span
-    return None
+    return AlignmentIndex(sentences_parsed).locate(entity_text)
 
 
 # ============== 实体 span 覆盖与锚点辅助 ==============
@@ -304,29 +940,56 @@ def expand_cross_path_with_spans(base_path_tokens, subj_sent, subj_span_ids, obj
     return final
 
 
-def extract_paths_for_article(dep_json_path, entity_pairs_path, output_dir, log_lines):
+def extract_paths_for_article(dep_json_path, entity_pairs_path, output_dir, log_lines, corpus=None,
+                              output_format='json', profile=False):
+    """
+    corpus 为已打开的 TokenStore / PackedCorpus 时，按标题从中取该篇依存结果，
+    dep_json_path 只用于确定标题（可以不存在）。
+    output_format 为 'ndjson' 时写一行一对的紧凑记录（stats 仅保留在返回值 / manifest 中）。
+    profile 为 True 时返回的 stats 附带 "profile"（分阶段耗时与计数，含写出）；写出的文章文件不含 profile，
+    输出与是否剖析无关。
+    """
+    prof = StageProfiler() if profile else NULL_PROFILER
     title = os.path.basename(dep_json_path)[:-len("_dependency.json")]
-    try:
-        with open(dep_json_path, encoding='utf-8') as f:
-            dep_data = json.load(f)
-    except Exception as e:
-        log_lines.append(f"[ERROR] 读取依存文件失败 {title}: {e}")
-        return
+    if corpus is not None:
+        doc_idx = corpus.doc_index(title)
+        if doc_idx is None:
+            log_lines.append(f"[ERROR] 读取依存文件失败 {title}: 语料中无此标题")
+            return
+        store = corpus
+    else:
+        try:
+            with prof.stage("read_json"), open(dep_json_path, encoding='utf-8') as f:
+                dep_data = json.load(f)
+        except Exception as e:
+            log_lines.append(f"[ERROR] 读取依存文件失败 {title}: {e}")
+            return
+        # 列式存储：token 列为 NumPy 数组，句视图兼容原 parsed 列表接口
+        with prof.stage("store_build"):
+            store = TokenStore.from_articles([dep_data])
+        doc_idx = 0
+        del dep_data
 
     try:
-        with open(entity_pairs_path, encoding='utf-8') as f:
+        with prof.stage("read_json"), open(entity_pairs_path, encoding='utf-8') as f:
             entity_pairs = json.load(f)
     except Exception as e:
         log_lines.append(f"[ERROR] 读取实体对文件失败 {title}: {e}")
         return
 
-    analyzed_sentences = dep_data.get("analyzed_sentences", [])
-    sentences_parsed = [s.get("parsed", []) for s in analyzed_sentences]
+    sentences_parsed = store.document_sentences(doc_idx)
+    if prof.enabled:
+        prof.count("sentences", len(sentences_parsed))
+        prof.count("tokens", sum(len(sent) for sent in sentences_parsed))
+
+    # 文章级对齐索引：一次扫描解析全部主语 / 宾语
+    with prof.stage("alignment"):
+        aligner = AlignmentIndex(sentences_parsed)
+        aligner.prepare([p["subject"] for p in entity_pairs] + [p["object"] for p in entity_pairs])
 
-    # 若需要跨句，提前构建跨句图
-    cross_graph = cross_id_map = cross_super_root = None
-    if ENABLE_CROSS_SENTENCE and CROSS_SENTENCE_STRATEGY == 'super_root' and sentences_parsed:
-        cross_graph, cross_id_map, cross_super_root = build_cross_sentence_graph(sentences_parsed)
+    # 跨句图由引擎按需构建（super_root 全文一张；adjacent / window 按句区间）
+    engine = PathEngine(sentences_parsed, cross_strategy=CROSS_SENTENCE_STRATEGY, cross_window=CROSS_SENTENCE_WINDOW,
+                        profiler=prof)
 
     article_results = []
     total_pairs = len(entity_pairs)
@@ -334,10 +997,12 @@ def extract_paths_for_article(dep_json_path, entity_pairs_path, output_dir, log_
     path_found = 0
     cross_sentence_pairs = 0
     cross_sentence_path_found = 0
+    cross_sentence_out_of_window = 0
 
     for pair in entity_pairs:
-        subj_info = find_entity_in_sentences(pair["subject"], sentences_parsed)
-        obj_info = find_entity_in_sentences(pair["object"], sentences_parsed)
+        with prof.stage("alignment"):
+            subj_info = aligner.locate(pair["subject"])
+            obj_info = aligner.locate(pair["object"])
 
         if not subj_info or not obj_info:
             note = "实体至少一端未找到"
@@ -362,19 +1027,21 @@ def extract_paths_for_article(dep_json_path, entity_pairs_path, output_dir, log_
             aligned += 1
             tokens = sentences_parsed[subj_sent]
             # 选取实体短语锚点作为 BFS 起止点
-            subj_id = choose_span_head_id(subj_span, tokens)
-            obj_id = choose_span_head_id(obj_span, tokens)
-            graph, id_to_token = build_dependency_graph(tokens)
-            path_tokens = find_shortest_dependency_path(graph, id_to_token, subj_id, obj_id)
+            with prof.stage("anchor"):
+                subj_id = choose_span_head_id(subj_span, tokens)
+                obj_id = choose_span_head_id(obj_span, tokens)
+            with prof.stage("search"):
+                path_tokens = engine.intra_path(subj_sent, subj_id, obj_id)
             if path_tokens:
                 # 扩展以覆盖 subject/object 的所有 token
-                subj_ids_full = get_span_token_ids(subj_span, tokens)
-                obj_ids_full = get_span_token_ids(obj_span, tokens)
-                path_tokens_full = expand_intra_path_with_spans(path_tokens, subj_ids_full, obj_ids_full, tokens)
-                path = [(t["form"], t.get("deprel")) for t in path_tokens_full]
+                with prof.stage("span_expand"):
+                    subj_ids_full = get_span_token_ids(subj_span, tokens)
+                    obj_ids_full = get_span_token_ids(obj_span, tokens)
+                    path_tokens_full = expand_intra_path_with_spans(path_tokens, subj_ids_full, obj_ids_full, tokens)
+                    path = [(t["form"], t.get("deprel")) for t in path_tokens_full]
+                    path_positions = [{"sentence_index": subj_sent, "id": t["id"]} for t in path_tokens_full]
                 path_found += 1
                 note = ""
-                path_positions = [{"sentence_index": subj_sent, "id": t["id"]} for t in path_tokens_full]
             else:
                 path = None
                 note = "无依存路径"
@@ -394,29 +1061,50 @@ def extract_paths_for_article(dep_json_path, entity_pairs_path, output_dir, log_
         else:
             # 跨句
             cross_sentence_pairs += 1
-            if ENABLE_CROSS_SENTENCE and cross_graph:
+            with prof.stage("search"):
+                cross = engine.cross_graph(subj_sent, obj_sent) if ENABLE_CROSS_SENTENCE and sentences_parsed else None
+            if ENABLE_CROSS_SENTENCE and cross is None:
+                # 有界策略：句距超过窗口，不搜索
+                cross_sentence_out_of_window += 1
+                note = "超出跨句窗口"
+                article_results.append({
+                    "subject": pair["subject"],
+                    "object": pair["object"],
+                    "relation": pair.get("relation"),
+                    "path": None,
+                    "path_type": "cross_sentence",
+                    "sentence_index": None,
+                    "path_positions": None,
+                    "note": note
+                })
+                log_lines.append(f"[CROSS_OUT_OF_WINDOW] {title} | {pair['subject']} - {pair.get('relation')} - {pair['object']}")
+            elif ENABLE_CROSS_SENTENCE and cross[0]:
+                cross_graph, cross_id_map, cross_super_root = cross
                 # 选取锚点
-                subj_anchor = choose_span_head_id(subj_span, sentences_parsed[subj_sent])
-                obj_anchor = choose_span_head_id(obj_span, sentences_parsed[obj_sent])
+                with prof.stage("anchor"):
+                    subj_anchor = choose_span_head_id(subj_span, sentences_parsed[subj_sent])
+                    obj_anchor = choose_span_head_id(obj_span, sentences_parsed[obj_sent])
                 subj_key = f"{subj_sent}:{subj_anchor}"
                 obj_key = f"{obj_sent}:{obj_anchor}"
                 if subj_key in cross_graph and obj_key in cross_graph:
-                    key_path = bfs_shortest_path(cross_graph, subj_key, obj_key)
+                    with prof.stage("search"):
+                        key_path = engine.cross_path(subj_key, obj_key)
                     if key_path:
-                        # 去掉 SUPER_ROOT
-                        filtered_keys = [k for k in key_path if k != cross_super_root]
-                        base_tokens = [cross_id_map[k] for k in filtered_keys]
-                        # 扩展以覆盖 subject/object 的所有 token
-                        subj_ids_full = get_span_token_ids(subj_span, sentences_parsed[subj_sent])
-                        obj_ids_full = get_span_token_ids(obj_span, sentences_parsed[obj_sent])
-                        path_tokens_full = expand_cross_path_with_spans(
-                            base_tokens, subj_sent, subj_ids_full, obj_sent, obj_ids_full, cross_id_map
-                        )
-                        path = [(t["form"], t.get("deprel")) for t in path_tokens_full]
-                        path_positions = [
-                            {"sentence_index": t["sentence_index"], "id": t["id"]}
-                            for t in path_tokens_full
-                        ]
+                        with prof.stage("span_expand"):
+                            # 去掉 SUPER_ROOT
+                            filtered_keys = [k for k in key_path if k != cross_super_root]
+                            base_tokens = [cross_id_map[k] for k in filtered_keys]
+                            # 扩展以覆盖 subject/object 的所有 token
+                            subj_ids_full = get_span_token_ids(subj_span, sentences_parsed[subj_sent])
+                            obj_ids_full = get_span_token_ids(obj_span, sentences_parsed[obj_sent])
+                            path_tokens_full = expand_cross_path_with_spans(
+                                base_tokens, subj_sent, subj_ids_full, obj_sent, obj_ids_full, cross_id_map
+                            )
+                            path = [(t["form"], t.get("deprel")) for t in path_tokens_full]
+                            path_positions = [
+                                {"sentence_index": t["sentence_index"], "id": t["id"]}
+                                for t in path_tokens_full
+                            ]
                         cross_sentence_path_found += 1
                         note = ""
                         article_results.append({
@@ -480,45 +1168,109 @@ def extract_paths_for_article(dep_json_path, entity_pairs_path, output_dir, log_
         "cross_sentence_pairs": cross_sentence_pairs,
         "cross_sentence_path_found": cross_sentence_path_found
     }
-
-    out_obj = {
-        "title": title,
-        "stats": stats,
-        "pairs": article_results,
-        "config": {
-            "enable_cross_sentence": ENABLE_CROSS_SENTENCE,
-            "cross_sentence_strategy": CROSS_SENTENCE_STRATEGY if ENABLE_CROSS_SENTENCE else None
-        }
-    }
+    if CROSS_SENTENCE_STRATEGY in ('window', 'adjacent'):
+        # super_root 下恒为 0，不写出，保持默认配置输出不变
+        stats["cross_sentence_out_of_window"] = cross_sentence_out_of_window
+    log_lines.append(f"[DONE] {title} stats={stats}")
 
     os.makedirs(output_dir, exist_ok=True)
-    out_path = os.path.join(output_dir, f"{title}依存路径.json")
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(out_obj, f, ensure_ascii=False, indent=2)
+    out_path = os.path.join(output_dir, article_output_name(title, output_format))
+    with prof.stage("write_json"):
+        if output_format == 'ndjson':
+            write_article_ndjson(out_path, title, article_results)
+        else:
+            out_obj = {
+                "title": title,
+                "stats": stats,
+                "pairs": article_results,
+                "config": cross_sentence_config()
+            }
+            with open(out_path, 'w', encoding='utf-8') as f:
+                json.dump(out_obj, f, ensure_ascii=False, indent=2)
 
-    log_lines.append(f"[DONE] {title} stats={stats}")
+    if prof.enabled:
+        stats["profile"] = prof.to_dict()
+    return stats
+
+_OPEN_CORPORA = {}
+
+
+def _corpus_for(path):
+    """每个进程只打开（内存映射）一次语料文件"""
+    if path is None:
+        return None
+    corpus = _OPEN_CORPORA.get(path)
+    if corpus is None:
+        corpus = _OPEN_CORPORA[path] = open_corpus(path)
+    return corpus
+
+
+def _init_worker(cross_strategy, cross_window):
+    """进程池 initializer：worker 沿用主进程（可能被命令行覆盖）的跨句配置"""
+    global CROSS_SENTENCE_STRATEGY, CROSS_SENTENCE_WINDOW
+    CROSS_SENTENCE_STRATEGY, CROSS_SENTENCE_WINDOW = cross_strategy, cross_window
 
-def batch_process():
+
+def _extract_article_job(job):
+    """进程池任务：处理单篇文章，返回 (本篇日志, stats)"""
+    dep_path, pair_path, output_dir, corpus_path, output_format, profile = job
+    log_lines = []
+    stats = extract_paths_for_article(dep_path, pair_path, output_dir, log_lines,
+                                      corpus=_corpus_for(corpus_path), output_format=output_format,
+                                      profile=profile)
+    return log_lines, stats
+
+
+def summarize_corpus_stats(stats_list):
+    """汇总各篇 stats（按键求和），附带文章数"""
+    summary = {"articles": len(stats_list)}
+    for stats in stats_list:
+        for k, v in stats.items():
+            if isinstance(v, (int, float)):
+                summary[k] = summary.get(k, 0) + v
+    return summary
+
+
+def batch_process(force=False, workers=1, corpus_path=None, output_format='json', profile=False):
     base_dir = os.path.abspath(os.path.dirname(__file__))
     dep_dir = os.path.join(base_dir, 'dependency_results')
     pair_dir = os.path.join(base_dir, '实体对')
     output_dir = os.path.join(base_dir, '依存路径提取结果')
     os.makedirs(output_dir, exist_ok=True)
 
+    batch_start = time.perf_counter()
     log_lines = [f"=== 依存路径批处理开始 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ==="]
 
-    if not os.path.isdir(dep_dir):
+    if corpus_path is None and not os.path.isdir(dep_dir):
         print(f"未找到 dependency_results 目录: {dep_dir}")
         return
     if not os.path.isdir(pair_dir):
         print(f"未找到 实体对 目录: {pair_dir}")
         return
 
-    dep_files = [f for f in os.listdir(dep_dir) if f.endswith('_dependency.json')]
+    corpus = _corpus_for(corpus_path)
+    if corpus is not None:
+        # 打包语料：标题来自语料索引，无需逐篇解析 JSON
+        dep_files = [f"{name}_dependency.json" for name in corpus.names]
+    else:
+        dep_files = [f for f in os.listdir(dep_dir) if f.endswith('_dependency.json')]
     if not dep_files:
         print("dependency_results 目录中未找到 *_dependency.json 文件")
         return
 
+    manifest = load_manifest(output_dir)
+    config_hash = config_fingerprint(path_config())
+    old_entries = manifest["articles"]
+    reusable = manifest["config"] == config_hash
+    if not reusable and old_entries:
+        log_lines.append("[CONFIG_CHANGED] 配置或算法版本变化，全部重算")
+    manifest = {"config": config_hash, "articles": {}}
+    new_entries = {}
+    skipped = 0
+
+    # 按文件顺序排定：直接日志行 或 待计算任务；计算完再按此顺序合并日志
+    plan = []
+    jobs = []
     for dep_filename in dep_files:
         title = dep_filename[:-len('_dependency.json')]
         dep_path = os.path.join(dep_dir, dep_filename)
@@ -526,9 +1278,100 @@ def batch_process():
         pair_path = os.path.join(pair_dir, pair_filename)
         if not os.path.isfile(pair_path):
             print(f"未找到对应实体对文件: {pair_filename}")
-            log_lines.append(f"[MISS_PAIRS_FILE] {title} -> {pair_filename}")
+            plan.append(("log", f"[MISS_PAIRS_FILE] {title} -> {pair_filename}"))
+            continue
+        entry = {
+            "dep_hash": corpus.article_digest(corpus.doc_index(title)) if corpus is not None else file_digest(dep_path),
+            "pairs_hash": file_digest(pair_path),
+            "output": article_output_name(title, output_format),
+        }
+        old = old_entries.get(title)
+        # 剖析需要实际运行每篇，不复用旧输出
+        if (not force and not profile and reusable and old and old.get("output") == entry["output"]
+                and old.get("dep_hash") == entry["dep_hash"]
+                and old.get("pairs_hash") == entry["pairs_hash"]
+                and os.path.isfile(os.path.join(output_dir, entry["output"]))):
+            new_entries[title] = old
+            skipped += 1
+            continue
+        plan.append(("job", title, entry))
+        jobs.append((dep_path, pair_path, output_dir, corpus_path, output_format, profile))
+
+    if workers != 1 and len(jobs) > 1:
+        n_workers = workers if workers > 0 else (os.cpu_count() or 1)
+        chunksize = max(1, len(jobs) // (4 * n_workers))
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(CROSS_SENTENCE_STRATEGY, CROSS_SENTENCE_WINDOW)) as pool:
+            results = list(pool.map(_extract_article_job, jobs, chunksize=chunksize))
+    else:
+        results = [_extract_article_job(job) for job in jobs]
+
+    results_iter = iter(results)
+    profiles = {}
+    failed = set()
+    for item in plan:
+        if item[0] == "log":
+            log_lines.append(item[1])
+            continue
+        _, title, entry = item
+        job_logs, stats = next(results_iter)
+        log_lines.extend(job_logs)
+        if stats is not None:
+            # profile 只进 profile.json，manifest 中保留计数
+            if "profile" in stats:
+                profiles[title] = stats.pop("profile")
+            entry["stats"] = stats
+            new_entries[title] = entry
+        else:
+            # 读取失败：保留旧输出，不写入 manifest，下次运行重试
+            failed.add(title)
+
+    # 清理输入已不存在（或不再成对）的旧输出，以及切换输出格式后遗留的另一种格式
+    for title, old in old_entries.items():
+        if title in failed:
+            continue
+        old_output = old.get("output", article_output_name(title))
+        new_entry = new_entries.get(title)
+        if new_entry is not None and new_entry["output"] == old_output:
             continue
-        extract_paths_for_article(dep_path, pair_path, output_dir, log_lines)
+        stale_path = os.path.join(output_dir, old_output)
+        if os.path.isfile(stale_path):
+            os.remove(stale_path)
+            if new_entry is None:
+                log_lines.append(f"[STALE_REMOVED] {title}")
+
+    manifest["articles"] = new_entries
+    save_manifest(output_dir, manifest)
+
+    ndjson_corpus_path = os.path.join(output_dir, NDJSON_CORPUS_FILENAME)
+    if output_format == 'ndjson':
+        titles = [f[:-len('_dependency.json')] for f in dep_files]
+        concat_ndjson(output_dir, [new_entries[t]["output"] for t in titles if t in new_entries])
+        log_lines.append(f"[NDJSON] 全语料路径记录: {ndjson_corpus_path}")
+    elif os.path.isfile(ndjson_corpus_path):
+        os.remove(ndjson_corpus_path)
+    if skipped:
+        log_lines.append(f"[UNCHANGED] {skipped} 篇输入与配置未变化，已跳过")
+
+    corpus_stats = summarize_corpus_stats([e["stats"] for e in new_entries.values() if e.get("stats")])
+    with open(os.path.join(output_dir, 'corpus_stats.json'), 'w', encoding='utf-8') as f:
+        json.dump(corpus_stats, f, ensure_ascii=False, indent=2)
+    log_lines.append(f"[CORPUS] stats={corpus_stats}")
+
+    if profile:
+        profile_obj = {
+            **path_config(),
+            "generated": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "workers": workers,
+            "wall_ms": round((time.perf_counter() - batch_start) * 1000, 3),
+            "skipped_unchanged": skipped,
+            "total": merge_profiles(list(profiles.values())),
+            "articles": profiles,
+        }
+        profile_path = os.path.join(output_dir, PROFILE_FILENAME)
+        with open(profile_path, 'w', encoding='utf-8') as f:
+            json.dump(profile_obj, f, ensure_ascii=False, indent=2)
+        log_lines.append(f"[PROFILE] {profile_path} total={profile_obj['total']}")
 
     log_lines.append(f"=== 处理结束 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===")
     log_path = os.path.join(output_dir, 'log.txt')
@@ -537,4 +1380,19 @@ def batch_process():
     print(f"批处理完成，日志写入: {log_path}")
 
 if __name__ == '__main__':
-    batch_process()
\ No newline at end of file
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--force', action='store_true', help='忽略 manifest，全量重算')
+    ap.add_argument('--workers', type=int, default=1, help='并行进程数（1 为串行，0 为 CPU 核数）')
+    ap.add_argument('--corpus', default=None, help='改从打包语料（*.depcorpus，见 token_store.py pack）读取依存结果')
+    ap.add_argument('--ndjson', action='store_true', help=f'流式输出：每篇写 ndjson 并拼接为 {NDJSON_CORPUS_FILENAME}')
+    ap.add_argument('--cross-strategy', choices=CROSS_SENTENCE_STRATEGIES, default=None,
+                    help=f'跨句策略（默认 {CROSS_SENTENCE_STRATEGY}）')
+    ap.add_argument('--cross-window', type=int, default=None,
+                    help=f'adjacent / window 的最大句距（默认 {CROSS_SENTENCE_WINDOW}，负数为不限）')
+    ap.add_argument('--profile', action='store_true',
+                    help=f'记录分阶段耗时与计数，写入 {PROFILE_FILENAME}（全部文章重算）')
+    args = ap.parse_args()
+    set_cross_sentence_config(args.cross_strategy, args.cross_window)
+    corpus_path = os.path.abspath(args.corpus) if args.corpus else None
+    batch_process(force=args.force, workers=args.workers, corpus_path=corpus_path,
+                  output_format='ndjson' if args.ndjson else 'json', profile=args.profile)
@@ -1,8 +1,27 @@
 # -*- coding: utf-8 -*-
 """
 Rank typical dependency paths using lightweight statistics.
-- Input: 依存路径提取结果/*.json (each file produced by dependency_path.py)
+- Input: 依存路径提取结果/*.json (each file produced by dependency_path.py), or the
+  streaming output of `dependency_path.py --ndjson` (corpus_paths.ndjson, else the
+  per-article *依存路径.ndjson files). Records are consumed one at a time and only
+  per-path aggregates are kept, so memory does not grow with the number of pairs.
 - Output: CSV with ranked paths and a JSONL with samples
+- Counts persist in 依存路径提取结果/path_count_store.json: per-file contributions
+  (path counts, per-title counts, examples) plus corpus totals (path, unigram and
+  bigram counts by path length, document frequency). Each run only re-reads result
+  files that were added or changed (size / mtime) and subtracts files that vanished;
+  `--no-scan` re-ranks from the store alone without touching the result files.
+- `--approx` skips the store and streams the files once into a Space-Saving
+  counter (paths) and Count-Min sketches (unigrams, bigrams, doc frequency) sized
+  by `--memory-mb`; the run prints the error bounds, and the JSONL gains each
+  path's `support_error`. Until the Space-Saving counter evicts and barring sketch
+  collisions, the ranking equals the exact one.
+- `--views` ranks several path representations from a single read of the files:
+  synonym (the default ranking above), surface form, deprel, form:deprel, and
+  pos (forms rarer than --backoff-min-count backed off to their POS tag, looked up
+  in the dependency results through path_positions). Each record is reduced once to
+  its node tuple (form, normalized form, deprel, POS); every view is a projection of
+  those tuples. Non-default views write top_paths_<view>.csv / top_path_samples_<view>.jsonl.
 
 Score(path) = 0.5 * Assoc + 0.3 * log(1+support) + 0.2 * log(1+doc_freq)
 Assoc = mean over edges [max(nPMI,0) * log(1 + bigram_count)]
@@ -13,20 +32,32 @@ path length into a reasonable range. A small synonym map normalizes variants
 
 Usage:
   python rank_typical_paths.py --topk 100 --min-count 3 --min-doc 2
+  python rank_typical_paths.py --no-scan --topk 50 --min-len 3   # re-rank from the store only
+  python rank_typical_paths.py --approx --memory-mb 64            # fixed-memory streaming estimate
+  python rank_typical_paths.py --views synonym,form,deprel,form_deprel,pos   # one pass, one ranking per view
 """
 
 from __future__ import annotations
 import os
 import json
+import hashlib
 import math
 import argparse
 from collections import Counter, defaultdict
-from typing import Dict, List, Tuple, Iterable, Any
+from typing import Dict, List, Tuple, Iterable, Iterator, Any
+
+import numpy as np
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 RESULT_DIR = os.path.join(BASE_DIR, '依存路径提取结果')
 OUT_CSV = os.path.join(RESULT_DIR, 'top_paths.csv')
 OUT_JSONL = os.path.join(RESULT_DIR, 'top_path_samples.jsonl')
+NDJSON_CORPUS_FILENAME = 'corpus_paths.ndjson'
+COUNT_STORE_FILENAME = 'path_count_store.json'
+COUNT_STORE_VERSION = 1
+MAX_EXAMPLES = 5
+# Examples are stored as rows in this field order; path_str is added on output
+EXAMPLE_FIELDS = ('title', 'subject', 'relation', 'object', 'sentence_index', 'path_type')
 
 # --- Normalization helpers ---
 SYNONYM_MAP = {
@@ -42,12 +73,16 @@ GENERIC_WORDS = {
 }
 
 
-def normalize_token(form: str) -> str:
+def surface_token(form: str) -> str:
     if not form:
         return ''
     s = str(form).strip()
     # 中文一般无需大小写；移除空白
-    s = s.replace('\u200b', '').replace('\ufeff', '')
+    return s.replace('\u200b', '').replace('\ufeff', '')
+
+
+def normalize_token(form: str) -> str:
+    s = surface_token(form)
     # 统一同义词
     return SYNONYM_MAP.get(s, s)
 
@@ -70,13 +105,49 @@ def path_to_forms(path_entry: Any) -> List[str]:
     return forms
 
 
+def iter_path_nodes(path_entry: Any) -> Iterator[Tuple[int, str, str]]:
+    """Shared node normalizer for record['path'] (also used by subpath_index):
+    yields (index in path, surface form, lowercased deprel) for every node with a form."""
+    for i, node in enumerate(path_entry or []):
+        if isinstance(node, (list, tuple)):
+            form = node[0] if node else ''
+            deprel = node[1] if len(node) > 1 else None
+        elif isinstance(node, dict):
+            form, deprel = node.get('form', ''), node.get('deprel')
+        else:
+            form, deprel = str(node), None
+        raw = surface_token(form)
+        if raw:
+            yield i, raw, str(deprel or '').lower()
+
+
 def iter_path_files(result_dir: str) -> Iterable[str]:
+    corpus_fp = os.path.join(result_dir, NDJSON_CORPUS_FILENAME)
+    if os.path.isfile(corpus_fp):
+        # The concatenated corpus file already holds every article's records
+        yield corpus_fp
+        return
     for fn in os.listdir(result_dir):
-        if fn.endswith('依存路径.json') and not fn.endswith('_paths.json'):
+        if (fn.endswith('依存路径.json') and not fn.endswith('_paths.json')) or fn.endswith('依存路径.ndjson'):
             yield os.path.join(result_dir, fn)
 
 
-def load_pairs_from_file(fp: str) -> Tuple[str, List[Dict[str, Any]]]:
+def load_pairs_from_file(fp: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (title, pair_record) from one result file.
+    NDJSON files are read line by line; a legacy JSON file is loaded one article at a time.
+    """
+    # Fallback title from filename
+    base = os.path.basename(fp)
+    file_title = base.replace('依存路径.ndjson', '').replace('依存路径.json', '')
+    if fp.endswith('.ndjson'):
+        with open(fp, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                yield rec.get('title') or file_title, rec
+        return
     with open(fp, 'r', encoding='utf-8') as f:
         data = json.load(f)
     title = ''
@@ -88,154 +159,706 @@ def load_pairs_from_file(fp: str) -> Tuple[str, List[Dict[str, Any]]]:
             pairs = items
     elif isinstance(data, list):
         pairs = data
-    if not title:
-        # Fallback to filename
-        base = os.path.basename(fp)
-        title = base.replace('依存路径.json', '')
-    return title, pairs
+    title = title or file_title
+    for rec in pairs:
+        yield title, rec
 
 
-def score_paths(paths: List[Tuple[str, ...]],
-                path_docs: Dict[Tuple[str, ...], set],
-                min_count: int,
-                min_doc: int,
-                min_len: int,
-                max_len: int) -> List[Dict[str, Any]]:
-    path_counts = Counter(paths)
-
-    # Build unigram/bigram counts over edges
-    unigram: Counter[str] = Counter()
-    bigram: Counter[Tuple[str, str]] = Counter()
-    for p in paths:
-        if not (min_len <= len(p) <= max_len):
-            continue
-        for w in p:
-            unigram[w] += 1
-        for a, b in zip(p, p[1:]):
-            bigram[(a, b)] += 1
-
-    total_uni = sum(unigram.values()) or 1
-    total_bi = sum(bigram.values()) or 1
-
-    def npmi(a: str, b: str) -> float:
-        c_ab = bigram[(a, b)]
-        if c_ab <= 0:
-            return -1.0
-        p_ab = c_ab / total_bi
-        p_a = (unigram[a] / total_uni) if unigram[a] else 1e-12
-        p_b = (unigram[b] / total_uni) if unigram[b] else 1e-12
-        pmi = math.log((p_ab / (p_a * p_b)) + 1e-12)
-        return pmi / (-math.log(p_ab + 1e-12))
-
-    def pair_score(a: str, b: str) -> float:
-        c_ab = bigram[(a, b)]
-        return max(npmi(a, b), 0.0) * math.log(1.0 + c_ab)
-
-    ranked: List[Dict[str, Any]] = []
-    for path, c in path_counts.items():
-        if not (min_len <= len(path) <= max_len):
-            continue
-        if c < min_count:
+def iter_path_records(fp: str, include_cross: bool) -> Iterator[Tuple[str, Dict[str, Any], Tuple[str, ...]]]:
+    """Yield (title, record, normalized path) for every usable record of one result file."""
+    for title, rec in load_pairs_from_file(fp):
+        path_entry = rec.get('path')
+        if not path_entry:
             continue
-        df = len(path_docs.get(path, set()))
-        if df < min_doc:
+        if not include_cross and rec.get('path_type') == 'cross_sentence':
             continue
-        edges = list(zip(path, path[1:]))
-        if not edges:
+        forms = path_to_forms(path_entry)
+        if not forms:
             continue
-        assoc = sum(pair_score(a, b) for a, b in edges) / max(len(edges), 1)
-        s_freq = math.log(1.0 + c)
-        s_cover = math.log(1.0 + df)
-        score = 0.5 * assoc + 0.3 * s_freq + 0.2 * s_cover
-        # length penalty
-        if len(path) < 3:
-            score *= 0.85
-        # generic penalty
-        gen_ratio = sum(1 for w in path if w in GENERIC_WORDS) / float(len(path))
-        if gen_ratio >= 0.5:
-            score *= 0.85
-        ranked.append({
-            'path': list(path),
-            'support': c,
-            'doc_freq': df,
-            'avg_npmi': assoc,
-            'len': len(path),
-            'score': score,
-        })
+        yield title, rec, tuple(forms)
 
-    ranked.sort(key=lambda x: x['score'], reverse=True)
-    return ranked
 
+def example_row(title: str, rec: Dict[str, Any]) -> List[Any]:
+    return [title] + [rec.get(k) for k in EXAMPLE_FIELDS[1:]]
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument('--result-dir', default=RESULT_DIR)
-    ap.add_argument('--topk', type=int, default=200)
-    ap.add_argument('--min-count', type=int, default=3)
-    ap.add_argument('--min-doc', type=int, default=2)
-    ap.add_argument('--min-len', type=int, default=2)
-    ap.add_argument('--max-len', type=int, default=6)
-    ap.add_argument('--include-cross', action='store_true', help='Include cross-sentence paths (default on)')
-    ap.add_argument('--exclude-cross', action='store_true', help='Exclude cross-sentence paths')
-    args = ap.parse_args()
 
-    result_dir = args.result_dir
-    files = list(iter_path_files(result_dir))
-    if not files:
-        print('No path JSON files found in', result_dir)
-        return
+def collect_file_counts(fp: str, include_cross: bool) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+    """One result file's contribution: {path: {'count', 'docs': Counter(title), 'examples'}},
+    paths in first-seen order, at most MAX_EXAMPLES examples each."""
+    contrib: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for title, rec, path_t in iter_path_records(fp, include_cross):
+        entry = contrib.get(path_t)
+        if entry is None:
+            entry = contrib[path_t] = {'count': 0, 'docs': Counter(), 'examples': []}
+        entry['count'] += 1
+        entry['docs'][title] += 1
+        if len(entry['examples']) < MAX_EXAMPLES:
+            entry['examples'].append(example_row(title, rec))
+    return contrib
 
-    # Accumulators
-    all_paths: List[Tuple[str, ...]] = []
-    path_docs: Dict[Tuple[str, ...], set] = defaultdict(set)
-    examples: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
 
-    include_cross = not args.exclude_cross
+def example_dicts(path: Tuple[str, ...], rows: List[List[Any]]) -> List[Dict[str, Any]]:
+    path_str = '->'.join(path)
+    return [dict(zip(EXAMPLE_FIELDS, row), path_str=path_str) for row in rows]
+
+
+def file_signature(fp: str) -> List[int]:
+    """Change detection without reading the file: [size, mtime_ns]."""
+    st = os.stat(fp)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def store_config(include_cross: bool) -> Dict[str, Any]:
+    """Settings the stored counts depend on; a mismatch rebuilds the store."""
+    norm = json.dumps([SYNONYM_MAP, ['\u200b', '\ufeff']], ensure_ascii=False, sort_keys=True)
+    return {
+        'version': COUNT_STORE_VERSION,
+        'include_cross': include_cross,
+        'normalization': hashlib.sha256(norm.encode('utf-8')).hexdigest(),
+    }
+
+
+class PathCountStore:
+    """Persistent, incrementally maintained path statistics.
+
+    files        : {file name: {'signature', 'paths': {path: {'count', 'docs', 'examples'}}}}
+                   in result-file order (the per-file contributions)
+    path_counts  : Counter over paths, ordered by first occurrence across files
+    path_docs    : {path: Counter(title -> records)}; doc_freq = len(path_docs[path])
+    unigram_by_len / bigram_by_len : {path length: Counter}, so any [min_len, max_len]
+                   window is a sum over lengths instead of a pass over all paths
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.path_counts: Counter[Tuple[str, ...]] = Counter()
+        self.path_docs: Dict[Tuple[str, ...], Counter] = {}
+        self.unigram_by_len: Dict[int, Counter] = defaultdict(Counter)
+        self.bigram_by_len: Dict[int, Counter] = defaultdict(Counter)
+
+    # ---- incremental maintenance ----
+    def _apply(self, contrib: Dict[Tuple[str, ...], Dict[str, Any]], sign: int) -> None:
+        for path, entry in contrib.items():
+            c = sign * entry['count']
+            self.path_counts[path] += c
+            if self.path_counts[path] <= 0:
+                del self.path_counts[path]
+            docs = self.path_docs.setdefault(path, Counter())
+            for title, n in entry['docs'].items():
+                docs[title] += sign * n
+                if docs[title] <= 0:
+                    del docs[title]
+            if not docs:
+                del self.path_docs[path]
+            uni, bi = self.unigram_by_len[len(path)], self.bigram_by_len[len(path)]
+            for w in path:
+                uni[w] += c
+                if uni[w] <= 0:
+                    del uni[w]
+            for a, b in zip(path, path[1:]):
+                bi[(a, b)] += c
+                if bi[(a, b)] <= 0:
+                    del bi[(a, b)]
+
+    def update(self, files: List[str], include_cross: bool) -> Dict[str, int]:
+        """Bring the store in line with the current result files; returns change counts."""
+        stats = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        names = [os.path.basename(fp) for fp in files]
+        current = set(names)
+        for name in [n for n in self.files if n not in current]:
+            self._apply(self.files.pop(name)['paths'], -1)
+            stats['removed'] += 1
+        new_files: Dict[str, Dict[str, Any]] = {}
+        for fp, name in zip(files, names):
+            sig = file_signature(fp)
+            old = self.files.get(name)
+            if old is not None and old['signature'] == sig:
+                new_files[name] = old
+                stats['unchanged'] += 1
+                continue
+            if old is not None:
+                self._apply(old['paths'], -1)
+            contrib = collect_file_counts(fp, include_cross)
+            self._apply(contrib, +1)
+            new_files[name] = {'signature': sig, 'paths': contrib}
+            stats['changed' if old is not None else 'added'] += 1
+        self.files = new_files
+        # Same path order as a single pass over the files in order
+        order = dict.fromkeys(p for f in self.files.values() for p in f['paths'])
+        self.path_counts = Counter({p: self.path_counts[p] for p in order if p in self.path_counts})
+        return stats
+
+    # ---- queries ----
+    def edge_counts(self, min_len: int, max_len: int) -> Tuple[Counter, Counter]:
+        unigram: Counter[str] = Counter()
+        bigram: Counter[Tuple[str, str]] = Counter()
+        for n, counts in self.unigram_by_len.items():
+            if min_len <= n <= max_len:
+                unigram.update(counts)
+        for n, counts in self.bigram_by_len.items():
+            if min_len <= n <= max_len:
+                bigram.update(counts)
+        return unigram, bigram
+
+    def examples(self, path: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        """First MAX_EXAMPLES examples in file order."""
+        rows: List[List[Any]] = []
+        for f in self.files.values():
+            entry = f['paths'].get(path)
+            if entry:
+                rows.extend(entry['examples'][:MAX_EXAMPLES - len(rows)])
+                if len(rows) >= MAX_EXAMPLES:
+                    break
+        return example_dicts(path, rows)
+
+    # ---- persistence ----
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'config': self.config,
+            'files': {
+                name: {
+                    'signature': f['signature'],
+                    'paths': [[list(p), e['count'], dict(e['docs']), e['examples']] for p, e in f['paths'].items()],
+                }
+                for name, f in self.files.items()
+            },
+            'path_counts': [[list(p), c] for p, c in self.path_counts.items()],
+            'path_docs': [[list(p), dict(d)] for p, d in self.path_docs.items()],
+            'unigram_by_len': {str(n): dict(c) for n, c in self.unigram_by_len.items() if c},
+            'bigram_by_len': {str(n): [[a, b, v] for (a, b), v in c.items()] for n, c in self.bigram_by_len.items() if c},
+        }
+
+    @classmethod
+    def from_json(cls, obj: Dict[str, Any]) -> 'PathCountStore':
+        store = cls(obj['config'])
+        for name, f in obj['files'].items():
+            store.files[name] = {
+                'signature': f['signature'],
+                'paths': {tuple(p): {'count': c, 'docs': Counter(d), 'examples': ex} for p, c, d, ex in f['paths']},
+            }
+        store.path_counts = Counter({tuple(p): c for p, c in obj['path_counts']})
+        store.path_docs = {tuple(p): Counter(d) for p, d in obj['path_docs']}
+        for n, c in obj['unigram_by_len'].items():
+            store.unigram_by_len[int(n)] = Counter(c)
+        for n, rows in obj['bigram_by_len'].items():
+            store.bigram_by_len[int(n)] = Counter({(a, b): v for a, b, v in rows})
+        return store
+
+    @classmethod
+    def load(cls, fp: str, config: Dict[str, Any]) -> 'PathCountStore':
+        """Stored counts if present and built with the same config, else an empty store."""
+        if os.path.isfile(fp):
+            try:
+                with open(fp, 'r', encoding='utf-8') as f:
+                    obj = json.load(f)
+                if obj.get('config') == config:
+                    return cls.from_json(obj)
+                print('Count store config changed, rebuilding:', fp)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f'Count store unreadable ({e}), rebuilding:', fp)
+        return cls(config)
+
+    def save(self, fp: str) -> None:
+        tmp = fp + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, fp)
+
+
+class EncodedPaths:
+    """Unique paths interned to integer ids, CSR layout.
+
+    vocab/index : token id <-> token string
+    offsets     : path i is tokens[offsets[i]:offsets[i + 1]]
+    counts      : occurrences per path; doc_freq: distinct documents per path
+                  (len(path_docs[path]), or doc_freq[path] when given directly)
+    paths       : the original tuples, in input order
+    """
+
+    def __init__(self, path_counts: Dict[Tuple[str, ...], int], path_docs: Dict[Tuple[str, ...], Any] = None,
+                 doc_freq: Dict[Tuple[str, ...], int] = None):
+        self.paths: List[Tuple[str, ...]] = list(path_counts)
+        self.index: Dict[str, int] = {}
+        ids: List[int] = []
+        for p in self.paths:
+            for w in p:
+                i = self.index.get(w)
+                if i is None:
+                    i = self.index[w] = len(self.index)
+                ids.append(i)
+        self.vocab: List[str] = list(self.index)
+        self.tokens = np.asarray(ids, dtype=np.int64)
+        self.lengths = np.fromiter((len(p) for p in self.paths), dtype=np.int64, count=len(self.paths))
+        self.offsets = np.zeros(len(self.paths) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=self.offsets[1:])
+        self.counts = np.fromiter((path_counts[p] for p in self.paths), dtype=np.int64, count=len(self.paths))
+        if doc_freq is None:
+            doc_freq = {p: len(path_docs.get(p, ())) for p in self.paths}
+        self.doc_freq = np.fromiter((doc_freq.get(p, 0) for p in self.paths), dtype=np.int64, count=len(self.paths))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Every edge as (path index, position in path, left id, right id)."""
+        n = len(self.tokens)
+        if n == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        path_of = np.repeat(np.arange(len(self.paths), dtype=np.int64), self.lengths)
+        pos = np.arange(n, dtype=np.int64) - self.offsets[path_of]
+        has_next = pos < self.lengths[path_of] - 1
+        left = np.nonzero(has_next)[0]
+        return path_of[left], pos[left], self.tokens[left], self.tokens[left + 1]
+
+
+def count_total(counts) -> int:
+    """Total of a Counter, or of everything added to a CountMinSketch."""
+    return counts.total if isinstance(counts, CountMinSketch) else sum(counts.values())
+
+
+def _exact_log(x: np.ndarray) -> np.ndarray:
+    """math.log over the distinct values of x.
+
+    np.log is not correctly rounded, which would perturb scores in the last bit and
+    reorder ties; the distinct arguments (counts, bigram statistics) are few.
+    """
+    if len(x) == 0:
+        return np.zeros(0, dtype=np.float64)
+    u, inv = np.unique(x, return_inverse=True)
+    return np.asarray([math.log(v) for v in u.tolist()], dtype=np.float64)[inv]
+
+
+def score_encoded(enc: EncodedPaths,
+                  min_count: int,
+                  min_doc: int,
+                  min_len: int,
+                  max_len: int,
+                  unigram: Counter[str] = None,
+                  bigram: Counter[Tuple[str, str]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Score every unique path at once; returns (path indices by rank, score, assoc),
+    score/assoc indexed by path. unigram/bigram are Counters or CountMinSketches.
+    Same formula and ordering as the per-path version:
+
+    pair(a, b) = max(nPMI(a, b), 0) * log(1 + c_ab)
+    assoc      = sum of pair over edges / number of edges
+    score      = 0.5 * assoc + 0.3 * log(1 + support) + 0.2 * log(1 + doc_freq),
+                 * 0.85 for paths shorter than 3, * 0.85 when generic words are >= half
+    """
+    n_paths = len(enc)
+    in_range = (enc.lengths >= min_len) & (enc.lengths <= max_len)
+    e_path, e_pos, e_a, e_b = enc.edges()
+
+    # bigram keys over the interned vocabulary; statistics per distinct bigram
+    n_vocab = max(len(enc.vocab), 1)
+    keys, key_of_edge = np.unique(e_a * n_vocab + e_b, return_inverse=True)
+    key_a, key_b = keys // n_vocab, keys % n_vocab
+    if unigram is None or bigram is None:
+        # unigram/bigram weighted by path occurrences, over in-range paths only
+        tok_path = np.repeat(np.arange(n_paths, dtype=np.int64), enc.lengths)
+        tok_w = np.where(in_range, enc.counts, 0)[tok_path]
+        uni = np.bincount(enc.tokens, weights=tok_w, minlength=len(enc.vocab)).astype(np.int64)
+        edge_w = np.where(in_range, enc.counts, 0)[e_path]
+        c_bi = np.bincount(key_of_edge, weights=edge_w, minlength=len(keys)).astype(np.int64)
+        total_uni = int(uni.sum()) or 1
+        total_bi = int(c_bi.sum()) or 1
+    else:
+        uni = np.asarray([unigram[w] for w in enc.vocab], dtype=np.int64)
+        c_bi = np.asarray([bigram[(enc.vocab[a], enc.vocab[b])]
+                           for a, b in zip(key_a.tolist(), key_b.tolist())], dtype=np.int64)
+        total_uni = count_total(unigram) or 1
+        total_bi = count_total(bigram) or 1
+
+    # nPMI per distinct bigram
+    ok = c_bi > 0
+    p_ab = c_bi / total_bi
+    u_a, u_b = uni[key_a], uni[key_b]
+    p_a = np.where(u_a > 0, u_a / total_uni, 1e-12)
+    p_b = np.where(u_b > 0, u_b / total_uni, 1e-12)
+    pmi = _exact_log(np.where(ok, p_ab / (p_a * p_b) + 1e-12, 1.0))
+    npmi = np.where(ok, pmi / -_exact_log(np.where(ok, p_ab + 1e-12, 0.5)), -1.0)
+    pair = np.maximum(npmi, 0.0) * _exact_log(1.0 + c_bi)
+
+    # assoc: edge scores added in path order, one edge position at a time
+    edge_score = pair[key_of_edge]
+    n_edges = np.maximum(enc.lengths - 1, 0)
+    assoc = np.zeros(n_paths, dtype=np.float64)
+    for j in range(int(n_edges.max()) if n_paths else 0):
+        at = e_pos == j
+        assoc[e_path[at]] += edge_score[at]
+    assoc /= np.maximum(n_edges, 1)
+
+    s_freq = _exact_log(1.0 + enc.counts)
+    s_cover = _exact_log(1.0 + enc.doc_freq)
+    score = 0.5 * assoc + 0.3 * s_freq + 0.2 * s_cover
+    score = np.where(enc.lengths < 3, score * 0.85, score)
+    generic = np.fromiter((w in GENERIC_WORDS for w in enc.vocab), dtype=bool, count=len(enc.vocab))
+    n_generic = np.bincount(np.repeat(np.arange(n_paths, dtype=np.int64), enc.lengths),
+                            weights=generic[enc.tokens], minlength=n_paths)
+    score = np.where(n_generic / np.maximum(enc.lengths, 1) >= 0.5, score * 0.85, score)
+
+    keep = np.nonzero(in_range & (enc.counts >= min_count) & (enc.doc_freq >= min_doc) & (n_edges > 0))[0]
+    order = keep[np.argsort(-score[keep], kind='stable')]
+    return order, score, assoc
+
+
+def ranked_rows(enc: EncodedPaths, order: np.ndarray, score: np.ndarray, assoc: np.ndarray,
+                limit: int = None) -> List[Dict[str, Any]]:
+    """Result dicts for the first `limit` ranked paths (all when None)."""
+    rows: List[Dict[str, Any]] = []
+    for i in order[:limit].tolist():
+        path = enc.paths[i]
+        rows.append({
+            'path': list(path),
+            'support': int(enc.counts[i]),
+            'doc_freq': int(enc.doc_freq[i]),
+            'avg_npmi': float(assoc[i]),
+            'len': len(path),
+            'score': float(score[i]),
+        })
+    return rows
 
+
+def score_paths(paths: Iterable[Tuple[str, ...]],
+                path_docs: Dict[Tuple[str, ...], set],
+                min_count: int,
+                min_doc: int,
+                min_len: int,
+                max_len: int,
+                unigram: Counter[str] = None,
+                bigram: Counter[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+    """paths: every path occurrence, or an already aggregated Counter of them.
+    path_docs maps a path to its documents (a set, or a Counter of titles).
+    unigram/bigram may be passed precomputed over paths with min_len <= len <= max_len
+    (see PathCountStore); otherwise they are built from the path counts.
+    Scoring runs on integer-encoded paths (EncodedPaths / score_encoded).
+    """
+    path_counts = paths if isinstance(paths, Counter) else Counter(paths)
+    enc = EncodedPaths(path_counts, path_docs)
+    order, score, assoc = score_encoded(enc, min_count, min_doc, min_len, max_len, unigram, bigram)
+    return ranked_rows(enc, order, score, assoc)
+
+
+# --- Path representations (one corpus pass, several rankings) ---
+VIEWS = ('synonym', 'form', 'deprel', 'form_deprel', 'pos')
+DEFAULT_VIEW = 'synonym'  # synonym-normalized forms: the ranking written to OUT_CSV / OUT_JSONL
+DEP_RESULT_DIR = os.path.join(BASE_DIR, 'dependency_results')
+REPO_ROOT = os.path.abspath(os.path.join(BASE_DIR, '..', '..', '..'))
+
+
+class PosLookup:
+    """POS of a path node from the dependency results, via record['path_positions']."""
+
+    def __init__(self, source: str):
+        # Shared columnar corpus: 依存句法分析构建规则库/scripts/token_store.py
+        import sys
+        sys.path.insert(0, os.path.join(REPO_ROOT, '依存句法分析构建规则库', 'scripts'))
+        from token_store import open_corpus
+        self.store = open_corpus(source)
+        self._title = None
+        self._sentences: Dict[int, Dict[int, str]] = {}
+
+    def pos(self, title: str, sentence_index: Any, tok_id: Any) -> str:
+        if title != self._title:
+            self._title, self._sentences = title, {}
+        ids = self._sentences.get(sentence_index)
+        if ids is None:
+            ids = self._sentences[sentence_index] = {}
+            doc = self.store.doc_index(title)
+            if doc is not None and isinstance(sentence_index, int):
+                lo, hi = self.store.sentence_range(doc)
+                if 0 <= sentence_index < hi - lo:
+                    view = self.store.sentence(lo + sentence_index)
+                    poses = self.store.poses
+                    ids.update(zip(view.ids.tolist(), (poses[c] for c in view.pos_codes.tolist())))
+        return ids.get(tok_id, '')
+
+
+def path_nodes(rec: Dict[str, Any], title: str, pos_lookup: PosLookup = None) -> Tuple[Tuple[str, str, str, str], ...]:
+    """record -> ((surface form, normalized form, deprel, POS), ...); nodes without a form are
+    dropped, as in path_to_forms."""
+    positions = rec.get('path_positions') or []
+    nodes = []
+    for i, raw, deprel in iter_path_nodes(rec.get('path')):
+        pos = ''
+        if pos_lookup is not None and i < len(positions) and isinstance(positions[i], dict):
+            pos = pos_lookup.pos(title, positions[i].get('sentence_index'), positions[i].get('id'))
+        nodes.append((raw, SYNONYM_MAP.get(raw, raw), deprel, pos))
+    return tuple(nodes)
+
+
+def view_key(nodes: Tuple[Tuple[str, str, str, str], ...], view: str,
+             keep_forms: set = None) -> Tuple[str, ...]:
+    """One representation of a path.
+
+    synonym     : synonym-normalized forms (path_to_forms)
+    form        : surface forms
+    deprel      : dependency relations only (lower-cased, as statistics.get_syntactic_path_key)
+    form_deprel : normalized form:deprel
+    pos         : normalized form when it is in keep_forms, else its POS tag as <TAG>
+    """
+    if view == 'synonym':
+        return tuple(n[1] for n in nodes)
+    if view == 'form':
+        return tuple(n[0] for n in nodes)
+    if view == 'deprel':
+        return tuple(n[2] for n in nodes if n[2])
+    if view == 'form_deprel':
+        return tuple(f"{n[1]}:{n[2]}" for n in nodes)
+    if view == 'pos':
+        return tuple(n[1] if n[1] in keep_forms else f"<{n[3] or '?'}>" for n in nodes)
+    raise ValueError(f'unknown view: {view}')
+
+
+def collect_rich_paths(files: List[str], include_cross: bool,
+                       pos_lookup: PosLookup = None) -> Dict[Tuple, Dict[str, Any]]:
+    """Single pass over the result files: every distinct node sequence (all representations'
+    inputs at once) with its count, per-title counts and first examples tagged by record order."""
+    rich: Dict[Tuple, Dict[str, Any]] = {}
+    seq = 0
     for fp in files:
-        title, pairs = load_pairs_from_file(fp)
-        for rec in pairs:
-            path_entry = rec.get('path')
-            ptype = rec.get('path_type')
-            if not path_entry:
+        for title, rec in load_pairs_from_file(fp):
+            if not rec.get('path'):
                 continue
-            if not include_cross and ptype == 'cross_sentence':
+            if not include_cross and rec.get('path_type') == 'cross_sentence':
                 continue
-            forms = path_to_forms(path_entry)
-            if not forms:
+            nodes = path_nodes(rec, title, pos_lookup)
+            if not nodes:
                 continue
-            path_t = tuple(forms)
-            all_paths.append(path_t)
-            path_docs[path_t].add(title)
-            # Save up to 5 examples per path
-            ex_list = examples[path_t]
-            if len(ex_list) < 5:
-                ex_list.append({
-                    'title': title,
-                    'subject': rec.get('subject'),
-                    'relation': rec.get('relation'),
-                    'object': rec.get('object'),
-                    'sentence_index': rec.get('sentence_index'),
-                    'path_type': ptype,
-                    'path_str': '->'.join(forms),
-                })
-
-    ranked = score_paths(
-        all_paths,
-        path_docs,
-        min_count=args.min_count,
-        min_doc=args.min_doc,
-        min_len=args.min_len,
-        max_len=args.max_len,
-    )
+            entry = rich.get(nodes)
+            if entry is None:
+                entry = rich[nodes] = {'count': 0, 'docs': Counter(), 'examples': []}
+            entry['count'] += 1
+            entry['docs'][title] += 1
+            if len(entry['examples']) < MAX_EXAMPLES:
+                entry['examples'].append((seq, example_row(title, rec)))
+            seq += 1
+    return rich
+
+
+def project_view(rich: Dict[Tuple, Dict[str, Any]], view: str, keep_forms: set = None):
+    """Aggregate rich paths under one representation: (path_counts, path_docs, examples).
+    Keys keep first-occurrence order and each key keeps its first MAX_EXAMPLES records,
+    exactly as a dedicated pass over the files would."""
+    path_counts: Counter[Tuple[str, ...]] = Counter()
+    path_docs: Dict[Tuple[str, ...], Counter] = {}
+    tagged: Dict[Tuple[str, ...], List[Tuple[int, List[Any]]]] = {}
+    for nodes, entry in rich.items():
+        key = view_key(nodes, view, keep_forms)
+        if not key:
+            continue
+        path_counts[key] += entry['count']
+        path_docs.setdefault(key, Counter()).update(entry['docs'])
+        tagged.setdefault(key, []).extend(entry['examples'])
+    examples = {key: [row for _, row in sorted(rows, key=lambda r: r[0])[:MAX_EXAMPLES]]
+                for key, rows in tagged.items()}
+    return path_counts, path_docs, examples
+
+
+def backoff_vocabulary(rich: Dict[Tuple, Dict[str, Any]], min_count: int) -> set:
+    """Normalized forms occurring at least min_count times over all path nodes."""
+    freq: Counter[str] = Counter()
+    for nodes, entry in rich.items():
+        for n in nodes:
+            freq[n[1]] += entry['count']
+    return {w for w, c in freq.items() if c >= min_count}
+
+
+def view_outputs(view: str) -> Tuple[str, str]:
+    if view == DEFAULT_VIEW:
+        return OUT_CSV, OUT_JSONL
+    return (os.path.join(RESULT_DIR, f'top_paths_{view}.csv'),
+            os.path.join(RESULT_DIR, f'top_path_samples_{view}.jsonl'))
+
+
+# --- Approximate streaming mode (fixed memory) ---
+SKETCH_DEPTH = 4          # Count-Min rows; failure probability delta = e^-depth
+SS_ENTRY_BYTES = 1024     # rough footprint of one Space-Saving entry (path, counters, examples)
+SKETCH_BUFFER = 65536     # pending sketch updates applied in one numpy scatter-add
+
+
+def _sketch_key(key: Any) -> bytes:
+    return ('\x1f'.join(key) if isinstance(key, tuple) else key).encode('utf-8')
+
+
+class CountMinSketch:
+    """Count-Min sketch: estimate >= true count, and <= true + eps * total
+    with probability 1 - delta (eps = e / width, delta = e^-depth)."""
+
+    def __init__(self, width: int, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        self._pending_cols: List[np.ndarray] = []
+        self._pending_counts: List[int] = []
+
+    def _columns(self, key: Any) -> np.ndarray:
+        # double hashing: column_i = h1 + i * h2 (mod width)
+        h = hashlib.blake2b(_sketch_key(key), digest_size=16).digest()
+        h1, h2 = int.from_bytes(h[:8], 'little'), int.from_bytes(h[8:], 'little') | 1
+        return np.asarray([(h1 + i * h2) % self.width for i in range(self.depth)], dtype=np.int64)
+
+    def add(self, key: Any, count: int = 1) -> None:
+        self._pending_cols.append(self._columns(key))
+        self._pending_counts.append(count)
+        self.total += count
+        if len(self._pending_counts) >= SKETCH_BUFFER:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending_counts:
+            return
+        cols = np.stack(self._pending_cols)
+        counts = np.asarray(self._pending_counts, dtype=np.int64)
+        for i in range(self.depth):
+            np.add.at(self.table[i], cols[:, i], counts)
+        self._pending_cols, self._pending_counts = [], []
+
+    def __getitem__(self, key: Any) -> int:
+        self.flush()
+        return int(self.table[np.arange(self.depth), self._columns(key)].min())
+
+    @property
+    def epsilon(self) -> float:
+        return math.e / self.width
+
+    @property
+    def delta(self) -> float:
+        return math.exp(-self.depth)
+
+    def error_bound(self) -> float:
+        return self.epsilon * self.total
+
+
+class SpaceSaving:
+    """Space-Saving top-k counter over at most `capacity` keys (Stream-Summary buckets).
+
+    A monitored key's count overestimates its true count by at most its error,
+    and every error is <= n / capacity. Until the first eviction all counts are exact.
+    Entries are kept in first-monitored order, like a Counter filled by one pass.
+    """
 
-    # Write CSV
+    def __init__(self, capacity: int):
+        self.capacity = max(capacity, 1)
+        self.entries: Dict[Any, Dict[str, Any]] = {}
+        self.buckets: Dict[int, Dict[Any, None]] = {}
+        self.min_count = 0
+        self.n = 0
+        self.evictions = 0
+
+    def _move(self, key: Any, old: int, new: int) -> None:
+        if old:
+            bucket = self.buckets[old]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[old]
+                if old == self.min_count:
+                    self.min_count = new
+        self.buckets.setdefault(new, {})[key] = None
+        if not old and (self.min_count == 0 or new < self.min_count):
+            self.min_count = new
+
+    def offer(self, key: Any) -> Dict[str, Any]:
+        """Count one occurrence of key; returns its entry {'count', 'error', 'examples'}."""
+        self.n += 1
+        entry = self.entries.get(key)
+        if entry is not None:
+            self._move(key, entry['count'], entry['count'] + 1)
+            entry['count'] += 1
+            return entry
+        if len(self.entries) < self.capacity:
+            entry = self.entries[key] = {'count': 1, 'error': 0, 'examples': []}
+            self._move(key, 0, 1)
+            return entry
+        # evict the oldest key among those with the minimum count
+        floor = self.min_count
+        victim = next(iter(self.buckets[floor]))
+        del self.buckets[floor][victim]
+        if not self.buckets[floor]:
+            del self.buckets[floor]
+        del self.entries[victim]
+        self.evictions += 1
+        entry = self.entries[key] = {'count': floor + 1, 'error': floor, 'examples': []}
+        self.buckets.setdefault(floor + 1, {})[key] = None
+        if floor not in self.buckets:
+            self.min_count = floor + 1
+        return entry
+
+    def max_error(self) -> int:
+        return max((e['error'] for e in self.entries.values()), default=0)
+
+
+def sketch_sizes(memory_mb: float) -> Tuple[int, int]:
+    """Split a memory budget: half to Space-Saving entries, half to the three sketches."""
+    budget = int(memory_mb * 1024 * 1024)
+    capacity = max(budget // 2 // SS_ENTRY_BYTES, 1)
+    width = max(budget // 2 // 3 // (SKETCH_DEPTH * 8), 1)
+    return capacity, width
+
+
+def stream_counts(files: List[str], include_cross: bool, min_len: int, max_len: int,
+                  memory_mb: float) -> Tuple[SpaceSaving, CountMinSketch, CountMinSketch, CountMinSketch]:
+    """One pass over the result files in fixed memory.
+
+    Returns Space-Saving path counts plus Count-Min sketches of unigrams, bigrams
+    (weighted by path occurrences, paths within the length range only) and path
+    document frequency. Records of one article are contiguous in the result files,
+    so a path counts once per run of the same title.
+    """
+    capacity, width = sketch_sizes(memory_mb)
+    paths = SpaceSaving(capacity)
+    unigram, bigram, docs = CountMinSketch(width), CountMinSketch(width), CountMinSketch(width)
+    current_title, seen = None, set()
+    for fp in files:
+        for title, rec, path_t in iter_path_records(fp, include_cross):
+            if not (min_len <= len(path_t) <= max_len):
+                continue
+            if title != current_title:
+                current_title, seen = title, set()
+            entry = paths.offer(path_t)
+            if len(entry['examples']) < MAX_EXAMPLES:
+                entry['examples'].append(example_row(title, rec))
+            if path_t not in seen:
+                seen.add(path_t)
+                docs.add(path_t)
+            for w in path_t:
+                unigram.add(w)
+            for a, b in zip(path_t, path_t[1:]):
+                bigram.add((a, b))
+    for sketch in (unigram, bigram, docs):
+        sketch.flush()
+    return paths, unigram, bigram, docs
+
+
+def report_bounds(paths: SpaceSaving, unigram: CountMinSketch, bigram: CountMinSketch,
+                  docs: CountMinSketch) -> Dict[str, Any]:
+    """Error bounds of an approximate run."""
+    return {
+        'path_occurrences': paths.n,
+        'monitored_paths': len(paths.entries),
+        'capacity': paths.capacity,
+        'evictions': paths.evictions,
+        'support_max_overestimate': paths.max_error(),
+        'support_bound': 0 if not paths.evictions else paths.n / paths.capacity,
+        'sketch_width': unigram.width,
+        'sketch_depth': unigram.depth,
+        'sketch_delta': unigram.delta,
+        'unigram_bound': unigram.error_bound(),
+        'bigram_bound': bigram.error_bound(),
+        'doc_freq_bound': docs.error_bound(),
+    }
+
+
+def write_ranking(out_csv: str, out_jsonl: str, ranked: List[Dict[str, Any]], examples_of,
+                  support_error=None) -> None:
+    """CSV of ranked paths plus a JSONL with samples (and support_error in approximate mode)."""
     import csv
-    os.makedirs(result_dir, exist_ok=True)
-    with open(OUT_CSV, 'w', encoding='utf-8', newline='') as f:
+    with open(out_csv, 'w', encoding='utf-8', newline='') as f:
         w = csv.writer(f)
         w.writerow(['rank', 'score', 'support', 'doc_freq', 'avg_npmi', 'len', 'path'])
-        for i, item in enumerate(ranked[: args.topk], start=1):
+        for i, item in enumerate(ranked, start=1):
             w.writerow([
                 i,
                 f"{item['score']:.6f}",
@@ -246,23 +869,147 @@ def main():
                 '->'.join(item['path']),
             ])
 
-    # Write samples JSONL
-    with open(OUT_JSONL, 'w', encoding='utf-8') as f:
-        for item in ranked[: args.topk]:
+    with open(out_jsonl, 'w', encoding='utf-8') as f:
+        for item in ranked:
             path_t = tuple(item['path'])
-            samp = examples.get(path_t, [])
-            f.write(json.dumps({
+            row = {
                 'path': item['path'],
                 'score': item['score'],
                 'support': item['support'],
                 'doc_freq': item['doc_freq'],
                 'avg_npmi': item['avg_npmi'],
                 'len': item['len'],
-                'samples': samp,
-            }, ensure_ascii=False) + '\n')
+            }
+            if support_error is not None:
+                row['support_error'] = support_error(path_t)
+            row['samples'] = examples_of(path_t)
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def rank_views(args, views: List[str], include_cross: bool) -> None:
+    """Read the result files once and write one ranking per representation."""
+    files = list(iter_path_files(args.result_dir))
+    if not files:
+        print('No path JSON files found in', args.result_dir)
+        return
+    pos_lookup = None
+    if 'pos' in views:
+        if os.path.exists(args.dep_source):
+            pos_lookup = PosLookup(args.dep_source)
+        else:
+            print('No dependency results at', args.dep_source, '- skipping the pos view')
+            views = [v for v in views if v != 'pos']
+    rich = collect_rich_paths(files, include_cross, pos_lookup)
+    keep_forms = backoff_vocabulary(rich, args.backoff_min_count) if 'pos' in views else None
+
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    for view in views:
+        path_counts, path_docs, examples = project_view(rich, view, keep_forms)
+        enc = EncodedPaths(path_counts, path_docs)
+        order, score, assoc = score_encoded(enc, args.min_count, args.min_doc, args.min_len, args.max_len)
+        ranked = ranked_rows(enc, order, score, assoc, limit=args.topk)
+        out_csv, out_jsonl = view_outputs(view)
+        write_ranking(out_csv, out_jsonl, ranked, lambda p: example_dicts(p, examples.get(p, [])))
+        print(f"[{view}] Unique: {len(path_counts)} | Ranked: {len(order)} | Output: {out_csv}, {out_jsonl}")
+    print(f"Records: {sum(e['count'] for e in rich.values())} | Distinct node sequences: {len(rich)} "
+          f"| {len(files)} files read once for {len(views)} views")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--result-dir', default=RESULT_DIR)
+    ap.add_argument('--topk', type=int, default=200)
+    ap.add_argument('--min-count', type=int, default=3)
+    ap.add_argument('--min-doc', type=int, default=2)
+    ap.add_argument('--min-len', type=int, default=2)
+    ap.add_argument('--max-len', type=int, default=6)
+    ap.add_argument('--include-cross', action='store_true', help='Include cross-sentence paths (default on)')
+    ap.add_argument('--exclude-cross', action='store_true', help='Exclude cross-sentence paths')
+    ap.add_argument('--no-scan', action='store_true', help='Re-rank from the count store without reading result files')
+    ap.add_argument('--rebuild', action='store_true', help='Discard the count store and recount every file')
+    ap.add_argument('--approx', action='store_true',
+                    help='Stream the result files into Space-Saving / Count-Min sketches (fixed memory, no store)')
+    ap.add_argument('--memory-mb', type=float, default=256, help='Memory budget of --approx')
+    ap.add_argument('--views', default=DEFAULT_VIEW,
+                    help=f'Comma-separated representations ranked in one pass over the files: {",".join(VIEWS)}')
+    ap.add_argument('--dep-source', default=DEP_RESULT_DIR,
+                    help='dependency_results directory or *.depcorpus, for the pos view')
+    ap.add_argument('--backoff-min-count', type=int, default=5,
+                    help='pos view: forms occurring fewer times than this back off to their POS tag')
+    args = ap.parse_args()
+    if args.approx and (args.no_scan or args.rebuild):
+        ap.error('--approx streams the result files and does not use the count store')
+    views = list(dict.fromkeys(v.strip() for v in args.views.split(',') if v.strip()))
+    unknown = [v for v in views if v not in VIEWS]
+    if unknown or not views:
+        ap.error(f'unknown views: {unknown}; choose from {",".join(VIEWS)}')
+    multi_view = views != [DEFAULT_VIEW]
+    if multi_view and (args.approx or args.no_scan):
+        ap.error('--views beyond synonym rank from one exact pass over the files (no --approx / --no-scan)')
+
+    result_dir = args.result_dir
+    include_cross = not args.exclude_cross
+    if multi_view:
+        rank_views(args, views, include_cross)
+        return
+    bounds = None
+
+    if args.approx:
+        files = list(iter_path_files(result_dir))
+        if not files:
+            print('No path JSON files found in', result_dir)
+            return
+        paths, unigram, bigram, docs = stream_counts(files, include_cross, args.min_len, args.max_len, args.memory_mb)
+        path_counts = Counter({p: e['count'] for p, e in paths.entries.items()})
+        # df <= support, so the support estimate also caps the sketch estimate
+        enc = EncodedPaths(path_counts, doc_freq={p: min(docs[p], c) for p, c in path_counts.items()})
+        bounds = report_bounds(paths, unigram, bigram, docs)
+        print('Approximate mode: ' + json.dumps(bounds, ensure_ascii=False))
+
+        def examples_of(path_t):
+            return example_dicts(path_t, paths.entries[path_t]['examples'])
+    else:
+        store_fp = os.path.join(result_dir, COUNT_STORE_FILENAME)
+        config = store_config(include_cross)
+        store = PathCountStore(config) if args.rebuild else PathCountStore.load(store_fp, config)
+
+        if args.no_scan:
+            if not store.files:
+                print('No usable count store at', store_fp, '- run once without --no-scan')
+                return
+        else:
+            files = list(iter_path_files(result_dir))
+            if not files:
+                print('No path JSON files found in', result_dir)
+                return
+            # Only added / changed files are read; vanished files are subtracted
+            changes = store.update(files, include_cross)
+            if changes['unchanged'] != len(files) or changes['removed'] or not os.path.isfile(store_fp):
+                store.save(store_fp)
+            print('Count store: ' + ', '.join(f'{k} {v}' for k, v in changes.items()) + f' | {store_fp}')
+
+        path_counts = store.path_counts
+        unigram, bigram = store.edge_counts(args.min_len, args.max_len)
+        enc = EncodedPaths(path_counts, store.path_docs)
+        examples_of = store.examples
+
+    order, score, assoc = score_encoded(
+        enc,
+        min_count=args.min_count,
+        min_doc=args.min_doc,
+        min_len=args.min_len,
+        max_len=args.max_len,
+        unigram=unigram,
+        bigram=bigram,
+    )
+    # Only the top-k rows are materialized
+    ranked = ranked_rows(enc, order, score, assoc, limit=args.topk)
+    os.makedirs(result_dir, exist_ok=True)
+    write_ranking(OUT_CSV, OUT_JSONL, ranked, examples_of,
+                  support_error=(lambda p: paths.entries[p]['error']) if bounds is not None else None)
 
-    print(f"Paths scanned: {len(all_paths)} | Unique: {len(set(all_paths))}")
-    print(f"Ranked: {len(ranked)} | Output: {OUT_CSV}, {OUT_JSONL}")
+    print(f"Paths scanned: {sum(path_counts.values())} | Unique: {len(path_counts)}")
+    print(f"Ranked: {len(order)} | Output: {OUT_CSV}, {OUT_JSONL}")
 
 
 if __name__ == '__main__':
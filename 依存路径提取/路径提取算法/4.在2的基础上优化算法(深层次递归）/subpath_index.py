@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""依存路径子路径挖掘索引
+
+rank_typical_paths.py 只给整条路径打分，共享同一典型核心（如 采用->方法）的长路径会被分开计数。
+本脚本在全部路径结果上建立位置倒排索引（n-gram 倒排 + 位置校验），支持：
+  - 子路径查询：哪些路径包含 采用->方法，各出现多少次、覆盖多少篇文章
+  - 频繁子路径枚举：支持度不低于阈值的全部子路径（逐层向右扩展，支持度反单调剪枝）
+
+索引内容：去重后的路径（词形序列 + 依存关系序列，词形按 rank_typical_paths 的同义词表归一），
+每条路径的出现次数与文章列表，均为 CSR 布局的整数数组；按 词形 / 依存关系 各建一份倒排表
+（符号 -> 全局位置）。查询从最稀有的一步取候选位置，其余各步直接在数组上向量化校验。
+
+查询语法：步骤以 -> 连接，每步可写
+  采用          词形
+  :dobj         依存关系
+  采用:dobj     词形 + 依存关系
+  *             任意节点（也可只作词形或依存关系的通配，如 *:dobj、采用:*）
+依存关系统一按小写存储与匹配（:DOBJ 与 :dobj 等价）。
+挖掘视图（--view）：form 词形、deprel 依存关系、form_deprel 词形:依存关系 组合。
+
+子路径支持度 = 包含该子路径的路径出现次数之和（同一路径内重复出现只计一次）；doc_freq = 覆盖文章数。
+
+索引保存为 依存路径提取结果/subpath_index.npz，结果文件（大小 / 修改时间）或 --exclude-cross 变化时自动重建。
+
+用法：
+    python subpath_index.py build
+    python subpath_index.py query "采用->方法" --limit 20
+    python subpath_index.py mine --min-support 5 --min-len 2 --max-len 4 --view form
+    python subpath_index.py shell            # 交互式：逐行输入查询
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from rank_typical_paths import (RESULT_DIR, file_signature, iter_path_files, iter_path_nodes, load_pairs_from_file,
+                                normalize_token)
+
+SUBPATH_INDEX_FILENAME = 'subpath_index.npz'
+SUBPATH_INDEX_VERSION = 2
+VIEWS = ('form', 'deprel', 'form_deprel')
+WILDCARD = '*'
+
+
+def path_nodes(path_entry):
+    """record['path'] -> [(词形, 依存关系)]；节点解析与 rank_typical_paths.path_nodes 共用 iter_path_nodes
+    （依存关系统一小写），词形再按同义词表归一"""
+    return [(normalize_token(raw), deprel) for _, raw, deprel in iter_path_nodes(path_entry)]
+
+
+def _unique(x):
+    """排序去重（大整数数组上比 np.unique 的哈希实现快）"""
+    x = np.sort(x)
+    if len(x) == 0:
+        return x
+    return x[np.concatenate(([True], x[1:] != x[:-1]))]
+
+
+class _Interner:
+    def __init__(self):
+        self.index = {}
+
+    def __call__(self, s):
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.index)
+        return i
+
+    @property
+    def vocab(self):
+        return list(self.index)
+
+
+class SubpathIndex:
+    """去重路径的整数数组 + 词形 / 依存关系倒排表
+
+    forms / deprels        各节点的词形、依存关系编码（CSR，offsets 划分路径）
+    counts                 每条路径的出现次数
+    doc_offsets / doc_ids  每条路径出现过的文章（titles 下标）
+    """
+
+    def __init__(self, form_vocab, deprel_vocab, titles, offsets, forms, deprels, counts, doc_offsets, doc_ids,
+                 meta=None):
+        self.form_vocab = list(form_vocab)
+        self.deprel_vocab = list(deprel_vocab)
+        self.titles = list(titles)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.forms = np.asarray(forms, dtype=np.int64)
+        self.deprels = np.asarray(deprels, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.doc_offsets = np.asarray(doc_offsets, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.meta = meta or {}
+        self.lengths = np.diff(self.offsets)
+        self.path_of = np.repeat(np.arange(self.n_paths, dtype=np.int64), self.lengths)
+        self._form_index = {s: i for i, s in enumerate(self.form_vocab)}
+        self._deprel_index = {s: i for i, s in enumerate(self.deprel_vocab)}
+        self._postings = {}
+
+    @property
+    def n_paths(self):
+        return len(self.counts)
+
+    # ---- 构建 / 持久化 ----
+    @classmethod
+    def build(cls, files, include_cross=True):
+        forms_in, deprels_in, titles_in = _Interner(), _Interner(), _Interner()
+        uniq = {}  # (词形编码, 依存编码) -> [次数, {文章}]
+        for fp in files:
+            for title, rec in load_pairs_from_file(fp):
+                if not include_cross and rec.get('path_type') == 'cross_sentence':
+                    continue
+                nodes = path_nodes(rec.get('path'))
+                if not nodes:
+                    continue
+                key = (tuple(forms_in(f) for f, _ in nodes), tuple(deprels_in(d) for _, d in nodes))
+                entry = uniq.get(key)
+                if entry is None:
+                    entry = uniq[key] = [0, {}]
+                entry[0] += 1
+                entry[1][titles_in(title)] = None
+        offsets, doc_offsets = [0], [0]
+        forms, deprels, counts, doc_ids = [], [], [], []
+        for (f, d), (c, docs) in uniq.items():
+            forms.extend(f)
+            deprels.extend(d)
+            offsets.append(len(forms))
+            counts.append(c)
+            doc_ids.extend(docs)
+            doc_offsets.append(len(doc_ids))
+        meta = {
+            'version': SUBPATH_INDEX_VERSION,
+            'include_cross': include_cross,
+            'files': {os.path.basename(fp): file_signature(fp) for fp in files},
+        }
+        return cls(forms_in.vocab, deprels_in.vocab, titles_in.vocab, offsets, forms, deprels, counts,
+                   doc_offsets, doc_ids, meta)
+
+    def save(self, fp):
+        strings = json.dumps({'form_vocab': self.form_vocab, 'deprel_vocab': self.deprel_vocab,
+                              'titles': self.titles, 'meta': self.meta}, ensure_ascii=False)
+        tmp = fp + '.tmp.npz'
+        np.savez(tmp, strings=np.array(strings), offsets=self.offsets, forms=self.forms, deprels=self.deprels,
+                 counts=self.counts, doc_offsets=self.doc_offsets, doc_ids=self.doc_ids)
+        os.replace(tmp, fp)
+
+    @classmethod
+    def load(cls, fp):
+        with np.load(fp, allow_pickle=False) as z:
+            strings = json.loads(str(z['strings']))
+            return cls(strings['form_vocab'], strings['deprel_vocab'], strings['titles'], z['offsets'], z['forms'],
+                       z['deprels'], z['counts'], z['doc_offsets'], z['doc_ids'], strings['meta'])
+
+    # ---- 查询 ----
+    def _posting(self, channel, sym):
+        """符号 -> 出现的全局位置（升序）"""
+        if channel not in self._postings:
+            arr = self.forms if channel == 'form' else self.deprels
+            order = np.argsort(arr, kind='stable')
+            ptr = np.searchsorted(arr[order], np.arange(int(arr.max(initial=-1)) + 2))
+            self._postings[channel] = (order, ptr)
+        order, ptr = self._postings[channel]
+        return order[ptr[sym]:ptr[sym + 1]]
+
+    def parse_pattern(self, pattern):
+        """'采用:dobj->*->方法' -> [(词形编码或 None, 依存编码或 None)]；含未知符号时返回 None"""
+        steps = []
+        for raw in pattern.split('->'):
+            raw = raw.strip()
+            if raw == WILDCARD:
+                steps.append((None, None))
+                continue
+            form, _, deprel = raw.partition(':')
+            form = normalize_token(form) if form and form != WILDCARD else ''
+            deprel = '' if deprel == WILDCARD else deprel.lower()
+            f = self._form_index.get(form) if form else None
+            d = self._deprel_index.get(deprel) if deprel else None
+            if (form and f is None) or (deprel and d is None):
+                return None
+            steps.append((f, d))
+        return steps
+
+    def find(self, steps):
+        """全部出现位置：(路径下标, 起点) 两个数组，按路径、起点排序"""
+        empty = np.zeros(0, dtype=np.int64)
+        if not steps:
+            return empty, empty
+        concrete = [(len(self._posting(ch, s)), k, ch, s)
+                    for k, (f, d) in enumerate(steps)
+                    for ch, s in (('form', f), ('deprel', d)) if s is not None]
+        m = len(steps)
+        if concrete:
+            _, anchor, ch, sym = min(concrete)
+            g = self._posting(ch, sym)
+        else:
+            anchor, g = 0, np.arange(len(self.forms), dtype=np.int64)
+        path = self.path_of[g]
+        start = g - self.offsets[path] - anchor
+        ok = (start >= 0) & (start + m <= self.lengths[path])
+        path, start = path[ok], start[ok]
+        base = self.offsets[path] + start
+        for k, (f, d) in enumerate(steps):
+            keep = np.ones(len(base), dtype=bool)
+            if f is not None:
+                keep &= self.forms[base + k] == f
+            if d is not None:
+                keep &= self.deprels[base + k] == d
+            path, start, base = path[keep], start[keep], base[keep]
+        order = np.lexsort((start, path))
+        return path[order], start[order]
+
+    def _doc_slots(self, paths):
+        """各路径的文章在 doc_ids 中的下标（按路径依次展开）及每条路径的文章数"""
+        lo, hi = self.doc_offsets[paths], self.doc_offsets[paths + 1]
+        reps = hi - lo
+        starts = np.repeat(lo - np.concatenate(([0], np.cumsum(reps)[:-1])), reps)
+        return starts + np.arange(int(reps.sum()), dtype=np.int64), reps
+
+    def doc_freq(self, paths):
+        """一组路径覆盖的文章数"""
+        paths = _unique(paths)
+        if len(paths) == 0:
+            return 0
+        slots, _ = self._doc_slots(paths)
+        return len(_unique(self.doc_ids[slots]))
+
+    def path_text(self, i, deprels=True):
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        if deprels:
+            return '->'.join(f"{self.form_vocab[f]}:{self.deprel_vocab[d]}"
+                             for f, d in zip(self.forms[lo:hi].tolist(), self.deprels[lo:hi].tolist()))
+        return '->'.join(self.form_vocab[f] for f in self.forms[lo:hi].tolist())
+
+    def query(self, pattern, limit=20):
+        """包含子路径的路径：{'pattern', 'support', 'doc_freq', 'n_paths', 'paths': [...]}"""
+        steps = self.parse_pattern(pattern)
+        path, start = self.find(steps) if steps is not None else self.find([])
+        uniq = _unique(path)
+        support = int(self.counts[uniq].sum())
+        ranked = uniq[np.argsort(-self.counts[uniq], kind='stable')]
+        shown = np.isin(path, ranked[:limit])
+        starts = {}
+        for p, s in zip(path[shown].tolist(), start[shown].tolist()):
+            starts.setdefault(p, []).append(s)
+        return {
+            'pattern': pattern,
+            'support': support,
+            'doc_freq': self.doc_freq(uniq),
+            'n_paths': len(uniq),
+            'paths': [
+                {'path': self.path_text(p), 'count': int(self.counts[p]), 'doc_freq': self.doc_freq(np.array([p])),
+                 'positions': starts[p]}
+                for p in ranked[:limit].tolist()
+            ],
+        }
+
+    # ---- 频繁子路径挖掘 ----
+    def symbols(self, view):
+        if view == 'form':
+            return self.forms, self.form_vocab
+        if view == 'deprel':
+            return self.deprels, self.deprel_vocab
+        n_d = max(len(self.deprel_vocab), 1)
+        combo, inv = np.unique(self.forms * n_d + self.deprels, return_inverse=True)
+        vocab = [f"{self.form_vocab[c // n_d]}:{self.deprel_vocab[c % n_d]}" for c in combo.tolist()]
+        return inv.astype(np.int64), vocab
+
+    def mine(self, min_support, min_len=2, max_len=4, view='form', min_doc=0):
+        """支持度 >= min_support 的全部子路径（长度 min_len..max_len），按支持度降序
+
+        逐层扩展：第 k 层的每个出现位置 (子路径, 路径, 起点) 向右接一个节点得到第 k+1 层，
+        子路径的支持度不超过其前缀的支持度，因此只需扩展频繁的前缀。
+        """
+        syms, vocab = self.symbols(view)
+        n_paths = max(self.n_paths, 1)
+        ends = self.offsets[self.path_of + 1]
+        # 第 1 层：每个位置就是一个出现
+        gram = syms.copy()
+        path = self.path_of.copy()
+        pos = np.arange(len(syms), dtype=np.int64)
+        parents, lasts = [], []  # 各层子路径编码 -> (上一层编码, 末节点符号)
+        results = []
+        for k in range(1, max_len + 1):
+            if k > 1:
+                nxt = pos + k - 1
+                ok = nxt < ends[pos]
+                gram, path, pos, nxt = gram[ok], path[ok], pos[ok], nxt[ok]
+                keys, gram = np.unique(gram * len(vocab) + syms[nxt], return_inverse=True)
+                parents.append(keys // len(vocab))
+                lasts.append(keys % len(vocab))
+            else:
+                keys, gram = np.unique(gram, return_inverse=True)
+                parents.append(np.full(len(keys), -1, dtype=np.int64))
+                lasts.append(keys)
+            gram = gram.reshape(-1)
+            if len(keys) == 0:
+                break
+            # 支持度：每个 (子路径, 路径) 只计一次路径出现次数
+            pairs = _unique(gram * n_paths + path)
+            pair_gram, pair_path = pairs // n_paths, pairs % n_paths
+            support = np.bincount(pair_gram, weights=self.counts[pair_path], minlength=len(keys)).astype(np.int64)
+            frequent = support >= min_support
+            if k >= min_len:
+                hits = np.nonzero(frequent)[0]
+                sel = frequent[pair_gram]
+                dfs = self._gram_doc_freq(pair_gram[sel], pair_path[sel], len(keys))
+                for g in hits.tolist():
+                    if dfs[g] < min_doc:
+                        continue
+                    results.append({'pattern': self._gram_text(g, k, parents, lasts, vocab), 'len': k,
+                                    'support': int(support[g]), 'doc_freq': int(dfs[g])})
+            keep = frequent[gram]
+            gram, path, pos = gram[keep], path[keep], pos[keep]
+            if len(gram) == 0:
+                break
+        results.sort(key=lambda r: (-r['support'], -r['len']))
+        return results
+
+    def _gram_doc_freq(self, pair_gram, pair_path, n_grams):
+        slots, reps = self._doc_slots(pair_path)
+        g = np.repeat(pair_gram, reps)
+        n_docs = max(len(self.titles), 1)
+        pairs = _unique(g * n_docs + self.doc_ids[slots])
+        return np.bincount(pairs // n_docs, minlength=n_grams)
+
+    @staticmethod
+    def _gram_text(g, k, parents, lasts, vocab):
+        out = []
+        for level in range(k - 1, -1, -1):
+            out.append(vocab[int(lasts[level][g])])
+            g = int(parents[level][g])
+        return '->'.join(reversed(out))
+
+
+def load_or_build(result_dir, index_fp=None, include_cross=True, rebuild=False):
+    """读取已保存的索引；结果文件或配置有变化时重建并保存"""
+    index_fp = index_fp or os.path.join(result_dir, SUBPATH_INDEX_FILENAME)
+    files = list(iter_path_files(result_dir))
+    signatures = {os.path.basename(fp): file_signature(fp) for fp in files}
+    if not rebuild and os.path.isfile(index_fp):
+        index = SubpathIndex.load(index_fp)
+        meta = index.meta
+        if (meta.get('version') == SUBPATH_INDEX_VERSION and meta.get('include_cross') == include_cross
+                and meta.get('files') == signatures):
+            return index
+        print('路径结果或配置已变化，重建子路径索引')
+    t0 = time.perf_counter()
+    index = SubpathIndex.build(files, include_cross)
+    index.save(index_fp)
+    print(f"✅ 子路径索引: {index.n_paths} 条不同路径 / {len(index.forms)} 个节点，"
+          f"{time.perf_counter() - t0:.2f}s -> {index_fp}")
+    return index
+
+
+def print_query(index, pattern, limit):
+    t0 = time.perf_counter()
+    res = index.query(pattern, limit)
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"{res['pattern']}: 支持度 {res['support']}，{res['n_paths']} 条路径，{res['doc_freq']} 篇文章（{ms:.1f} ms）")
+    for item in res['paths']:
+        print(f"  {item['count']:>5}  df={item['doc_freq']:<3} @{item['positions']}  {item['path']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='依存路径子路径查询与频繁子路径挖掘')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--result-dir', default=RESULT_DIR)
+    common.add_argument('--index', default=None, help=f'索引文件（默认 结果目录/{SUBPATH_INDEX_FILENAME}）')
+    common.add_argument('--exclude-cross', action='store_true', help='不索引跨句路径')
+    common.add_argument('--rebuild', action='store_true', help='忽略已保存的索引，重新构建')
+    sub.add_parser('build', parents=[common], help='构建并保存索引')
+    p_query = sub.add_parser('query', parents=[common], help='查询包含某子路径的路径')
+    p_query.add_argument('pattern', help='如 采用->方法、采用:dobj->*->方法、:nsubj->:dobj')
+    p_query.add_argument('--limit', type=int, default=20)
+    p_mine = sub.add_parser('mine', parents=[common], help='枚举频繁子路径')
+    p_mine.add_argument('--min-support', type=int, default=5)
+    p_mine.add_argument('--min-doc', type=int, default=0)
+    p_mine.add_argument('--min-len', type=int, default=2)
+    p_mine.add_argument('--max-len', type=int, default=4)
+    p_mine.add_argument('--view', choices=VIEWS, default='form')
+    p_mine.add_argument('--top', type=int, default=50, help='打印前 N 条')
+    p_mine.add_argument('--output', default=None, help='全部结果写出为 JSON')
+    p_shell = sub.add_parser('shell', parents=[common], help='交互式查询（逐行输入子路径，空行退出）')
+    p_shell.add_argument('--limit', type=int, default=20)
+    args = ap.parse_args()
+
+    index = load_or_build(args.result_dir, args.index, not args.exclude_cross, args.rebuild)
+    if args.cmd == 'query':
+        print_query(index, args.pattern, args.limit)
+    elif args.cmd == 'mine':
+        t0 = time.perf_counter()
+        results = index.mine(args.min_support, args.min_len, args.max_len, args.view, args.min_doc)
+        print(f"频繁子路径 {len(results)} 条（支持度 >= {args.min_support}，视图 {args.view}，"
+              f"{time.perf_counter() - t0:.2f}s）")
+        for r in results[:args.top]:
+            print(f"  {r['support']:>5}  df={r['doc_freq']:<3} {r['pattern']}")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"✅ 已写出: {args.output}")
+    elif args.cmd == 'shell':
+        while True:
+            try:
+                pattern = input('子路径> ').strip()
+            except EOFError:
+                break
+            if not pattern:
+                break
+            print_query(index, pattern, args.limit)
+
+
+if __name__ == '__main__':
+    main()